@@ -0,0 +1,110 @@
+import importlib
+import json
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Deferred imports and cold-start profiling for the Streamlit apps
+#
+# lazy_import() hands out a stand-in whose real import runs on first
+# attribute access, so heavy libraries (pandas, plotly) are loaded only once a view
+# that uses them renders instead of before the first paint. Every deferred
+# import that actually runs is timed, and each app records when its first
+# script run finished, so startup_report() can show where cold-start time
+# goes; `python app_startup.py` measures both apps in fresh processes.
+APPS = ["habit_tracker.py", "budget_app.py"]
+RESULTS_FILE = "cold_start.jsonl"
+
+# When this module was first imported, i.e. the start of an app's first script run
+STARTED = time.perf_counter()
+
+# Module name -> seconds its deferred import took (including what it imported)
+IMPORT_TIMES = {}
+
+# App name -> seconds from STARTED to the end of its first script run
+FIRST_RENDER = {}
+
+class _Deferred:
+    # Stands in for a module until its first attribute access, then imports
+    # it (timed, once, even with several sessions racing) and delegates to it
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = _timed_import(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded yet"
+        return f"<deferred module {self._name!r} ({state})>"
+
+def _timed_import(name):
+    if name in sys.modules:
+        return sys.modules[name]
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES[name] = time.perf_counter() - started
+    return module
+
+def lazy_import(name):
+    """Return `name` if it is already imported, otherwise a stand-in that
+    imports it on first attribute access."""
+    if name in sys.modules:
+        return sys.modules[name]
+    return _Deferred(name)
+
+def mark_first_render(app):
+    """Record, once per process, how long `app` took to finish its first script run."""
+    FIRST_RENDER.setdefault(app, time.perf_counter() - STARTED)
+
+def startup_report():
+    """{"first_render_s": {app: seconds}, "import_s": {module: seconds}}, slowest imports first."""
+    return {
+        "first_render_s": dict(FIRST_RENDER),
+        "import_s": dict(sorted(IMPORT_TIMES.items(), key=lambda item: -item[1]))
+    }
+
+# Run in a fresh interpreter for each app: import streamlit, run the script once, report
+_PROBE = """
+import json, os, sys, time
+started = time.perf_counter()
+import streamlit
+streamlit_s = time.perf_counter() - started
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(os.path.abspath(sys.argv[1]), default_timeout=120).run()
+import app_startup
+report = app_startup.startup_report()
+report.update(streamlit_s=streamlit_s, total_s=time.perf_counter() - started, errors=[e.message for e in app.exception])
+report["loaded"] = sorted(name for name in ("pandas", "numpy", "plotly.express", "matplotlib") if name in sys.modules)
+print(json.dumps(report))
+"""
+
+def profile_cold_start(app):
+    """Run `app` once in a new Python process and return its startup report."""
+    output = subprocess.run([sys.executable, "-c", _PROBE, app], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    apps = sys.argv[1:] or APPS
+    with open(RESULTS_FILE, "a") as results:
+        for app in apps:
+            report = profile_cold_start(app)
+            report.update(app=app, run_at=datetime.now().isoformat(timespec="seconds"))
+            results.write(json.dumps(report) + "\n")
+            first_render = next(iter(report["first_render_s"].values()), float("nan"))
+            print(f"{app}: streamlit {report['streamlit_s']:.2f}s, first render {first_render:.2f}s, "
+                  f"total {report['total_s']:.2f}s, loaded {', '.join(report['loaded']) or 'nothing heavy'}")
+            for module, seconds in report["import_s"].items():
+                print(f"    {module:<28} {seconds:.3f}s")
+            for error in report["errors"]:
+                print(f"    error: {error}")
+
+if __name__ == "__main__":
+    main()
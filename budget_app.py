@@ -1,13 +1,16 @@
 import streamlit as st
-import pandas as pd
 import os
 import glob
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
-import plotly.express as px
-import plotly.graph_objects as go
-import numpy as np
+import hashlib
 from functools import lru_cache
+import app_startup
+
+# pandas, numpy and plotly load on first use, once there is data to show
+pd = app_startup.lazy_import("pandas")
+np = app_startup.lazy_import("numpy")
+px = app_startup.lazy_import("plotly.express")
+go = app_startup.lazy_import("plotly.graph_objects")
 
 # Set page config
 st.set_page_config(
@@ -57,13 +60,15 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state for account balances
-if 'account_balances' not in st.session_state:
-    st.session_state.account_balances = {
-        "Westpac Choice": 536.29,
-        "ANZ Access": 1391.45,
-        "Westpac Offset": 220144.00
-    }
+# Account registry file: one row per account with its opening balance (in the
+# account's own currency), optional opening date, display group, chart axis and currency
+ACCOUNTS_FILE = "accounts.csv"
+ACCOUNT_COLUMNS = ['Name', 'OpeningBalance', 'OpeningDate', 'Group', 'Axis', 'Currency']
+
+# Exchange rate table: one row per (Date, Currency) with Rate = AUD per unit of Currency
+EXCHANGE_RATES_FILE = "exchange_rates.csv"
+RATE_REFERENCE_CURRENCY = "AUD"
+CURRENCY_SYMBOLS = {"AUD": "$", "USD": "US$", "EUR": "€", "GBP": "£", "NZD": "NZ$", "JPY": "¥"}
 
 # Replace the load_csv_files function with this new function for file upload
 def load_uploaded_csv(uploaded_file):
@@ -95,27 +100,395 @@ def load_uploaded_csv(uploaded_file):
     else:
         return pd.DataFrame()
 
-def get_account_balance(account, data):
-    """Calculate current balance for a given account based on transactions."""
-    if account in st.session_state.account_balances:
-        starting_balance = st.session_state.account_balances[account]
-        
-        # Filter data for this account
-        account_data = data[data['Account'] == account]
-        
-        # Sum all transactions
-        total_amount = account_data['Amount'].sum()
-        
-        return starting_balance + total_amount
-    return 0
+def get_dataset_version(uploaded_file):
+    """Return a key identifying the uploaded dataset, used to cache derived views."""
+    if uploaded_file is None:
+        return None
+    file_id = getattr(uploaded_file, "file_id", None)
+    if file_id:
+        return file_id
+    return hashlib.md5(uploaded_file.getvalue()).hexdigest()
+
+@st.cache_data(show_spinner=False)
+def load_exchange_rates(path, modified_time):
+    """Load the local exchange rate table (Date, Currency, Rate).
+    `modified_time` is only part of the cache key so edits to the file are picked up."""
+    rates = pd.read_csv(path)
+    rates['Date'] = pd.to_datetime(rates['Date'], format="%d/%m/%Y", errors='coerce').astype('datetime64[ns]')
+    rates['Currency'] = rates['Currency'].astype(str).str.upper().str.strip()
+    rates['Rate'] = pd.to_numeric(rates['Rate'], errors='coerce')
+    rates = rates.dropna(subset=['Date', 'Rate'])
+    return rates[rates['Currency'] != RATE_REFERENCE_CURRENCY].sort_values('Date').reset_index(drop=True)
+
+def get_exchange_rates():
+    """Return (rates, rates_version) for the rate file, or an empty table if there isn't one."""
+    if os.path.exists(EXCHANGE_RATES_FILE):
+        modified_time = os.path.getmtime(EXCHANGE_RATES_FILE)
+        try:
+            return load_exchange_rates(EXCHANGE_RATES_FILE, modified_time), modified_time
+        except Exception as e:
+            st.sidebar.error(f"Error loading exchange rates: {e}")
+    empty = pd.DataFrame({'Date': pd.Series(dtype='datetime64[ns]'), 'Currency': pd.Series(dtype=object), 'Rate': pd.Series(dtype=float)})
+    return empty, None
+
+def lookup_rates(dates, currencies, rates):
+    """As-of rate lookup: for each (date, currency) pair, the latest rate on or before that date.
+
+    The lookup runs as one `merge_asof` over the distinct (day, currency)
+    pairs and is broadcast back to every row. Dates before the first rate for a
+    currency fall back to its earliest rate; the reference currency is always
+    1.0 and currencies with no rates at all come back as NaN."""
+    days = pd.to_datetime(pd.Series(np.asarray(dates))).dt.normalize().astype('datetime64[ns]').to_numpy()
+    currency_codes, currency_names = pd.factorize(np.asarray(currencies, dtype=object))
+    if len(currency_names) == 0:
+        return pd.Series(np.full(len(days), np.nan), index=getattr(dates, 'index', None))
+
+    # One integer key per (day, currency) pair
+    day_numbers = np.where(np.isnat(days), -1, days.astype('int64') // 86_400_000_000_000)
+    pair_keys, inverse = np.unique(day_numbers * len(currency_names) + currency_codes, return_inverse=True)
+    pair_days, pair_codes = np.divmod(pair_keys, len(currency_names))
+    query = pd.DataFrame({
+        'Date': pd.to_datetime(pair_days, unit='D').astype('datetime64[ns]'),
+        'Currency': pd.Series(np.asarray(currency_names, dtype=object).astype(str)[pair_codes]).astype(str),
+        'Row': np.arange(len(pair_keys))
+    })
+
+    pair_rates = np.full(len(query), np.nan)
+    pair_rates[query['Currency'].to_numpy() == RATE_REFERENCE_CURRENCY] = 1.0
+
+    query = query[(query['Currency'] != RATE_REFERENCE_CURRENCY) & (pair_days >= 0)].sort_values('Date')
+    if not query.empty and not rates.empty:
+        rate_table = rates[['Date', 'Currency', 'Rate']].astype({'Currency': str})
+        matched = pd.merge_asof(query, rate_table, on='Date', by='Currency', direction='backward')
+        missing = matched['Rate'].isna()
+        if missing.any():
+            earliest = pd.merge_asof(matched.loc[missing, ['Date', 'Currency', 'Row']], rate_table, on='Date', by='Currency', direction='forward')
+            matched.loc[missing, 'Rate'] = earliest['Rate'].to_numpy()
+        pair_rates[matched['Row'].to_numpy()] = matched['Rate'].to_numpy()
+
+    return pd.Series(pair_rates[inverse.ravel()], index=getattr(dates, 'index', None))
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def convert_to_base_currency(_data, dataset_version, account_currencies, base_currency, _rates, rates_version):
+    """Return the transactions with `Amount` expressed in `base_currency`.
+
+    The original value is kept in `OriginalAmount` and the account currency in
+    `Currency`. Each row is converted at the rate in force on its date via
+    lookup_rates. Cached as a shared resource (no per-rerun copy), so callers
+    must treat the result as read-only."""
+    currency_map = dict(account_currencies)
+    account_codes, account_names = pd.factorize(_data['Account'])
+    account_currency = np.array([currency_map.get(account, RATE_REFERENCE_CURRENCY) for account in account_names] + [RATE_REFERENCE_CURRENCY], dtype=object)
+    currencies = pd.Series(account_currency[account_codes], index=_data.index)
+
+    converted = _data.copy()
+    converted['Currency'] = currencies
+    converted['OriginalAmount'] = converted['Amount']
+    if (currencies == base_currency).all():
+        return converted
+
+    to_reference = lookup_rates(converted['Date'], currencies, _rates)
+    from_reference = lookup_rates(converted['Date'], np.full(len(converted), base_currency, dtype=object), _rates)
+    converted['Amount'] = converted['Amount'] * (to_reference / from_reference).to_numpy()
+    return converted
+
+def convert_balances(balances, account_currencies, base_currency, rates, as_of_dates):
+    """Convert {account: balance} from each account's currency to `base_currency`,
+    each at the rate in force on its {account: date} in `as_of_dates`."""
+    accounts = list(balances)
+    if not accounts:
+        return {}
+    dates = pd.Series([as_of_dates[account] for account in accounts])
+    currencies = [account_currencies.get(account, RATE_REFERENCE_CURRENCY) for account in accounts]
+    to_reference = lookup_rates(dates, currencies, rates).to_numpy()
+    from_reference = lookup_rates(dates, [base_currency] * len(accounts), rates).to_numpy()
+    factors = np.where(np.asarray(currencies, dtype=object) == base_currency, 1.0, to_reference / from_reference)
+    return {account: balances[account] * factor for account, factor in zip(accounts, factors)}
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_spending_hierarchy(_data, dataset_version, month):
+    """Aggregate expenses into an Account → Category → Subcategory tree.
+
+    A single groupby produces the leaf totals and the category, account and
+    root rollups are summed from those leaves, so every node satisfies
+    ``branchvalues="total"``. Results are cached per (dataset_version, month)."""
+    levels = ['Account', 'Category', 'Subcategory']
+    expenses = _data[_data['Amount'] < 0]
+    if expenses.empty:
+        return pd.DataFrame(columns=['id', 'parent', 'label', 'value'])
+
+    keys = [expenses[col].fillna("Uncategorised").astype(str) for col in levels]
+    leaves = expenses['Amount'].abs().groupby(keys).sum()
+
+    frames = []
+    root_id = "All Accounts"
+    frames.append(pd.DataFrame({'id': [root_id], 'parent': [""], 'label': [root_id], 'value': [leaves.sum()]}))
+
+    # Roll the leaf totals up one level at a time; ids are the joined path
+    for depth in range(1, len(levels) + 1):
+        totals = leaves if depth == len(levels) else leaves.groupby(level=list(range(depth))).sum()
+        index = totals.index.to_frame(index=False).iloc[:, :depth]
+        ids = index.iloc[:, 0]
+        for col in range(1, depth):
+            ids = ids + " › " + index.iloc[:, col]
+        if depth == 1:
+            parents = pd.Series(root_id, index=index.index)
+        else:
+            parents = index.iloc[:, 0]
+            for col in range(1, depth - 1):
+                parents = parents + " › " + index.iloc[:, col]
+        frames.append(pd.DataFrame({
+            'id': ids.values,
+            'parent': parents.values,
+            'label': index.iloc[:, depth - 1].values,
+            'value': totals.values
+        }))
+
+    return pd.concat(frames, ignore_index=True)
+
+# Intervals the recurring-payment detector looks for: (name, days, tolerance in days, payments per year)
+RECURRING_CADENCES = [
+    ("Weekly", 7, 1, 52),
+    ("Fortnightly", 14, 2, 26),
+    ("Monthly", 30.44, 4, 12),
+    ("Annual", 365.25, 7, 1)
+]
+
+def normalise_descriptions(descriptions):
+    """Reduce transaction descriptions to a comparable key (lowercase, no digits or punctuation).
+    The string work is done once per unique description and mapped back to every row."""
+    codes, uniques = pd.factorize(descriptions.fillna("").astype(str))
+    cleaned = (
+        pd.Series(uniques, dtype=object).str.lower()
+        .str.replace(r"[^a-z]+", " ", regex=True)
+        .str.strip()
+    )
+    return pd.Series(cleaned.to_numpy()[codes], index=descriptions.index)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def detect_recurring_transactions(_data, dataset_version, min_occurrences=3):
+    """Find subscriptions and regular bills in the transactions.
+
+    Transactions are grouped by normalised description and a ~10% wide amount
+    band. Each group's date gaps are computed with one sorted diff, its median
+    gap is matched against RECURRING_CADENCES, and groups where most gaps are
+    within tolerance are reported with their next expected date and annualised
+    cost. Results are cached per dataset_version."""
+    result_cols = ['Description', 'Cadence', 'Typical Amount', 'Payments', 'Last Date',
+                   'Next Expected', 'Annualised', 'Regularity', 'Active']
+    tx = pd.DataFrame({
+        'Key': normalise_descriptions(_data['Description']),
+        'Description': _data['Description'],
+        'Date': _data['Date'].dt.normalize(),
+        'Amount': _data['Amount']
+    }).dropna(subset=['Date', 'Amount'])
+    tx = tx[(tx['Amount'] != 0) & (tx['Key'] != "")]
+    if tx.empty:
+        return pd.DataFrame(columns=result_cols)
+
+    # Signed log-scale band so price changes of a few percent stay in one series
+    tx['Band'] = np.sign(tx['Amount']) * np.round(np.log(tx['Amount'].abs()) / np.log(1.1))
+    tx = tx.drop_duplicates(subset=['Key', 'Band', 'Date']).sort_values(['Key', 'Band', 'Date'])
+
+    # Gap in days to the previous payment of the same series
+    tx['Group'] = tx.groupby(['Key', 'Band'], sort=False).ngroup()
+    first_in_group = tx['Group'].ne(tx['Group'].shift())
+    tx['Gap'] = tx['Date'].diff().dt.days.mask(first_in_group)
+
+    series = tx.groupby('Group').agg(
+        Description=('Description', 'first'),
+        Payments=('Date', 'size'),
+        LastDate=('Date', 'max'),
+        Amount=('Amount', 'mean'),
+        MedianGap=('Gap', 'median')
+    )
+    series = series[series['Payments'] >= 2]
 
-def get_monthly_delta(account, data):
-    """Calculate the monthly delta for an account to display correctly colored metrics."""
-    if not data.empty and account in data['Account'].unique():
-        latest_month = data['Month'].max()
-        month_data = data[(data['Month'] == latest_month) & (data['Account'] == account)]
-        return month_data['Amount'].sum()
-    return 0
+    # Match each series' median gap to a cadence
+    names = np.array([c[0] for c in RECURRING_CADENCES] + [""], dtype=object)
+    days = np.array([c[1] for c in RECURRING_CADENCES] + [np.nan])
+    tolerance = np.array([c[2] for c in RECURRING_CADENCES] + [np.nan])
+    per_year = np.array([c[3] for c in RECURRING_CADENCES] + [np.nan])
+    matches = [(series['MedianGap'] - d).abs() <= tol for _, d, tol, _ in RECURRING_CADENCES]
+    cadence_idx = pd.Series(np.select(matches, range(len(RECURRING_CADENCES)), default=len(RECURRING_CADENCES)), index=series.index)
+
+    # Share of gaps that fall within the matched cadence's tolerance
+    row_cadence = tx['Group'].map(cadence_idx)
+    valid_rows = row_cadence.notna() & tx['Gap'].notna()
+    row_cadence = row_cadence[valid_rows].astype(int).to_numpy()
+    on_time = (tx.loc[valid_rows, 'Gap'] - days[row_cadence]).abs() <= tolerance[row_cadence]
+    regularity = on_time.groupby(tx.loc[valid_rows, 'Group']).mean()
+
+    series['Cadence'] = names[cadence_idx.to_numpy()]
+    series['CadenceDays'] = days[cadence_idx.to_numpy()]
+    series['Regularity'] = regularity.reindex(series.index).fillna(0)
+    series['PerYear'] = per_year[cadence_idx.to_numpy()]
+    required = np.where(series['Cadence'] == "Annual", 2, min_occurrences)
+    series = series[(series['Cadence'] != "") & (series['Payments'] >= required) & (series['Regularity'] >= 0.75)]
+    if series.empty:
+        return pd.DataFrame(columns=result_cols)
+
+    # Calendar-aware next date for monthly and annual series, fixed offset for the rest
+    next_expected = series['LastDate'] + pd.to_timedelta(series['CadenceDays'].round(), unit='D')
+    monthly = series['Cadence'] == "Monthly"
+    annual = series['Cadence'] == "Annual"
+    next_expected[monthly] = series.loc[monthly, 'LastDate'] + pd.DateOffset(months=1)
+    next_expected[annual] = series.loc[annual, 'LastDate'] + pd.DateOffset(years=1)
+
+    latest_date = tx['Date'].max()
+    result = pd.DataFrame({
+        'Description': series['Description'],
+        'Cadence': series['Cadence'],
+        'Typical Amount': series['Amount'].round(2),
+        'Payments': series['Payments'],
+        'Last Date': series['LastDate'],
+        'Next Expected': next_expected,
+        'Annualised': (series['Amount'] * series['PerYear']).round(2),
+        'Regularity': (series['Regularity'] * 100).round(1),
+        # Still running if the next payment isn't more than half a cycle overdue
+        'Active': series['LastDate'] + pd.to_timedelta(series['CadenceDays'] * 1.5, unit='D') >= latest_date
+    })
+    return result.sort_values('Annualised').reset_index(drop=True)
+
+# Transactions a merchant needs before this one for its amounts to be judged unusual
+ANOMALY_MIN_HISTORY = 10
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def detect_spending_anomalies(_data, dataset_version, window=30, threshold=3.0, min_history=ANOMALY_MIN_HISTORY):
+    """Flag unusual spending days per category and unusually large transactions per merchant.
+
+    Daily spend is pivoted into a (day × category) matrix and compared with a
+    rolling median/std over the preceding `window` days, computed for all
+    categories at once. Transactions are compared with their merchant's median
+    amount using a robust (MAD based) z-score of log amounts, and only once the
+    merchant has `min_history` earlier transactions. Returns (anomalous_days,
+    anomalous_transactions), cached per (dataset_version, window, threshold, min_history)."""
+    expenses = _data[(_data['Amount'] < 0) & _data['Date'].notna()]
+    day_cols = ['Date', 'Category', 'Spend', 'Baseline', 'Score']
+    tx_cols = ['Date', 'Account', 'Category', 'Description', 'Amount', 'Typical Amount', 'Score']
+    if expenses.empty:
+        return pd.DataFrame(columns=day_cols), pd.DataFrame(columns=tx_cols)
+
+    spend = expenses['Amount'].abs()
+
+    # Day × category matrix, with zero-spend days filled in so the windows are calendar based
+    daily = spend.groupby([expenses['Date'].dt.normalize(), expenses['Category'].fillna("Uncategorised")]).sum().unstack(fill_value=0)
+    daily = daily.asfreq('D', fill_value=0)
+
+    # Baseline only uses the days before each day, so a spike can't hide itself
+    history = daily.shift(1).rolling(window, min_periods=max(7, window // 3))
+    baseline = history.median()
+    spread = history.std()
+    score = (daily - baseline) / spread.where(spread > 0)
+    flagged = (score > threshold) & (daily > 0)
+
+    flagged_idx = flagged.stack()
+    flagged_idx = flagged_idx[flagged_idx].index
+    anomalous_days = pd.DataFrame({
+        'Spend': daily.stack().loc[flagged_idx],
+        'Baseline': baseline.stack().loc[flagged_idx],
+        'Score': score.stack().loc[flagged_idx]
+    }).rename_axis(['Date', 'Category']).reset_index()
+    anomalous_days = anomalous_days.sort_values('Date', ascending=False).reset_index(drop=True)
+
+    # Per-merchant robust z-score of log amounts, since spending at a merchant is
+    # right-skewed (a raw-amount score flags every ordinary large purchase); the
+    # scale is floored at 0.05 (about 5%) so fixed-price merchants (zero MAD)
+    # only flag genuinely different amounts
+    merchant = normalise_descriptions(expenses['Description'])
+    log_spend = np.log1p(spend)
+    by_merchant = log_spend.groupby(merchant)
+    typical = by_merchant.transform('median')
+    mad = (log_spend - typical).abs().groupby(merchant).transform('median')
+    scale = np.maximum(1.4826 * mad, 0.05)
+    tx_score = (log_spend - typical) / scale
+
+    # Earlier transactions at the same merchant, counted in date order
+    prior = expenses['Date'].groupby(merchant).rank(method='first') - 1
+    tx_flagged = (prior >= min_history) & (tx_score > threshold)
+
+    anomalous_tx = expenses.loc[tx_flagged, ['Date', 'Account', 'Category', 'Description', 'Amount']].assign(
+        **{'Typical Amount': -np.expm1(typical[tx_flagged]), 'Score': tx_score[tx_flagged]}
+    )
+    anomalous_tx = anomalous_tx.sort_values('Date', ascending=False).reset_index(drop=True)
+
+    return anomalous_days, anomalous_tx
+
+@st.cache_data(show_spinner=False)
+def load_account_registry(path, modified_time):
+    """Load the account registry CSV into a frame indexed by account name.
+    `modified_time` is only part of the cache key so edits to the file are picked up."""
+    registry = pd.read_csv(path, dtype={'Name': str, 'Group': str, 'Axis': str, 'Currency': str})
+    missing = [col for col in ACCOUNT_COLUMNS if col not in registry.columns]
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+    registry = registry.dropna(subset=['Name']).drop_duplicates(subset='Name', keep='last')
+    registry['OpeningBalance'] = pd.to_numeric(registry['OpeningBalance'], errors='coerce').fillna(0.0)
+    registry['OpeningDate'] = pd.to_datetime(registry['OpeningDate'], format="%d/%m/%Y", errors='coerce')
+    registry['Group'] = registry['Group'].fillna("Ungrouped")
+    registry['Axis'] = registry['Axis'].fillna("primary").str.lower().where(lambda axis: axis.isin(["primary", "secondary"]), "primary")
+    registry['Currency'] = registry['Currency'].fillna(RATE_REFERENCE_CURRENCY).str.upper().str.strip()
+    return registry.set_index('Name')[ACCOUNT_COLUMNS[1:]]
+
+def get_account_registry(data):
+    """Return the account registry, with any account seen in the transactions but
+    not in ACCOUNTS_FILE added using a zero opening balance and default settings."""
+    registry = pd.DataFrame(columns=ACCOUNT_COLUMNS[1:]).rename_axis('Name')
+    if os.path.exists(ACCOUNTS_FILE):
+        try:
+            registry = load_account_registry(ACCOUNTS_FILE, os.path.getmtime(ACCOUNTS_FILE))
+        except Exception as e:
+            st.sidebar.error(f"Error loading account registry: {e}")
+
+    unregistered = pd.Index(data['Account'].dropna().unique()).difference(registry.index)
+    if len(unregistered):
+        defaults = pd.DataFrame({
+            'OpeningBalance': 0.0,
+            'OpeningDate': pd.NaT,
+            'Group': "Ungrouped",
+            'Axis': "primary",
+            'Currency': RATE_REFERENCE_CURRENCY
+        }, index=unregistered.rename('Name'))
+        registry = pd.concat([registry, defaults]) if not registry.empty else defaults
+    return registry
+
+def summarise_account_balances(data, registry, opening_balances):
+    """Current balance and latest-month change for every registered account in one pass.
+
+    Transactions dated before an account's OpeningDate are already included in
+    its opening balance and are ignored."""
+    opening_dates = data['Account'].map(registry['OpeningDate'])
+    counted = data[~(data['Date'] < opening_dates)]
+    totals = counted.groupby('Account')['Amount'].sum()
+    latest_month = data['Month'].max()
+    month_change = counted[counted['Month'] == latest_month].groupby('Account')['Amount'].sum()
+
+    summary = pd.DataFrame({'Opening': pd.Series(opening_balances)}, index=registry.index)
+    summary['Balance'] = summary['Opening'].fillna(0) + totals.reindex(registry.index, fill_value=0)
+    summary['MonthChange'] = month_change.reindex(registry.index, fill_value=0)
+    summary['Group'] = registry['Group']
+    return summary
+
+def build_balance_history(data, registry, opening_balances):
+    """Daily running balance per account as a long (Account, Date, Balance) frame.
+
+    One groupby gives the daily totals and a grouped cumsum turns them into
+    running balances for every account at once. Each account starts with a
+    point at its opening date (or the day before its first transaction)."""
+    opening_dates = data['Account'].map(registry['OpeningDate'])
+    counted = data[~(data['Date'] < opening_dates)]
+    daily = counted.groupby(['Account', 'Date'])['Amount'].sum()
+    opening = pd.Series(opening_balances).reindex(registry.index).fillna(0)
+
+    history = daily.groupby(level='Account').cumsum().reset_index(name='Balance')
+    history['Balance'] += history['Account'].map(opening).to_numpy()
+
+    first_dates = history.groupby('Account')['Date'].min().reindex(registry.index)
+    start_dates = registry['OpeningDate'].fillna(first_dates - pd.Timedelta(days=1)).fillna(data['Date'].min() - pd.Timedelta(days=1))
+    starts = pd.DataFrame({'Account': registry.index, 'Date': start_dates.to_numpy(), 'Balance': opening.to_numpy()})
+
+    history = pd.concat([starts, history], ignore_index=True)
+    return history.sort_values(['Account', 'Date'], kind='stable').reset_index(drop=True)
 
 def check_achievements(data, month=None):
     """Check which achievements have been met for the given month."""
@@ -161,14 +534,43 @@ def main():
     if st.sidebar.button("🔄 Refresh Data"):
         st.rerun()
         
-    # Load data from uploaded file
-    data = load_uploaded_csv(uploaded_file)
+    # Load data from uploaded file; until there is one, nothing needs pandas
+    data = load_uploaded_csv(uploaded_file) if uploaded_file is not None else None
+    dataset_version = get_dataset_version(uploaded_file)
     
-    if data.empty:
+    if data is None or data.empty:
         st.warning("No valid CSV file uploaded. Please upload a CSV file containing your transactions.")
         st.info("CSV file should contain columns: Date, Account, Category, Subcategory, Description, and Amount")
         return
     
+    # Accounts come from the registry file; unregistered accounts get defaults
+    registry = get_account_registry(data)
+    account_currencies = registry['Currency'].to_dict()
+    
+    # Currency settings: every view below reports in the chosen base currency
+    st.sidebar.markdown("---")
+    st.sidebar.markdown("### Currency")
+    rates, rates_version = get_exchange_rates()
+    used_currencies = set(account_currencies.values())
+    base_options = sorted({RATE_REFERENCE_CURRENCY} | set(rates['Currency']) | used_currencies)
+    base_currency = st.sidebar.selectbox("Report Currency", options=base_options, index=base_options.index(RATE_REFERENCE_CURRENCY), key="base_currency")
+    cur = CURRENCY_SYMBOLS.get(base_currency, f"{base_currency} ")
+    
+    missing_rates = (used_currencies | {base_currency}) - set(rates['Currency']) - {RATE_REFERENCE_CURRENCY}
+    if missing_rates and used_currencies != {base_currency}:
+        st.sidebar.warning(f"No exchange rates for {', '.join(sorted(missing_rates))} in {EXCHANGE_RATES_FILE}; those amounts can't be converted.")
+    
+    currency_key = tuple(sorted(account_currencies.items()))
+    data = convert_to_base_currency(data, dataset_version, currency_key, base_currency, rates, rates_version)
+    dataset_version = (dataset_version, base_currency, currency_key, rates_version)
+    
+    # Opening balances converted at the rate in force on each account's opening
+    # date, or the day before the first transaction when it has none
+    opening_dates = registry['OpeningDate'].fillna(data['Date'].min() - pd.Timedelta(days=1))
+    opening_balances = convert_balances(
+        registry['OpeningBalance'].to_dict(), account_currencies, base_currency, rates, opening_dates.to_dict()
+    )
+    
     st.sidebar.markdown("---")
     st.sidebar.markdown("### Recent Activity Settings")
     end_date = st.sidebar.date_input(
@@ -178,7 +580,7 @@ def main():
     )
     
     # Create tabs
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Dashboard", "Transactions", "Achievements", "Accounts", "Recent Activity"])
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(["Dashboard", "Transactions", "Achievements", "Accounts", "Recent Activity", "Recurring", "Anomalies"])
     
     # Tab 1: Dashboard
     with tab1:
@@ -202,15 +604,15 @@ def main():
         
         with col1:
             total_income = filtered_data[filtered_data['Amount'] > 0]['Amount'].sum()
-            st.metric("Total Income", f"${total_income:,.2f}")
+            st.metric("Total Income", f"{cur}{total_income:,.2f}")
         
         with col2:
             total_expenses = filtered_data[filtered_data['Amount'] < 0]['Amount'].sum()
-            st.metric("Total Expenses", f"${abs(total_expenses):,.2f}")
+            st.metric("Total Expenses", f"{cur}{abs(total_expenses):,.2f}")
         
         with col3:
             net = total_income + total_expenses  # total_expenses is negative
-            st.metric("Net", f"${net:,.2f}", delta=f"${net:,.2f}")
+            st.metric("Net", f"{cur}{net:,.2f}", delta=f"{cur}{net:,.2f}")
         
         # Category visualization
         st.markdown('<div class="section-header">Spending by Category</div>', unsafe_allow_html=True)
@@ -222,45 +624,42 @@ def main():
         fig_categories = px.bar(
             x=category_totals.index,
             y=category_totals.values,
-            labels={'x': 'Category', 'y': 'Total Spent ($)'},
+            labels={'x': 'Category', 'y': f'Total Spent ({base_currency})'},
             title='Spending by Category',
             color=category_totals.values,
             color_continuous_scale='Viridis'
         )
-        st.plotly_chart(fig_categories, use_container_width=True)
+        st.plotly_chart(fig_categories, width="stretch")
         
         with st.expander("Subcategory Breakdown",expanded=False):
-            # Add subcategory drill-down
-            if not category_totals.empty:
-                
-                # Select a category to drill down into
-                category_options = sorted(filtered_data['Category'].unique())
-                selected_drill_category = st.selectbox("Select Category to Drill Down", options=category_options)
-                
-                # Filter data for the selected category
-                category_data = filtered_data[filtered_data['Category'] == selected_drill_category]
-                
-                # Get subcategory totals
-                subcategory_totals = category_data[category_data['Amount'] < 0].groupby('Subcategory')['Amount'].sum().abs()
-                
-                # Create a figure with both the category total and subcategory breakdown
-                fig_subcategories = px.bar(
-                    x=subcategory_totals.index,
-                    y=subcategory_totals.values,
-                    labels={'x': 'Subcategory', 'y': f'Total Spent in {selected_drill_category} ($)'},
-                    title=f'Spending by Subcategory within {selected_drill_category}',
-                    color=subcategory_totals.values,
-                    color_continuous_scale='Viridis'
+            # Account → Category → Subcategory tree; drilling down happens in the browser
+            hierarchy = build_spending_hierarchy(filtered_data, dataset_version, selected_month)
+            
+            if not hierarchy.empty:
+                hierarchy_args = dict(
+                    ids=hierarchy['id'],
+                    labels=hierarchy['label'],
+                    parents=hierarchy['parent'],
+                    values=hierarchy['value'],
+                    branchvalues='total',
+                    hovertemplate='<b>%{label}</b><br>' + cur + '%{value:,.2f}<br>%{percentParent:.1%} of parent<extra></extra>'
                 )
                 
-                # Add a line for the category total
-                category_total = abs(category_data[category_data['Amount'] < 0]['Amount'].sum())
+                sunburst_tab, treemap_tab = st.tabs(["Sunburst", "Treemap"])
+                
+                with sunburst_tab:
+                    fig_sunburst = go.Figure(go.Sunburst(**hierarchy_args))
+                    fig_sunburst.update_layout(title='Spending by Account, Category and Subcategory', margin=dict(t=40, l=0, r=0, b=0), height=600)
+                    st.plotly_chart(fig_sunburst, width="stretch")
                 
-                # Display the charts
-                st.plotly_chart(fig_subcategories, use_container_width=True)
+                with treemap_tab:
+                    fig_treemap = go.Figure(go.Treemap(**hierarchy_args))
+                    fig_treemap.update_layout(title='Spending by Account, Category and Subcategory', margin=dict(t=40, l=0, r=0, b=0), height=600)
+                    st.plotly_chart(fig_treemap, width="stretch")
                 
-                # Show the total spent in this category
-                st.metric(f"Total Spent in {selected_drill_category}", f"${category_total:,.2f}")
+                st.caption("Click a segment to drill down; click the centre (or the path bar) to go back up.")
+            else:
+                st.info("No expense transactions in the selected period.")
         
         # Time series visualization
         st.markdown('<div class="section-header">Spending Over Time</div>', unsafe_allow_html=True)
@@ -284,7 +683,7 @@ def main():
             fig_time = px.line(
                 x=daily_totals.index,
                 y=daily_totals.values,
-                labels={'x': 'Date', 'y': 'Amount ($)'},
+                labels={'x': 'Date', 'y': f'Amount ({base_currency})'},
                 title=f'{"All Categories" if selected_category == "All" else selected_category} - Cumulative Totals'
             )
             
@@ -294,7 +693,7 @@ def main():
                 dtick="D1"  # Daily ticks
             )
             
-            st.plotly_chart(fig_time, use_container_width=True)
+            st.plotly_chart(fig_time, width="stretch")
         else:
             st.info(f"No data available for {selected_category} in the selected time period.")
     
@@ -339,19 +738,19 @@ def main():
         # Custom formatter for negative amounts
         def format_amount(val):
             if val < 0:
-                return f'-${abs(val):,.2f}'
+                return f'-{cur}{abs(val):,.2f}'
             else:
-                return f'${val:,.2f}'
+                return f'{cur}{val:,.2f}'
         
         # Apply formatting and show dataframe
-        styled_df = filtered_trans[['Date', 'Account', 'Category', 'Subcategory', 'Description', 'Amount']].style.applymap(
+        styled_df = filtered_trans[['Date', 'Account', 'Category', 'Subcategory', 'Description', 'Amount']].style.map(
             color_amount, subset=['Amount']
         ).format({
             'Amount': format_amount, 
             'Date': '{:%Y-%m-%d}'
         })
         
-        st.dataframe(styled_df, use_container_width=True)
+        st.dataframe(styled_df, width="stretch")
     
         def check_achievements(data, month=None):
             """Check which achievements have been met for the given month."""
@@ -430,8 +829,8 @@ def main():
                 st.markdown(f"""
                 <div class="{card_class}">
                     <h3>{achievement["icon"]} {achievement["name"]}</h3>
-                    <p>Target: Keep {achievement["category"]} spending under ${achievement["target"]}</p>
-                    <p>Current: ${achievement["spent"]:.2f} ({100 - achievement["progress"]:.1f}% to goal)</p>
+                    <p>Target: Keep {achievement["category"]} spending under {cur}{achievement["target"]}</p>
+                    <p>Current: {cur}{achievement["spent"]:.2f} ({100 - achievement["progress"]:.1f}% to goal)</p>
                     <div style="background-color: #E5E7EB; border-radius: 5px; height: 20px; width: 100%;">
                         <div style="background-color: {'#10B981' if achievement["completed"] else '#60A5FA'}; 
                                     width: {100 - achievement["progress"]}%; 
@@ -446,176 +845,111 @@ def main():
     with tab4:
         st.markdown('<div class="section-header">Account Balances</div>', unsafe_allow_html=True)
         
-        # Display account balances in 3 columns
+        account_summary = summarise_account_balances(data, registry, opening_balances)
+        
+        # Filter and paginate the metric grid so large registries stay readable
         col1, col2, col3 = st.columns(3)
+        with col1:
+            groups = ["All"] + sorted(account_summary['Group'].unique().tolist())
+            selected_group = st.selectbox("Account Group", options=groups, key="account_group")
+        with col2:
+            page_size = st.selectbox("Accounts per Page", options=[12, 24, 48], key="account_page_size")
         
-        # Map accounts to columns
-        account_cols = {
-            "Westpac Choice": col1,
-            "ANZ Access": col2,
-            "Westpac Offset": col3
-        }
+        if selected_group != "All":
+            account_summary = account_summary[account_summary['Group'] == selected_group]
         
-        # Display account balances with transactions factored in
-        for account in st.session_state.account_balances:
-            current_balance = get_account_balance(account, data)
+        page_count = max(1, -(-len(account_summary) // page_size))
+        with col3:
+            page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key="account_page")
+        page = min(page, page_count)
+        page_accounts = account_summary.iloc[(page - 1) * page_size:page * page_size]
+        
+        # Display account balances with transactions factored in, four per row
+        grid_columns = 4
+        for row_start in range(0, len(page_accounts), grid_columns):
+            cols = st.columns(grid_columns)
+            for col, (account, row) in zip(cols, page_accounts.iloc[row_start:row_start + grid_columns].iterrows()):
+                with col:
+                    month_change = row['MonthChange']
+                    # Format negative changes properly
+                    delta_text = f"-{cur}{abs(month_change):,.2f} this month" if month_change < 0 else f"{cur}{month_change:,.2f} this month"
+                    
+                    # For account balances, negative changes should be red (normal) and positive should be green (normal)
+                    st.metric(
+                        label=account,
+                        value=f"{cur}{row['Balance']:,.2f}",
+                        delta=delta_text,
+                        delta_color="normal"  # Normal coloring: negative is red, positive is green
+                    )
+        
+        if page_count > 1:
+            st.caption(f"Showing {len(page_accounts)} of {len(account_summary)} accounts (page {page} of {page_count})")
+        
+        if not registry.empty and not data.empty:
+            st.markdown('<div class="section-header">Balance History</div>', unsafe_allow_html=True)
             
-            # Calculate monthly change
-            month_change = get_monthly_delta(account, data)
+            history = build_balance_history(data, registry, opening_balances)
+            if selected_group != "All":
+                history = history[history['Account'].isin(account_summary.index)]
             
-            # Display in the appropriate column
-            if account in account_cols:
-                col = account_cols[account]
-            else:
-                # Fallback for any new accounts
-                col = col1
+            # One WebGL trace per account, grouped in the legend by account group
+            fig = go.Figure()
+            axis_names = {"primary": "y", "secondary": "y2"}
+            for (group, account), account_data in history.assign(Group=history['Account'].map(registry['Group'])).groupby(['Group', 'Account'], sort=True):
+                fig.add_trace(go.Scattergl(
+                    x=account_data['Date'],
+                    y=account_data['Balance'],
+                    mode='lines',
+                    name=account,
+                    legendgroup=group,
+                    legendgrouptitle_text=group,
+                    yaxis=axis_names[registry.at[account, 'Axis']],
+                    hovertemplate='%{x|%Y-%m-%d}<br>Balance: ' + cur + '%{y:,.2f}<extra>' + account + '</extra>'
+                ))
             
-            with col:
-                # Format negative changes properly
-                delta_text = f"-${abs(month_change):,.2f} this month" if month_change < 0 else f"${month_change:,.2f} this month"
-                
-                # For account balances, negative changes should be red (normal) and positive should be green (normal)
-                st.metric(
-                    label=account,
-                    value=f"${current_balance:,.2f}",
-                    delta=delta_text,
-                    delta_color="normal"  # Normal coloring: negative is red, positive is green
-                )
-        
-        if st.session_state.account_balances and not data.empty:
-            st.markdown('<div class="section-header">Balance History</div>', unsafe_allow_html=True)
+            has_secondary = (registry.loc[history['Account'].unique(), 'Axis'] == "secondary").any()
             
-            # Create data for plotting account balances over time
-            regular_accounts_df = pd.DataFrame()
-            offset_account_df = pd.DataFrame()
-            
-            # Get all dates from the data
-            all_dates = sorted(data['Date'].unique())
-            
-            if all_dates:
-                # Process each account
-                for account in st.session_state.account_balances:
-                    # Skip empty accounts
-                    if not account:
-                        continue
-                        
-                    # Get starting balance
-                    initial_balance = st.session_state.account_balances[account]
-                    
-                    # Create a series for this account
-                    account_data = pd.DataFrame({
-                        'Date': [all_dates[0] - pd.Timedelta(days=1)],  # Day before first transaction
-                        'Balance': [initial_balance],
-                        'Account': [account]
-                    })
-                    
-                    # Filter transactions for this account
-                    account_transactions = data[data['Account'] == account].copy()
-                    
-                    if not account_transactions.empty:
-                        # Sort by date
-                        account_transactions = account_transactions.sort_values('Date')
-                        
-                        # Calculate running balance
-                        running_balance = initial_balance
-                        daily_balances = []
-                        
-                        # Group by date and calculate daily balance
-                        daily_sums = account_transactions.groupby('Date')['Amount'].sum()
-                        
-                        for date, amount in daily_sums.items():
-                            running_balance += amount
-                            daily_balances.append({
-                                'Date': date,
-                                'Balance': running_balance,
-                                'Account': account
-                            })
-                        
-                        # Add daily balances to the account data
-                        if daily_balances:
-                            account_data = pd.concat([
-                                account_data,
-                                pd.DataFrame(daily_balances)
-                            ])
-                    
-                    # Add to appropriate dataframe based on account type
-                    if account == "Westpac Offset":
-                        offset_account_df = pd.concat([offset_account_df, account_data])
-                    else:
-                        regular_accounts_df = pd.concat([regular_accounts_df, account_data])
-                
-                # Create figure
-                fig = go.Figure()
-                
-                # Add traces for regular accounts
-                if not regular_accounts_df.empty:
-                    for account in regular_accounts_df['Account'].unique():
-                        account_data = regular_accounts_df[regular_accounts_df['Account'] == account]
-                        fig.add_trace(go.Scatter(
-                            x=account_data['Date'],
-                            y=account_data['Balance'],
-                            mode='lines+markers',
-                            name=account,
-                            hovertemplate='%{x}<br>Balance: $%{y:,.2f}'
-                        ))
-                
-                # Add trace for Westpac Offset on secondary y-axis
-                if not offset_account_df.empty:
-                    fig.add_trace(go.Scatter(
-                        x=offset_account_df['Date'],
-                        y=offset_account_df['Balance'],
-                        mode='lines+markers',
-                        name="Westpac Offset",
-                        yaxis="y2",
-                        line=dict(color='green', width=3),
-                        hovertemplate='%{x}<br>Balance: $%{y:,.2f}'
-                    ))
-                
-                # Update layout
-                fig.update_layout(
-                    title='Account Balance History',
-                    xaxis_title='Date',
-                    yaxis=dict(
-                        title=dict(text='Regular Account Balance ($)', font=dict(color='royalblue')),
-                        tickfont=dict(color='royalblue'),
-                        tickprefix='$',
-                        tickformat=',.2f',
-                        showgrid=True,
-                        zeroline=False
-                    ),
-                    yaxis2=dict(
-                        title=dict(text='Offset Account Balance ($)', font=dict(color='green')),
-                        tickfont=dict(color='green'),
-                        tickprefix='$',
-                        tickformat=',.2f',
-                        anchor='x',
-                        overlaying='y',
-                        side='right',
-                        showgrid=False,
-                        zeroline=False
-                    ),
-                    legend_title='Accounts',
-                    hovermode='x unified'
-                )
-
-                fig.update_xaxes(
-                    dtick="D1",  # Daily ticks
-                    tickformat="%Y-%m-%d"  # Ensure dates appear without time
-                )
-                
-                # Show the chart
-                st.plotly_chart(fig, use_container_width=True)
-                
-                # Explanation of the chart
-                st.info("""
-                This chart shows your account balances over time:
-                - Regular accounts are shown on the left y-axis
-                - The Westpac Offset account is shown on the right y-axis with a different scale
-                - Each point represents the running balance after all transactions for that day
-                """)
-            else:
-                st.warning("No transaction data available. Please check your CSV files.")
-
+            # Update layout
+            fig.update_layout(
+                title='Account Balance History',
+                xaxis_title='Date',
+                yaxis=dict(
+                    title=dict(text=f'Balance ({base_currency})', font=dict(color='royalblue')),
+                    tickfont=dict(color='royalblue'),
+                    tickprefix=cur,
+                    tickformat=',.2f',
+                    showgrid=True,
+                    zeroline=False
+                ),
+                legend=dict(groupclick='toggleitem'),
+                hovermode='closest',
+                height=600
+            )
+            if has_secondary:
+                fig.update_layout(yaxis2=dict(
+                    title=dict(text=f'Secondary Axis Balance ({base_currency})', font=dict(color='green')),
+                    tickfont=dict(color='green'),
+                    tickprefix=cur,
+                    tickformat=',.2f',
+                    anchor='x',
+                    overlaying='y',
+                    side='right',
+                    showgrid=False,
+                    zeroline=False
+                ))
+            
+            fig.update_xaxes(tickformat="%Y-%m-%d")
+            
+            # Show the chart
+            st.plotly_chart(fig, width="stretch")
+            
+            # Explanation of the chart
+            st.info(f"""
+            This chart shows your account balances over time:
+            - Accounts are grouped in the legend by their group in {ACCOUNTS_FILE}; click an account to hide or show it, or double-click it to show only that account
+            - Accounts with `Axis` set to `secondary` are shown on the right y-axis with a different scale
+            - Each point represents the running balance after all transactions for that day
+            """)
 
     with tab5:
         st.markdown('<div class="section-header">Recent Activity (Past 7 Days)</div>', unsafe_allow_html=True)
@@ -641,15 +975,15 @@ def main():
             
             with col1:
                 period_income = recent_data[recent_data['Amount'] > 0]['Amount'].sum()
-                st.metric("Period Income", f"${period_income:,.2f}")
+                st.metric("Period Income", f"{cur}{period_income:,.2f}")
             
             with col2:
                 period_expenses = recent_data[recent_data['Amount'] < 0]['Amount'].sum()
-                st.metric("Period Expenses", f"${abs(period_expenses):,.2f}")
+                st.metric("Period Expenses", f"{cur}{abs(period_expenses):,.2f}")
             
             with col3:
                 period_net = period_income + period_expenses
-                st.metric("Period Net", f"${period_net:,.2f}", delta=f"${period_net:,.2f}")
+                st.metric("Period Net", f"{cur}{period_net:,.2f}", delta=f"{cur}{period_net:,.2f}")
             
             # Add filter for accounts in this view
             recent_accounts = ["All"] + sorted(recent_data['Account'].unique().tolist())
@@ -690,7 +1024,7 @@ def main():
                 barmode='group',
                 title='Daily Income and Expenses',
                 color_discrete_map={'Income': 'green', 'Expense': 'red'},
-                labels={'Value': 'Amount ($)', 'Date': 'Date', 'Type': ''}
+                labels={'Value': f'Amount ({base_currency})', 'Date': 'Date', 'Type': ''}
             )
             
             # Format x-axis to show only dates
@@ -701,11 +1035,11 @@ def main():
             
             # Format y-axis to show dollar amounts
             fig_daily.update_yaxes(
-                tickprefix='$',
+                tickprefix=cur,
                 tickformat=',.2f'
             )
             
-            st.plotly_chart(fig_daily, use_container_width=True)
+            st.plotly_chart(fig_daily, width="stretch")
             
             # Show transaction details
             st.markdown('<div class="section-header">Transaction Details</div>', unsafe_allow_html=True)
@@ -713,19 +1047,19 @@ def main():
             # Custom formatter for negative amounts
             def format_amount(val):
                 if val < 0:
-                    return f'-${abs(val):,.2f}'
+                    return f'-{cur}{abs(val):,.2f}'
                 else:
-                    return f'${val:,.2f}'
+                    return f'{cur}{val:,.2f}'
             
             # Apply formatting and show dataframe
-            styled_recent_df = filtered_recent[['Date', 'Account', 'Category', 'Subcategory', 'Description', 'Amount']].style.applymap(
+            styled_recent_df = filtered_recent[['Date', 'Account', 'Category', 'Subcategory', 'Description', 'Amount']].style.map(
                 color_amount, subset=['Amount']  # Reusing your existing color_amount function
             ).format({
                 'Amount': format_amount, 
                 'Date': '{:%Y-%m-%d}'
             })
             
-            st.dataframe(styled_recent_df, use_container_width=True)
+            st.dataframe(styled_recent_df, width="stretch")
             
             # Add a quick category breakdown
             st.markdown('<div class="section-header">Category Breakdown</div>', unsafe_allow_html=True)
@@ -750,12 +1084,130 @@ def main():
                 # Format hover information
                 fig_pie.update_traces(
                     textinfo='percent+label',
-                    hovertemplate='%{label}<br>$%{value:.2f}<br>%{percent}'
+                    hovertemplate='%{label}<br>' + cur + '%{value:.2f}<br>%{percent}'
                 )
                 
-                st.plotly_chart(fig_pie, use_container_width=True)
+                st.plotly_chart(fig_pie, width="stretch")
             else:
                 st.info("No expense transactions to show in the category breakdown.")
 
+    # Tab 6: Recurring payments
+    with tab6:
+        st.markdown('<div class="section-header">Recurring Payments &amp; Subscriptions</div>', unsafe_allow_html=True)
+        
+        recurring = detect_recurring_transactions(data, dataset_version)
+        
+        if recurring.empty:
+            st.info("No recurring payments detected. At least three regular payments (two for annual ones) are needed to spot a series.")
+        else:
+            show_inactive = st.checkbox("Include series that appear to have stopped", value=False, key="recurring_inactive")
+            if not show_inactive:
+                recurring = recurring[recurring['Active']]
+            
+            recurring_costs = recurring[recurring['Annualised'] < 0]
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Recurring Series", f"{len(recurring)}")
+            with col2:
+                st.metric("Annual Recurring Spend", f"{cur}{abs(recurring_costs['Annualised'].sum()):,.2f}")
+            with col3:
+                st.metric("Monthly Equivalent", f"{cur}{abs(recurring_costs['Annualised'].sum()) / 12:,.2f}")
+            
+            if not recurring_costs.empty:
+                top_costs = recurring_costs.head(25).assign(Cost=lambda df: df['Annualised'].abs())
+                fig_recurring = px.bar(
+                    top_costs,
+                    x='Cost',
+                    y='Description',
+                    color='Cadence',
+                    orientation='h',
+                    title='Annualised Cost of Recurring Payments',
+                    labels={'Cost': f'Annualised Cost ({base_currency})', 'Description': ''}
+                )
+                fig_recurring.update_layout(yaxis={'categoryorder': 'total ascending'})
+                st.plotly_chart(fig_recurring, width="stretch")
+            
+            st.dataframe(
+                recurring.drop(columns=['Active']),
+                width="stretch",
+                column_config={
+                    'Typical Amount': st.column_config.NumberColumn(format=f"{cur}%.2f"),
+                    'Annualised': st.column_config.NumberColumn(format=f"{cur}%.2f"),
+                    'Regularity': st.column_config.ProgressColumn(min_value=0, max_value=100, format="%.0f%%"),
+                    'Last Date': st.column_config.DateColumn(format="YYYY-MM-DD"),
+                    'Next Expected': st.column_config.DateColumn(format="YYYY-MM-DD")
+                }
+            )
+
+    # Tab 7: Anomalies
+    with tab7:
+        st.markdown('<div class="section-header">Unusual Spending</div>', unsafe_allow_html=True)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            anomaly_window = st.slider("Baseline window (days)", min_value=14, max_value=90, value=30, step=1, key="anomaly_window")
+        with col2:
+            anomaly_threshold = st.slider("Sensitivity (standard deviations)", min_value=2.0, max_value=6.0, value=3.0, step=0.5, key="anomaly_threshold")
+        
+        anomalous_days, anomalous_tx = detect_spending_anomalies(data, dataset_version, anomaly_window, anomaly_threshold)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Unusual Category Days", f"{len(anomalous_days)}")
+        with col2:
+            st.metric("Unusual Transactions", f"{len(anomalous_tx)}")
+        
+        st.markdown('<div class="section-header">Category Spending Spikes</div>', unsafe_allow_html=True)
+        
+        if anomalous_days.empty:
+            st.info("No category had a day far above its usual spending.")
+        else:
+            fig_anomalies = px.scatter(
+                anomalous_days,
+                x='Date',
+                y='Spend',
+                color='Category',
+                size='Score',
+                hover_data={'Baseline': ':,.2f', 'Score': ':.1f'},
+                title=f'Days more than {anomaly_threshold:g} standard deviations above the {anomaly_window}-day median',
+                labels={'Spend': f'Spent ({base_currency})'}
+            )
+            fig_anomalies.update_yaxes(tickprefix=cur, tickformat=',.2f')
+            st.plotly_chart(fig_anomalies, width="stretch")
+            
+            st.dataframe(
+                anomalous_days,
+                width="stretch",
+                column_config={
+                    'Date': st.column_config.DateColumn(format="YYYY-MM-DD"),
+                    'Spend': st.column_config.NumberColumn(format=f"{cur}%.2f"),
+                    'Baseline': st.column_config.NumberColumn("Usual Daily Spend", format=f"{cur}%.2f"),
+                    'Score': st.column_config.NumberColumn(format="%.1f")
+                }
+            )
+        
+        st.markdown('<div class="section-header">Unusually Large Transactions</div>', unsafe_allow_html=True)
+        
+        if anomalous_tx.empty:
+            st.info("No transaction was far above that merchant's usual amount.")
+        else:
+            st.dataframe(
+                anomalous_tx,
+                width="stretch",
+                column_config={
+                    'Date': st.column_config.DateColumn(format="YYYY-MM-DD"),
+                    'Amount': st.column_config.NumberColumn(format=f"{cur}%.2f"),
+                    'Typical Amount': st.column_config.NumberColumn(format=f"{cur}%.2f"),
+                    'Score': st.column_config.NumberColumn(format="%.1f")
+                }
+            )
+
 if __name__ == "__main__":
     main()
+    
+    # Startup timing for this process; ?startup_report in the URL shows it
+    app_startup.mark_first_render("budget_app")
+    if "startup_report" in st.query_params:
+        with st.sidebar.expander("⏱️ Startup report", expanded=True):
+            st.json(app_startup.startup_report())
@@ -0,0 +1,303 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+import habit_archive
+import habit_matrix
+import habit_store
+import habit_streaks
+
+# Data preparation for habit_tracker.py's Analytics views
+#
+# Every function takes a profile (a habit_profiles.Profile or anything with its
+# `habits`, `completion_bits` and archive fields) first, so the app can memoise
+# results per data version and the benchmarks can time them without running
+# Streamlit.
+
+# Analytics results kept per profile, least recently used dropped first
+MAX_CACHED_VIEWS = 32
+
+# Pairs of habits tracked together on fewer days than this get no correlation
+MIN_SHARED_DAYS = 14
+
+# Pair measures by name: (title, habit_pairs key of the days each value was
+# counted over, colour scale, zmin, zmax, hover template with those days as customdata)
+PAIR_MEASURES = {
+    "correlation": (
+        "Same-day correlation", "days", "RdBu", -1, 1,
+        "%{y} & %{x}<br>Correlation %{z:.2f} over %{customdata} days<extra></extra>"
+    ),
+    "next_day": (
+        "Next-day correlation", "next_days", "RdBu", -1, 1,
+        "%{y}, then %{x} the next day<br>Correlation %{z:.2f} over %{customdata} days<extra></extra>"
+    ),
+    "co_occurrence": (
+        "Co-occurrence", "done", [[0, '#f5f5f5'], [1, '#1E88E5']], 0, 1,
+        "%{x} was also done on %{z:.0%} of the %{customdata} days %{y} was done<extra></extra>"
+    )
+}
+
+def cached_view(profile, view, params, build):
+    """Return `build(profile, *params)`, memoised by (view, data version, day, params).
+
+    Results live in the profile's bounded LRU cache; storing one drops those
+    from older data versions, which can never be hit again. The day is part
+    of the key because windows and current streaks end today."""
+    with profile.lock:
+        cache = profile.analytics_cache
+        key = (view, profile.data_version, date.today().toordinal()) + tuple(params)
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        result = cache[key] = build(profile, *params)
+        for stale in [old for old in cache if old[1] != profile.data_version]:
+            del cache[stale]
+        while len(cache) > MAX_CACHED_VIEWS:
+            cache.popitem(last=False)
+        return result
+
+def window_matrix(profile, window_days=None, today=None):
+    """The (habit × day) matrix for the last `window_days` days (all history if None)."""
+    today = (today or date.today()).toordinal()
+    first_day = today - window_days + 1 if window_days else None
+    # Archived history is decoded the first time a window reaches back into it
+    habit_archive.ensure(profile, first_day)
+    return habit_matrix.CompletionMatrix(profile.habits, profile.completion_bits, first_day=first_day, last_day=today)
+
+def heatmap_figure(profile, window_days, level):
+    """Heatmap of completions per day ('D') or share of each habit's target met per
+    week ('W') or month ('M'); None if nothing was completed in the window."""
+    matrix = window_matrix(profile, window_days)
+    if not matrix.values.any():
+        return None
+
+    if level == "D":
+        x = matrix.dates
+        z = matrix.values.astype(np.int8)
+        customdata = np.where(matrix.values, "Done", "Not done")
+        hovertemplate = "%{y}<br>%{x|%Y-%m-%d}: %{customdata}<extra></extra>"
+        colorbar = dict(title="Completed", tickvals=[0, 1], ticktext=["No", "Yes"])
+    else:
+        x, completed, tracked = matrix.aggregate(level)
+        _, met, expected = matrix.aggregate(level, against_target=True)
+        z = np.minimum(np.divide(met, expected, out=np.full(met.shape, np.nan), where=expected > 0), 1)
+        customdata = np.char.add(np.char.add(completed.astype(str), "/"), tracked.astype(str))
+        period = "Week of %{x|%Y-%m-%d}" if level == "W" else "%{x|%b %Y}"
+        hovertemplate = "%{y}<br>" + period + ": %{customdata} days<extra></extra>"
+        colorbar = dict(title="Rate", tickformat=".0%")
+
+    fig = go.Figure(go.Heatmap(
+        z=z,
+        x=x,
+        y=matrix.names,
+        customdata=customdata,
+        hovertemplate=hovertemplate,
+        colorscale=[[0, '#f5f5f5'], [1, '#1E88E5']],
+        zmin=0,
+        zmax=1,
+        xgap=1,
+        ygap=1,
+        colorbar=colorbar
+    ))
+    fig.update_layout(
+        height=max(300, len(matrix.habit_ids) * 28 + 120),
+        margin=dict(l=20, r=20, t=20, b=20),
+        yaxis=dict(autorange="reversed"),
+        xaxis=dict(type="date")
+    )
+    return fig
+
+def streak_table(profile):
+    """Current and longest streak per habit with the periods they count, longest first."""
+    habits = profile.habits.values()
+    streak_df = pd.DataFrame({
+        'Habit': [habit["name"] for habit in habits],
+        'Current Streak': [habit["streak"] for habit in habits],
+        'Longest Streak': [habit["longest_streak"] for habit in habits],
+        'Unit': [habit_streaks.schedule(habit)[1] + "s" for habit in habits]
+    })
+    return streak_df.sort_values('Longest Streak', ascending=False)
+
+def completion_rates(profile, window_days=None):
+    """Every habit's completed and tracked days in the window, and the share of its target it met."""
+    matrix = window_matrix(profile, window_days)
+    completion_df = pd.DataFrame({
+        "Habit": matrix.names,
+        "Category": matrix.categories,
+        "Target": [habit_streaks.describe_schedule(target, period) for target, period in zip(matrix.targets, matrix.periods)],
+        "Days Completed": matrix.completed_days(),
+        "Total Days": matrix.tracked_days()
+    })
+    completion_df["Completion Rate"] = matrix.completion_rates() * 100
+    return completion_df
+
+def category_rates(profile, window_days=None):
+    """Share of the targets met per category, pooled over its habits."""
+    matrix = window_matrix(profile, window_days)
+    met, expected = matrix.target_progress()
+    category_df = pd.DataFrame({
+        "Category": matrix.categories,
+        "Days Completed": matrix.completed_days(),
+        "Total Days": matrix.tracked_days(),
+        "Met": met.sum(axis=1),
+        "Expected": expected.sum(axis=1)
+    }).groupby("Category", sort=False).sum()
+    category_df["Completion Rate"] = (category_df["Met"] / category_df["Expected"].where(category_df["Expected"] > 0) * 100).clip(upper=100).fillna(0)
+    return category_df.drop(columns=["Met", "Expected"])
+
+def rate_series(profile, window_days, level):
+    """Weekly ('W') or monthly ('M') share of the targets met per category plus all habits
+    together, as a DataFrame indexed by period start with one column per category."""
+    matrix = window_matrix(profile, window_days)
+    rates = pd.concat([
+        matrix.period_rates(level, matrix.categories),
+        matrix.period_rates(level, np.full(len(matrix.habit_ids), "All habits"))
+    ])
+    return rates.T * 100
+
+def rolling_rates(profile, window_days, rolling, by, habit_ids=()):
+    """Share of the targets met (%) over the `rolling` days ending on each day of the window,
+    per category plus all habits together (by='category') or for the given
+    habits (by='habit'), as a DataFrame indexed by date with one column each;
+    NaN where nothing was tracked."""
+    # Start early enough that the first day shown already has a full trailing window
+    matrix = window_matrix(profile, window_days + rolling - 1 if window_days else None)
+    completed, tracked = matrix.rolling_counts(rolling, against_target=True)
+
+    if by == "category":
+        # Pool each category's habits with one (category × habit) indicator product
+        inverse, labels = pd.factorize(matrix.categories)
+        members = np.zeros((len(labels), len(inverse)), dtype=np.float64)
+        members[inverse, np.arange(len(inverse))] = 1
+        completed = np.vstack([members @ completed, completed.sum(axis=0)])
+        tracked = np.vstack([members @ tracked, tracked.sum(axis=0)])
+        labels = [*labels, "All habits"]
+    else:
+        rows = [matrix.habit_ids.index(habit_id) for habit_id in habit_ids if habit_id in profile.habits]
+        completed, tracked, labels = completed[rows], tracked[rows], matrix.names[rows]
+
+    rates = np.minimum(np.divide(completed * 100.0, tracked, out=np.full(completed.shape, np.nan), where=tracked > 0), 100)
+    shown = slice(-window_days, None) if window_days else slice(None)
+    return pd.DataFrame(rates[:, shown].T, index=matrix.dates[shown], columns=labels)
+
+def habit_pairs(profile, window_days=None):
+    """How every two habits go together over the days both were tracked in the window.
+
+    Returns a dict of 'habit_ids' and unique 'labels' in clustered order
+    (habits done on the same days next to each other) and (habit × habit) float
+    arrays in that order: 'correlation' (same-day), 'next_day' (habit i with
+    habit j the day after), 'co_occurrence' (share of habit i's done days that
+    habit j was also done), 'days' and 'next_days' (days both were tracked) and
+    'done' (habit i's done days among them)."""
+    matrix = window_matrix(profile, window_days)
+    (both, first, second, days), (next_both, next_first, next_second, next_days) = matrix.pair_counts()
+    correlation = habit_matrix.correlation(both, first, second, days, MIN_SHARED_DAYS)
+    order = _cluster_order(correlation)
+    pick = np.ix_(order, order)
+
+    # Names shared by habits in different categories get the category added
+    names, counts = np.unique(matrix.names.astype(str), return_counts=True)
+    repeated = set(names[counts > 1])
+    labels = [f"{name} ({category})" if name in repeated else name for name, category in zip(matrix.names, matrix.categories)]
+    return {
+        "habit_ids": [matrix.habit_ids[row] for row in order],
+        "labels": [labels[row] for row in order],
+        "correlation": correlation[pick],
+        "next_day": habit_matrix.correlation(next_both, next_first, next_second, next_days, MIN_SHARED_DAYS)[pick],
+        "co_occurrence": np.divide(both, first, out=np.full(both.shape, np.nan), where=first > 0)[pick],
+        "days": days[pick],
+        "next_days": next_days[pick],
+        "done": first[pick]
+    }
+
+def _cluster_order(correlation):
+    """Order of the habits that puts positively correlated ones next to each other.
+
+    Sorts by the Fiedler vector (second eigenvector of the graph Laplacian) of
+    the similarity (1 + r) / 2, unknown correlations counting as 0: a spectral
+    seriation, one symmetric eigendecomposition however the habits cluster."""
+    if len(correlation) < 3:
+        return np.arange(len(correlation))
+    similarity = (1 + np.nan_to_num(correlation, nan=0.0)) / 2
+    np.fill_diagonal(similarity, 0)
+    laplacian = np.diag(similarity.sum(axis=1)) - similarity
+    _, vectors = np.linalg.eigh(laplacian)
+    return np.argsort(vectors[:, 1], kind="stable")
+
+def correlation_figure(profile, window_days, measure):
+    """Clustered heatmap of a pair measure (see PAIR_MEASURES) between every two habits;
+    None if there are fewer than two habits or nothing to compare in the window."""
+    pairs = cached_view(profile, "habit_pairs", (window_days,), habit_pairs)
+    z = pairs[measure].copy()
+    # A habit always goes with itself on the same day; only the next-day diagonal says something
+    if measure != "next_day":
+        np.fill_diagonal(z, np.nan)
+    if len(z) < 2 or np.isnan(z).all():
+        return None
+
+    title, counted, colorscale, zmin, zmax, hovertemplate = PAIR_MEASURES[measure]
+    # Beyond a few dozen habits the labels and cell gaps crowd out the cells, so labels are left to the hover
+    compact = len(z) > 60
+    fig = go.Figure(go.Heatmap(
+        z=z,
+        x=pairs["labels"],
+        y=pairs["labels"],
+        customdata=pairs[counted].astype(np.int64),
+        hovertemplate=hovertemplate,
+        colorscale=colorscale,
+        zmin=zmin,
+        zmax=zmax,
+        xgap=0 if compact else 1,
+        ygap=0 if compact else 1,
+        colorbar=dict(title=title, tickformat=".0%" if measure == "co_occurrence" else None)
+    ))
+    fig.update_layout(
+        height=min(max(400, len(z) * 22 + 160), 1200),
+        margin=dict(l=20, r=20, t=20, b=20),
+        xaxis=dict(showticklabels=not compact, tickangle=-45),
+        yaxis=dict(showticklabels=not compact, autorange="reversed")
+    )
+    return fig
+
+def top_pairs(profile, window_days, measure, count=10):
+    """The `count` pairs of different habits scoring highest on a pair measure (see
+    PAIR_MEASURES), as a DataFrame of the two habits, the value and the days it
+    was counted over; same-day correlation lists each pair once."""
+    pairs = cached_view(profile, "habit_pairs", (window_days,), habit_pairs)
+    values = pairs[measure].copy()
+    np.fill_diagonal(values, np.nan)
+    if measure == "correlation":
+        values[np.tril_indices(len(values))] = np.nan
+    # Partition out the top `count` before sorting them, instead of sorting every pair
+    flat = np.nan_to_num(values.ravel(), nan=-np.inf)
+    count = min(count, flat.size)
+    best = np.argpartition(flat, flat.size - count)[flat.size - count:] if count else np.zeros(0, dtype=np.int64)
+    best = best[np.argsort(-flat[best], kind="stable")]
+    rows, cols = np.unravel_index(best[np.isfinite(flat[best])], values.shape)
+
+    title, counted = PAIR_MEASURES[measure][:2]
+    labels = np.array(pairs["labels"], dtype=object)
+    pairs_df = pd.DataFrame({
+        "Habit": labels[rows],
+        "Then" if measure == "next_day" else "With": labels[cols],
+        title: values[rows, cols] * 100 if measure == "co_occurrence" else values[rows, cols],
+        "Days": pairs[counted][rows, cols].astype(np.int64)
+    })
+    return pairs_df
+
+def xp_breakdown(profile, window_days, by):
+    """XP earned in the window per habit, category, day, week or month (`by`),
+    summed from the XP ledger."""
+    start = (date.today() - timedelta(days=window_days - 1)).isoformat() if window_days else None
+    xp_df = pd.DataFrame(habit_store.xp_totals(by, start, path=profile.path), columns=[by.capitalize(), "XP"])
+    if by == "habit":
+        xp_df["Habit"] = [
+            profile.habits[habit_id]["name"] if habit_id in profile.habits else habit_id or "Milestones"
+            for habit_id in xp_df["Habit"]
+        ]
+    elif by in ("day", "week", "month"):
+        xp_df[by.capitalize()] = pd.to_datetime(xp_df[by.capitalize()])
+    return xp_df
@@ -0,0 +1,121 @@
+from datetime import date
+
+import numpy as np
+
+import habit_matrix
+import habit_store
+import habit_streaks
+
+# Tiered completion history for habit_tracker.py
+#
+# Recent completions live in the completions table and in each habit's
+# `completions` dict. Completed days older than the archive horizon are moved
+# into the completion_archive table, one compressed block per habit (the
+# run-length or bitmap encoding of habit_pack), and unticked days are dropped.
+# Loading a profile reads only the recent rows plus each habit's archived
+# count, so load and save stay bounded however many years of history exist.
+# The archived days are decoded into the profile's bitmaps and streak index
+# only when something needs them: an analytics window reaching past the
+# cutoff, a streak running back into it, an import, or an export.
+
+# Completions older than this many days are archived
+ARCHIVE_AFTER_DAYS = 365
+
+# A profile is compacted when loaded once its oldest recent completion is this many days past the horizon
+COMPACT_EVERY_DAYS = 30
+
+# Longest calendar period of each schedule, to tell whether a streak may reach the cutoff
+MAX_PERIOD_DAYS = {"day": 1, "week": 7, "month": 31}
+
+def compact(path=habit_store.DB_FILE, horizon_days=ARCHIVE_AFTER_DAYS, today=None):
+    """Archive the completions older than `horizon_days` and drop unticked ones;
+    returns (rows dropped, rows archived)."""
+    today = (today or date.today()).toordinal()
+    return habit_store.compact_history(date.fromordinal(today - horizon_days + 1).isoformat(), path)
+
+def compact_if_due(path=habit_store.DB_FILE, horizon_days=ARCHIVE_AFTER_DAYS, today=None):
+    """Compact a database whose oldest recent completion is more than
+    COMPACT_EVERY_DAYS past the horizon; returns compact()'s result or None."""
+    today = (today or date.today()).toordinal()
+    oldest = habit_store.oldest_completion(path)
+    if oldest is None or oldest >= date.fromordinal(today - horizon_days - COMPACT_EVERY_DAYS + 1).isoformat():
+        return None
+    return compact(path, horizon_days, date.fromordinal(today))
+
+def load_summary(profile):
+    """Read a freshly loaded profile's archive cutoff and archived counts (no blocks are decoded)."""
+    before, counts = habit_store.archive_summary(profile.path)
+    profile.archive_before = habit_streaks.day_ordinal(before) if before else None
+    profile.archived_counts = counts
+    profile.archived_days = {}
+    profile.archive_loaded = False
+
+def reindex(profile, habit_id):
+    """Rebuild a habit's bitmap and streak runs from its recent completions plus
+    its archived days, once loaded; unticking a day overrides its archived entry."""
+    habit = profile.habits[habit_id]
+    days = habit_streaks.completed_ordinals(habit["completions"])
+    archived = profile.archived_days.get(habit_id)
+    if archived is not None and len(archived):
+        unticked = [habit_streaks.day_ordinal(day) for day, done in habit["completions"].items() if not done]
+        days = np.union1d(days, np.setdiff1d(archived, unticked))
+    start = habit_streaks.day_ordinal(habit["created_date"][:10])
+    if len(days):
+        start = min(start, int(days.min()))
+    profile.completion_bits[habit_id] = habit_matrix.HabitBitmap.from_days(days, start)
+    profile.streak_index.load_days(habit_id, days)
+
+def ensure(profile, first_day=None):
+    """Decode the archived history into the profile's bitmaps and streak index if
+    `first_day` (a day ordinal, None for all history) falls before the archive
+    cutoff and it isn't loaded yet; returns whether it was loaded now."""
+    with profile.lock:
+        if profile.archive_before is None or profile.archive_loaded:
+            return False
+        if first_day is not None and first_day >= profile.archive_before:
+            return False
+        profile.archived_days = habit_store.load_archive(profile.path)
+        for habit_id in profile.archived_days:
+            if habit_id in profile.habits:
+                reindex(profile, habit_id)
+        profile.archive_loaded = True
+        return True
+
+def reaches_archive(profile, streaks, today=None):
+    """Whether any of the {habit_id: current streak} could run on into archived days that aren't loaded."""
+    if profile.archive_before is None or profile.archive_loaded:
+        return False
+    today = (today or date.today()).toordinal()
+    for habit_id, streak in streaks.items():
+        if streak and profile.archived_counts.get(habit_id):
+            period_days = MAX_PERIOD_DAYS[habit_streaks.schedule(profile.habits[habit_id])[1]]
+            if today - (streak + 1) * period_days <= profile.archive_before:
+                return True
+    return False
+
+def completed_days(profile):
+    """{habit_id: completed days} over the whole history, archived days included."""
+    counts = {habit_id: bitmap.count() for habit_id, bitmap in profile.completion_bits.items()}
+    if not profile.archive_loaded:
+        for habit_id, count in profile.archived_counts.items():
+            if habit_id in counts:
+                counts[habit_id] += count
+    return counts
+
+def export_habits(profile):
+    """The profile's habits with their archived completions merged back into
+    `completions`, for exports and backups (the profile itself is unchanged)."""
+    if profile.archive_before is None:
+        return profile.habits
+    archived = profile.archived_days if profile.archive_loaded else habit_store.load_archive(profile.path)
+    habits = {}
+    for habit_id, habit in profile.habits.items():
+        days = archived.get(habit_id)
+        if days is None or not len(days):
+            habits[habit_id] = habit
+            continue
+        names = np.datetime_as_string((days - habit_streaks.EPOCH_ORDINAL).astype("datetime64[D]"), unit="D")
+        completions = dict.fromkeys(names.tolist(), True)
+        completions.update(habit["completions"])
+        habits[habit_id] = {**habit, "completions": dict(sorted(completions.items()))}
+    return habits
@@ -0,0 +1,268 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import habit_analytics
+import habit_archive
+import habit_import
+import habit_ledger
+import habit_pack
+import habit_profiles
+import habit_rules
+import habit_service
+import habit_store
+import habit_streaks
+
+# Benchmarks for habit_tracker.py
+#
+# Generates deterministic habit state for a grid of sizes, times the storage,
+# streak, achievement, analytics and export paths the app runs, and appends
+# one JSON line per (case, benchmark) with wall time and peak traced memory to
+# a results file. Each line carries the git commit, so runs from different
+# versions can be compared side by side.
+#
+#   python habit_benchmarks.py
+#   python habit_benchmarks.py --habits 10 1000 --years 1 20 --density 0.2 0.8
+RESULTS_FILE = "habit_benchmarks.jsonl"
+
+# (habits, years, density) cases run when no grid is given
+DEFAULT_CASES = [
+    (10, 1, 0.6),
+    (100, 1, 0.6),
+    (100, 5, 0.6),
+    (1000, 1, 0.6),
+    (100, 20, 0.6),
+    (1000, 5, 0.3)
+]
+
+CATEGORIES = ["Exercise", "Reading", "Entertainment", "Self Improvement", "Health", "Work", "Social"]
+
+# (target, period) schedules handed out in turn, so half the habits are weekly or monthly
+SCHEDULES = [(1, "day"), (3, "week"), (1, "day"), (2, "month")]
+
+# How strongly a day's outcome follows the previous day's, so histories have realistic streaks
+STICKINESS = 0.6
+
+# Share of missed days stored as an explicit False (a checkbox that was unticked)
+UNCHECKED_SHARE = 0.05
+
+def generate_profile(n_habits, years, density, seed=0, today=None):
+    """Build a deterministic profile of `n_habits` habits with `years` of history
+    ending `today`, each day completed with long-run probability `density`.
+
+    Completions follow a two-state Markov chain (done days tend to follow done
+    days), habits take their (target, period) from SCHEDULES in turn, and
+    streaks, achievements and the XP ledger are recomputed from them;
+    the ledger events are kept on the profile as `xp_events`."""
+    rng = np.random.default_rng(seed)
+    today = today or date.today()
+    n_days = int(round(years * 365.25))
+    first_day = today - timedelta(days=n_days - 1)
+    day_names = np.datetime_as_string(np.arange(np.datetime64(first_day), np.datetime64(today) + 1), unit="D")
+
+    # P(done | done yesterday) and P(done | missed yesterday), both keeping `density` stationary
+    stay = density + STICKINESS * (1 - density)
+    start = density * (1 - STICKINESS)
+    done = np.zeros((n_habits, n_days), dtype=bool)
+    done[:, 0] = rng.random(n_habits) < density
+    draws = rng.random((n_habits, n_days))
+    for day in range(1, n_days):
+        done[:, day] = draws[:, day] < np.where(done[:, day - 1], stay, start)
+    unchecked = ~done & (rng.random((n_habits, n_days)) < UNCHECKED_SHARE)
+
+    profile = habit_profiles.Profile(f"bench_{n_habits}_{years}_{density}")
+    profile.achievements = habit_rules.new_achievements()
+    profile.user = {"total_xp": 0, "level": 1, "next_level_xp": 100}
+    for row in range(n_habits):
+        category = CATEGORIES[row % len(CATEGORIES)]
+        target, period = SCHEDULES[row % len(SCHEDULES)]
+        name = f"Habit {row + 1}"
+        recorded = done[row] | unchecked[row]
+        profile.habits[habit_service.habit_id_for(category, name)] = {
+            "name": name,
+            "category": category,
+            "streak": 0,
+            "longest_streak": 0,
+            "completions": dict(zip(day_names[recorded].tolist(), done[row, recorded].tolist())),
+            "xp": 0,
+            "level": 1,
+            "target": target,
+            "period": period,
+            "created_date": first_day.isoformat()
+        }
+
+    habit_profiles.build_indexes(profile)
+    _, profile.xp_events = habit_import.recompute_progress(profile)
+    return profile
+
+def measure(function, repeats):
+    """Run `function` `repeats` times for wall time, then once more under tracemalloc for peak memory.
+
+    tracemalloc sees Python and numpy allocations but not SQLite's own page
+    cache, so the storage benchmarks report only their Python-side peak."""
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "wall_median_s": statistics.median(times),
+        "wall_min_s": min(times),
+        "repeats": repeats,
+        "peak_mib": peak / 2 ** 20
+    }
+
+def toggle_benchmark(profile, count=50):
+    """`count` checkbox ticks and unticks on today's box through habit_service,
+    including the autosave flush that writes them (timed per tick + untick)."""
+    today = date.today().isoformat()
+    habit_ids = list(profile.habits)[:count]
+
+    def run():
+        for habit_id in habit_ids:
+            completions = profile.habits[habit_id]["completions"]
+            previous = completions.get(today)
+            habit_service.set_completion(profile, habit_id, not previous)
+            habit_service.set_completion(profile, habit_id, bool(previous))
+            if previous is None:
+                del completions[today]
+        habit_service.flush(profile)
+    return run, len(habit_ids)
+
+def case_benchmarks(profile, workdir):
+    """(name, function, operations per call) for every benchmark of one generated profile."""
+    profile.path = os.path.join(workdir, "habits.db")
+    habit_store.save_state(profile.habits, profile.achievements, profile.user, path=profile.path, xp_events=profile.xp_events)
+    pack_path = os.path.join(workdir, "habits.hqp")
+    with open(pack_path, "wb") as f:
+        habit_pack.write_pack(f, profile.habits, profile.achievements, profile.user)
+    # The same state with history past the default horizon archived
+    compacted_path = os.path.join(workdir, "compacted.db")
+    habit_store.save_state(profile.habits, profile.achievements, profile.user, path=compacted_path)
+    habit_archive.compact(compacted_path)
+    first_habit = next(iter(profile.habits))
+    saves = iter(range(1_000_000))
+    toggle, toggles = toggle_benchmark(profile)
+
+    return [
+        ("save_state", lambda: habit_store.save_state(
+            profile.habits, profile.achievements, profile.user, path=os.path.join(workdir, f"save_{next(saves)}.db")), 1),
+        ("load_state", lambda: habit_store.load_state(profile.path), 1),
+        ("load_state_compacted", lambda: habit_store.load_state(compacted_path), 1),
+        ("load_archive", lambda: habit_store.load_archive(compacted_path), 1),
+        ("build_indexes", lambda: habit_profiles.build_indexes(profile), 1),
+        ("streak_index_rebuild", lambda: habit_streaks.StreakIndex.from_habits(profile.habits), 1),
+        ("current_streaks_all", lambda: habit_profiles.current_streaks(profile), 1),
+        ("achievement_counters_rebuild", lambda: habit_rules.AchievementEngine.from_habits(profile.habits), 1),
+        ("milestone_check", lambda: profile.rules.evaluate(profile.achievements, set(profile.rules.counters)), 1),
+        ("toggle", toggle, toggles),
+        ("set_schedule", lambda: habit_service.set_schedule(profile, first_habit, 3, "week"), 1),
+        ("recompute_progress", lambda: habit_import.recompute_progress(profile), 1),
+        ("xp_load", lambda: habit_ledger.load(profile), 1),
+        ("xp_range_month_all", lambda: habit_store.xp_totals("month", path=profile.path), 1),
+        ("xp_range_category_90d", lambda: habit_analytics.xp_breakdown(profile, 90, "category"), 1),
+        ("heatmap_day_90d", lambda: habit_analytics.heatmap_figure(profile, 90, "D"), 1),
+        ("heatmap_week_all", lambda: habit_analytics.heatmap_figure(profile, None, "W"), 1),
+        ("heatmap_month_all", lambda: habit_analytics.heatmap_figure(profile, None, "M"), 1),
+        ("streak_table", lambda: habit_analytics.streak_table(profile), 1),
+        ("completion_rates_all", lambda: habit_analytics.completion_rates(profile), 1),
+        ("category_rates_all", lambda: habit_analytics.category_rates(profile), 1),
+        ("rate_series_week_all", lambda: habit_analytics.rate_series(profile, None, "W"), 1),
+        ("rolling_rates_30d_all", lambda: habit_analytics.rolling_rates(profile, None, 30, "category"), 1),
+        ("rolling_rates_7d_365d_habits", lambda: habit_analytics.rolling_rates(profile, 365, 7, "habit", tuple(profile.habits)), 1),
+        ("habit_pairs_all", lambda: habit_analytics.habit_pairs(profile), 1),
+        ("habit_pairs_365d", lambda: habit_analytics.habit_pairs(profile, 365), 1),
+        ("export_json", lambda: export(habit_store.export_json, profile), 1),
+        ("export_pack", lambda: export(habit_pack.write_pack, profile), 1),
+        ("load_pack", lambda: read_pack(pack_path), 1)
+    ]
+
+def export(write, profile):
+    with open(os.devnull, "wb") as f:
+        write(f, profile.habits, profile.achievements, profile.user)
+
+def read_pack(path):
+    with open(path, "rb") as f:
+        return habit_pack.read_state(f)
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(cases, repeats, output, only=None):
+    environment = {
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine()
+    }
+    with open(output, "a") as results:
+        for n_habits, years, density in cases:
+            profile = generate_profile(n_habits, years, density)
+            case = {
+                "habits": n_habits,
+                "years": years,
+                "density": density,
+                "completions": sum(len(habit["completions"]) for habit in profile.habits.values())
+            }
+            with tempfile.TemporaryDirectory() as workdir:
+                for name, function, operations in case_benchmarks(profile, workdir):
+                    if only and name not in only:
+                        continue
+                    result = measure(function, repeats)
+                    result["wall_per_op_s"] = result["wall_median_s"] / operations
+                    results.write(json.dumps({**environment, **case, "benchmark": name, **result}) + "\n")
+                    results.flush()
+                    print(f"{n_habits:>5} habits {years:>3}y {density:.2f}  {name:<30} "
+                          f"{result['wall_median_s'] * 1000:>10.2f} ms  {result['peak_mib']:>8.1f} MiB")
+                # Close this thread's connections before the directory goes away
+                for name in os.listdir(workdir):
+                    habit_store.close_connection(os.path.join(workdir, name))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark habit_tracker.py's data paths.")
+    parser.add_argument("--habits", type=int, nargs="+", help="habit counts (with --years and --density, run the full grid)")
+    parser.add_argument("--years", type=float, nargs="+", help="years of history")
+    parser.add_argument("--density", type=float, nargs="+", help="share of days completed, 0 to 1")
+    parser.add_argument("--repeats", type=int, default=5, help="timed runs per benchmark (default 5)")
+    parser.add_argument("--only", nargs="+", help="run only these benchmarks")
+    parser.add_argument("--output", default=RESULTS_FILE, help=f"JSON Lines file to append to (default {RESULTS_FILE})")
+    args = parser.parse_args()
+
+    if args.habits or args.years or args.density:
+        cases = [
+            (n_habits, years, density)
+            for n_habits in args.habits or [100]
+            for years in args.years or [1]
+            for density in args.density or [0.6]
+        ]
+    else:
+        cases = DEFAULT_CASES
+    run(cases, args.repeats, args.output, args.only)
+
+if __name__ == "__main__":
+    main()
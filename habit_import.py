@@ -0,0 +1,135 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import habit_archive
+import habit_ledger
+import habit_matrix
+import habit_rules
+import habit_service
+import habit_store
+
+# Bulk CSV import for habit_tracker.py
+#
+# Rows of (habit, category, date, done) are parsed and de-duplicated with
+# pandas, merged into the profile's completion dicts one habit at a time,
+# and then every habit's streaks and achievements and the XP ledger are
+# recomputed from the (habit × day) matrix instead of replaying each
+# checkbox toggle.
+IMPORT_COLUMNS = ["habit", "category", "date", "done"]
+TRUE_VALUES = {"1", "true", "yes", "y", "x", "done"}
+
+# Imports of at least this many rows rebuild the completions date index afterwards
+REINDEX_ROWS = 50_000
+
+def read_completions_csv(file):
+    """Parse an import CSV into habit_id/habit/category/date/done rows.
+
+    Column names are case-insensitive and dates are ISO (YYYY-MM-DD). Rows with
+    a missing habit or category, an unreadable date or a date in the future are
+    dropped; for repeated (habit, date) rows the last one wins. Returns
+    (rows, dropped)."""
+    frame = pd.read_csv(file, dtype=str, keep_default_na=False)
+    frame.columns = [column.strip().lower() for column in frame.columns]
+    missing = [column for column in IMPORT_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+    total = len(frame)
+    frame = frame[IMPORT_COLUMNS].copy()
+    frame["habit"] = frame["habit"].str.strip()
+    frame["category"] = frame["category"].str.strip()
+    days = pd.to_datetime(frame["date"].str.strip(), errors="coerce", format="ISO8601")
+    frame["date"] = days.dt.strftime("%Y-%m-%d")
+    frame["done"] = frame["done"].str.strip().str.lower().isin(TRUE_VALUES)
+
+    valid = (frame["habit"] != "") & (frame["category"] != "") & days.notna() & (days <= pd.Timestamp(date.today()))
+    frame = frame[valid]
+    frame.insert(0, "habit_id", habit_service.habit_id_for(frame["category"], frame["habit"]))
+    frame = frame.drop_duplicates(["habit_id", "date"], keep="last")
+    return frame.reset_index(drop=True), total - len(frame)
+
+def import_completions(profile, rows):
+    """Merge parsed rows into a profile, creating missing habits, then recompute
+    its progress and save everything in one transaction.
+
+    Call with the profile's lock held. Returns (habits_created, unlocked)."""
+    # Progress is recomputed over the whole history, archived days included
+    habit_archive.ensure(profile)
+
+    # New habits as the Add Habit form creates them, dated from their first imported day
+    firsts = rows.groupby("habit_id", sort=False).agg(habit=("habit", "first"), category=("category", "first"), first_date=("date", "min"))
+    created = []
+    for habit_id, habit_name, category, first_date in firsts.itertuples():
+        if habit_id not in profile.habits:
+            profile.habits[habit_id] = {
+                "name": habit_name,
+                "category": category,
+                "streak": 0,
+                "longest_streak": 0,
+                "completions": {},
+                "xp": 0,
+                "level": 1,
+                "target": 1,
+                "period": "day",
+                "created_date": first_date
+            }
+            created.append(habit_id)
+
+    # Merge completions one habit at a time and rebuild that habit's indexes
+    rows = rows.sort_values(["habit_id", "date"], kind="stable")
+    habit_ids = rows["habit_id"].to_numpy()
+    bounds = np.flatnonzero(np.r_[True, habit_ids[1:] != habit_ids[:-1], True])
+    dates = rows["date"].tolist()
+    done = rows["done"].tolist()
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        habit_id = habit_ids[start]
+        habit = profile.habits[habit_id]
+        habit["completions"].update(zip(dates[start:end], done[start:end]))
+        habit_archive.reindex(profile, habit_id)
+
+    unlocked, xp_events = recompute_progress(profile)
+    habit_store.save_bulk(
+        profile.habits,
+        zip(habit_ids.tolist(), dates, done),
+        profile.achievements,
+        profile.user,
+        path=profile.path,
+        rebuild_index=len(rows) >= REINDEX_ROWS,
+        xp_events=xp_events
+    )
+    profile.data_version += 1
+    return created, unlocked
+
+def recompute_progress(profile):
+    """Recompute every habit's streaks, the earned achievements and the XP ledger
+    from the completion history in one pass over the matrix.
+
+    Streaks count each habit's own periods against its target. XP is what the
+    checkbox would have awarded: completion_xp of the streak each completed
+    day extended, plus the XP of every achievement earned. Returns
+    (unlocked, xp_events): the newly unlocked (kind, achievement_id, habit_id)
+    and the regenerated ledger events."""
+    matrix = habit_matrix.CompletionMatrix(profile.habits, profile.completion_bits)
+    streaks, extended, current = matrix.schedule_streaks()
+    longest = streaks.max(axis=1) if streaks.size else np.zeros(len(matrix.habit_ids), dtype=np.int64)
+    completed = matrix.completed_days()
+
+    # Per-habit achievements reached anywhere in the history
+    history = {"streak": streaks, "completed_days": np.cumsum(matrix.values, axis=1, dtype=np.int32)}
+    unlocked = habit_rules.backfill_habit_achievements(profile.achievements, matrix.habit_ids, matrix.dates, history)
+    for row, habit_id in enumerate(matrix.habit_ids):
+        habit = profile.habits[habit_id]
+        habit["streak"] = int(current[row])
+        habit["longest_streak"] = int(longest[row])
+
+    # Profile-wide counters and milestones
+    profile.rules = habit_rules.AchievementEngine()
+    for row, habit_id in enumerate(matrix.habit_ids):
+        profile.rules.add_habit(habit_id, matrix.categories[row], int(completed[row]), int(current[row]))
+    unlocked += profile.rules.evaluate(profile.achievements, set(profile.rules.counters))
+
+    # XP and levels of the habits and the user, from a regenerated ledger
+    xp_events = habit_ledger.rebuild(profile, matrix, extended)
+    return unlocked, xp_events
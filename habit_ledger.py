@@ -0,0 +1,104 @@
+from datetime import date
+
+import numpy as np
+
+import habit_rules
+import habit_store
+
+# Event-sourced XP for habit_tracker.py
+#
+# Every XP change is an event (habit, source, amount, date) appended to the
+# profile's xp_ledger table: a habit's XP is the sum of its events, the user's
+# XP the sum of all events, and levels follow from those sums. Unticking a
+# habit appends a negative completion event, so the XP that day earned goes
+# with it. The store snapshots the totals every XP_SNAPSHOT_EVERY events, so
+# loading reads the newest snapshot plus the events after it, and rebuild()
+# regenerates the whole ledger from the completion matrix in one pass.
+
+def achievement_source(kind, achievement_id):
+    return f"{habit_store.XP_ACHIEVEMENT_PREFIX}{kind}/{achievement_id}"
+
+class XpLedger:
+    """A profile's XP totals, kept in step with the events appended to its ledger."""
+
+    def __init__(self, totals=None, completed_today=None, today=None):
+        self.totals = dict(totals or {})
+        self.total = sum(self.totals.values())
+        self.today = today or date.today().isoformat()
+        self.completed_today = dict(completed_today or {})
+
+    def record(self, habit_id, source, amount, day=None):
+        """Apply an XP event (habit_id None for profile-wide XP) and return the
+        (habit_id, source, amount, date) row to append to the ledger."""
+        day = day or date.today().isoformat()
+        key = habit_id or ""
+        self.totals[key] = self.totals.get(key, 0) + amount
+        self.total += amount
+        if source == habit_store.XP_COMPLETION and habit_id:
+            if day != self.today:
+                self.today, self.completed_today = day, {}
+            self.completed_today[habit_id] = self.completed_today.get(habit_id, 0) + amount
+        return (habit_id, source, amount, day)
+
+    def completion_xp_today(self, habit_id):
+        """Net completion XP a habit has earned today (what unticking it revokes)."""
+        if self.today != date.today().isoformat():
+            return 0
+        return self.completed_today.get(habit_id, 0)
+
+def load(profile):
+    """Read a profile's XP totals from its ledger and apply them to its habits and user."""
+    today = date.today().isoformat()
+    totals, completed_today = habit_store.load_xp(profile.path, today)
+    profile.xp_ledger = XpLedger(totals, completed_today, today)
+    apply(profile)
+
+def apply(profile, habit_ids=None):
+    """Set the XP and level of the given habits (all if None) and of the user from the ledger totals."""
+    ledger = profile.xp_ledger
+    for habit_id in profile.habits if habit_ids is None else habit_ids:
+        habit = profile.habits[habit_id]
+        habit["xp"] = ledger.totals.get(habit_id, 0)
+        habit["level"] = int(habit_rules.xp_level(habit["xp"]))
+    level = int(habit_rules.xp_level(ledger.total))
+    profile.user.update({"total_xp": ledger.total, "level": level, "next_level_xp": 100 * (level + 1) ** 2})
+
+def rebuild(profile, matrix, streaks):
+    """Regenerate a profile's XP ledger from its completion matrix and earned
+    achievements in one vectorized pass, apply it, and return the event rows.
+
+    Every completed day earns completion_xp of the streak it extended (`streaks`
+    is the second array of matrix.schedule_streaks()). Per-habit achievements
+    are dated when earned; milestones keep no date and are dated today."""
+    today = date.today().isoformat()
+    rows, cols = np.nonzero(matrix.values)
+    amounts = habit_rules.completion_xp(streaks[rows, cols])
+    day_names = np.datetime_as_string(matrix.dates.values.astype("datetime64[D]"), unit="D")
+    events = list(zip(
+        np.asarray(matrix.habit_ids, dtype=object)[rows].tolist(),
+        [habit_store.XP_COMPLETION] * len(rows),
+        amounts.tolist(),
+        day_names[cols].tolist()
+    ))
+    habit_xp = np.bincount(rows, weights=amounts, minlength=len(matrix.habit_ids)).astype(np.int64)
+    totals = dict(zip(matrix.habit_ids, habit_xp.tolist()))
+    completed_today = {}
+    if len(day_names) and day_names[-1] == today:
+        last = cols == len(day_names) - 1
+        completed_today = dict(zip(np.asarray(matrix.habit_ids, dtype=object)[rows[last]].tolist(), amounts[last].tolist()))
+
+    for kind, achievements in profile.achievements.items():
+        for achievement_id, achievement in achievements.items():
+            source = achievement_source(kind, achievement_id)
+            if isinstance(achievement["earned"], dict):
+                for habit_id, earned_date in achievement["earned"].items():
+                    if habit_id in totals:
+                        events.append((habit_id, source, achievement["xp"], str(earned_date)[:10]))
+                        totals[habit_id] += achievement["xp"]
+            elif achievement["earned"]:
+                events.append((None, source, achievement["xp"], today))
+                totals[""] = totals.get("", 0) + achievement["xp"]
+
+    profile.xp_ledger = XpLedger(totals, completed_today, today)
+    apply(profile)
+    return events
@@ -0,0 +1,362 @@
+import struct
+from datetime import date
+
+import numpy as np
+
+import app_startup
+from habit_streaks import EPOCH_ORDINAL, PERIODS, completed_ordinals, day_ordinal, schedule
+
+# pandas is only needed by the analytics views, so it loads when they first run
+pd = app_startup.lazy_import("pandas")
+
+# Columnar completion data for habit_tracker.py analytics
+#
+# Every habit's completions are held as a packed bitmap (one bit per day,
+# little-endian bit order) starting at a day ordinal. Analytics assemble the
+# bitmaps into a dense (habit × day) boolean matrix with one numpy unpack per
+# habit and then work on whole arrays instead of looping over date strings.
+# Weekly and monthly targets are handled by bucketing the columns into periods
+# for all habits on the same schedule at once (see target_progress and
+# schedule_streaks).
+
+class HabitBitmap:
+    __slots__ = ("start", "bits")
+
+    def __init__(self, start, bits=b""):
+        self.start = start
+        self.bits = bytearray(bits)
+
+    @classmethod
+    def from_completions(cls, completions, start=None):
+        """Build a bitmap from a {date: bool} dict, starting at `start` (a day
+        ordinal) or the first completed day, whichever is earlier."""
+        days = completed_ordinals(completions)
+        if start is None:
+            start = int(days.min()) if len(days) else date.today().toordinal()
+        elif len(days):
+            start = min(start, int(days.min()))
+        return cls.from_days(days, start)
+
+    @classmethod
+    def from_days(cls, days, start):
+        """Build a bitmap from an array of completed day ordinals (all >= start)."""
+        days = np.asarray(days, dtype=np.int64)
+        if not len(days):
+            return cls(start)
+        flags = np.zeros(int(days.max()) - start + 1, dtype=bool)
+        flags[days - start] = True
+        return cls(start, np.packbits(flags, bitorder='little').tobytes())
+
+    def __len__(self):
+        return len(self.bits) * 8
+
+    def get(self, day):
+        offset = day_ordinal(day) - self.start
+        if offset < 0 or offset >= len(self):
+            return False
+        return bool(self.bits[offset >> 3] & (1 << (offset & 7)))
+
+    def set(self, day, done=True):
+        """Set or clear one day's bit, growing the bitmap in whole bytes if needed."""
+        offset = day_ordinal(day) - self.start
+        if offset < 0:
+            if not done:
+                return
+            shift = (-offset + 7) // 8
+            self.bits[0:0] = bytes(shift)
+            self.start -= shift * 8
+            offset += shift * 8
+        byte, bit = offset >> 3, offset & 7
+        if byte >= len(self.bits):
+            if not done:
+                return
+            self.bits.extend(bytes(byte - len(self.bits) + 1))
+        if done:
+            self.bits[byte] |= 1 << bit
+        else:
+            self.bits[byte] &= ~(1 << bit) & 0xFF
+
+    def count(self):
+        """Number of completed days."""
+        return int(np.unpackbits(np.frombuffer(bytes(self.bits), dtype=np.uint8)).sum())
+
+    def unpack(self, first_day, last_day):
+        """Completion flags for the day ordinals first_day..last_day inclusive."""
+        flags = np.zeros(last_day - first_day + 1, dtype=bool)
+        if not self.bits:
+            return flags
+        own = np.unpackbits(np.frombuffer(bytes(self.bits), dtype=np.uint8), bitorder='little').astype(bool)
+        lo = max(first_day, self.start)
+        hi = min(last_day, self.start + len(own) - 1)
+        if lo <= hi:
+            flags[lo - first_day:hi - first_day + 1] = own[lo - self.start:hi - self.start + 1]
+        return flags
+
+    def days(self):
+        """Completed day ordinals in ascending order."""
+        own = np.unpackbits(np.frombuffer(bytes(self.bits), dtype=np.uint8), bitorder='little')
+        return np.flatnonzero(own) + self.start
+
+    def to_bytes(self):
+        """Serialise as a 4-byte start ordinal followed by the packed bits."""
+        return struct.pack("<i", self.start) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        (start,) = struct.unpack_from("<i", data)
+        return cls(start, data[4:])
+
+def run_lengths(mask):
+    """Length of the run of True values ending at each position along the last axis, 0 where False."""
+    columns = np.arange(mask.shape[-1], dtype=np.int32)
+    last_gap = np.maximum.accumulate(np.where(mask, -1, columns), axis=-1)
+    return np.where(mask, columns - last_gap, 0)
+
+def correlation(both, first, second, days, min_days=1):
+    """Phi coefficient (Pearson correlation of two yes/no series) from pair counts:
+    days both were done, the first was done, the second was done, and shared
+    days, as broadcastable arrays; NaN where fewer than `min_days` days are
+    shared or either habit was done every day or never."""
+    covariance = days * both - first * second
+    spread = (days * first - first ** 2) * (days * second - second ** 2)
+    valid = (days >= min_days) & (spread > 0)
+    return np.divide(covariance, np.sqrt(spread, where=valid, out=np.zeros_like(spread)), out=np.full(np.shape(covariance), np.nan), where=valid)
+
+def build_bitmaps(habits):
+    """Build {habit_id: HabitBitmap} for a {habit_id: habit} dict, each indexed from its created_date."""
+    return {
+        habit_id: HabitBitmap.from_completions(habit["completions"], start=day_ordinal(habit["created_date"][:10]))
+        for habit_id, habit in habits.items()
+    }
+
+class CompletionMatrix:
+    """Dense (habit × day) completion matrix over day ordinals first_day..last_day."""
+
+    def __init__(self, habits, bitmaps, first_day=None, last_day=None):
+        self.habit_ids = list(habits)
+        self.names = np.array([habits[h]["name"] for h in self.habit_ids], dtype=object)
+        self.categories = np.array([habits[h]["category"] for h in self.habit_ids], dtype=object)
+        self.created = np.array([day_ordinal(habits[h]["created_date"][:10]) for h in self.habit_ids], dtype=np.int64)
+        schedules = [schedule(habits[h]) for h in self.habit_ids]
+        self.targets = np.array([target for target, _ in schedules], dtype=np.int32)
+        self.periods = np.array([period for _, period in schedules], dtype=object)
+
+        today = date.today().toordinal()
+        if first_day is None:
+            starts = [bitmaps[h].start for h in self.habit_ids if h in bitmaps] + self.created.tolist()
+            first_day = min(starts, default=today)
+        if last_day is None:
+            last_day = today
+        self.first_day = first_day
+        self.last_day = max(last_day, first_day)
+
+        self.values = np.zeros((len(self.habit_ids), self.last_day - self.first_day + 1), dtype=bool)
+        for row, habit_id in enumerate(self.habit_ids):
+            bitmap = bitmaps.get(habit_id)
+            if bitmap is not None:
+                self.values[row] = bitmap.unpack(self.first_day, self.last_day)
+
+        # Each habit is tracked from its creation day, or its first completion if that is earlier
+        first_done = self.first_day + self.values.argmax(axis=1)
+        self.tracked_from = np.where(self.values.any(axis=1), np.minimum(self.created, first_done), self.created)
+
+    @property
+    def dates(self):
+        """The matrix columns as a DatetimeIndex."""
+        return pd.to_datetime(np.arange(self.first_day, self.last_day + 1) - EPOCH_ORDINAL, unit='D')
+
+    def completed_days(self):
+        """Completed days per habit."""
+        return self.values.sum(axis=1)
+
+    def tracked_days(self):
+        """Calendar days each habit was tracked within the matrix window."""
+        return np.clip(self.last_day - np.maximum(self.tracked_from, self.first_day) + 1, 0, None)
+
+    def tracked_mask(self):
+        """(habit × day) mask of the days each habit was tracked."""
+        columns = np.arange(self.first_day, self.last_day + 1)
+        return columns[None, :] >= self.tracked_from[:, None]
+
+    def completion_rates(self):
+        """Share of each habit's target met over the days it was tracked (0 where nothing
+        was tracked); for daily habits, completed days over tracked calendar days."""
+        met, expected = self.target_progress()
+        met, expected = met.sum(axis=1), expected.sum(axis=1)
+        return np.minimum(np.divide(met, expected, out=np.zeros(len(expected)), where=expected > 0), 1)
+
+    def period_index(self, period):
+        """Index of the calendar period ('day', 'week' from Monday or 'month') of each column, from 0."""
+        ordinals = np.arange(self.first_day, self.last_day + 1)
+        if period == "week":
+            # Day ordinal 1, 0001-01-01, was a Monday
+            codes = (ordinals - 1) // 7
+        elif period == "month":
+            codes = (ordinals - EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        else:
+            codes = ordinals
+        return codes - codes[0]
+
+    def _schedule_groups(self):
+        # (period, row indices, column period index, first column of each period)
+        # for each period the habits are scheduled by, so every habit on the same
+        # period is bucketed in one pass
+        for period in PERIODS:
+            rows = np.flatnonzero(self.periods == period)
+            if len(rows):
+                index = self.period_index(period)
+                yield period, rows, index, np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+
+    def target_progress(self):
+        """(met, expected) (habit × day) arrays whose sums over any span of days give the
+        completions that counted towards each habit's target and the completions the
+        target asked for.
+
+        A period's completions beyond the target don't count, and the target is
+        spread evenly over the period's days, so a span covering part of a period
+        expects that share of it. For daily habits these are just the completed and
+        tracked days; when every habit is daily they come back as bool masks."""
+        tracked = self.tracked_mask()
+        if (self.periods == "day").all():
+            return self.values, tracked
+        met = self.values.astype(np.float64)
+        expected = tracked.astype(np.float64)
+        for period, rows, index, starts in self._schedule_groups():
+            if period == "day":
+                continue
+            targets = self.targets[rows, None]
+            counts = np.add.reduceat(self.values[rows].astype(np.int32), starts, axis=1)[:, index]
+            met[rows] *= np.minimum(1, targets / np.maximum(counts, 1))
+            if period == "week":
+                days = 7
+            else:
+                months = (np.arange(self.first_day, self.last_day + 1) - EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]")
+                days = ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(np.int64)
+            expected[rows] *= targets / days
+        return met, expected
+
+    def schedule_streaks(self, today=None):
+        """Streaks against each habit's target, counted in its own periods (days, weeks or months).
+
+        Returns (history, before, current): int (habit × day) arrays of the streak
+        each day reached (the run of met periods up to that day's, once the
+        target is met that day, else 0) and of the streak each completion
+        extended (what the habit showed just before it), and the current streak
+        per habit: the run up to today's period if it is met already, or else up
+        to the one before. For daily habits history is run_lengths(values)."""
+        history = np.zeros(self.values.shape, dtype=np.int32)
+        before = np.zeros(self.values.shape, dtype=np.int32)
+        for period, rows, index, starts in self._schedule_groups():
+            values = self.values[rows]
+            targets = self.targets[rows, None]
+            runs, previous = self._period_runs(values, targets, starts)
+
+            # Completions so far within each day's period
+            so_far = np.cumsum(values, axis=1, dtype=np.int32)
+            before_period = np.zeros((len(rows), len(starts)), dtype=np.int32)
+            before_period[:, 1:] = so_far[:, starts[1:] - 1]
+            so_far -= before_period[:, index]
+
+            history[rows] = np.where(so_far >= targets, runs[:, index], 0)
+            before[rows] = np.where(values, np.where(so_far - values >= targets, runs[:, index], previous[:, index]), 0)
+        return history, before, self.current_streaks(today)
+
+    @staticmethod
+    def _period_runs(values, targets, starts):
+        # Run of met periods ending at each period, and at the period before it
+        runs = run_lengths(np.add.reduceat(values.astype(np.int32), starts, axis=1) >= targets)
+        previous = np.zeros_like(runs)
+        previous[:, 1:] = runs[:, :-1]
+        return runs, previous
+
+    def longest_streaks(self):
+        """Longest streak per habit against its target (see schedule_streaks)."""
+        if not self.values.size:
+            return np.zeros(len(self.habit_ids), dtype=np.int64)
+        return self.schedule_streaks()[0].max(axis=1)
+
+    def current_streaks(self, today=None):
+        """Current streak per habit against its target: the run of met periods up to
+        today's if it is met already, or else up to the one before (for daily
+        habits the run ending today, or yesterday if today isn't done yet).
+
+        Only whole periods are bucketed, so this is much cheaper than schedule_streaks."""
+        current = np.zeros(len(self.habit_ids), dtype=np.int64)
+        today = day_ordinal(today or date.today()) - self.first_day
+        if not self.values.size or today < 0:
+            return current
+        today = min(today, self.values.shape[1] - 1)
+        for period, rows, index, starts in self._schedule_groups():
+            values = self.values[rows]
+            targets = self.targets[rows]
+            runs, previous = self._period_runs(values, targets[:, None], starts)
+            this_period = index[today]
+            so_far = values[:, starts[this_period]:today + 1].sum(axis=1)
+            current[rows] = np.where(so_far >= targets, runs[:, this_period], previous[:, this_period])
+        return current
+
+    def rolling_counts(self, window, against_target=False):
+        """Completed and tracked days per habit in the `window` days ending on each day,
+        as int (habit × day) arrays; windows are cut off at the matrix's first day.
+        With against_target, the sums of target_progress() instead (floats unless
+        every habit is daily).
+
+        Each mask is summed once along the days, and every window is the
+        difference of two of those prefix sums, so the cost doesn't grow with `window`."""
+        starts = np.maximum(np.arange(1, self.values.shape[1] + 1) - window, 0)
+        counts = []
+        for mask in self.target_progress() if against_target else (self.values, self.tracked_mask()):
+            dtype = np.int32 if mask.dtype == bool else np.float64
+            sums = np.zeros((mask.shape[0], mask.shape[1] + 1), dtype=dtype)
+            np.cumsum(mask, axis=1, dtype=dtype, out=sums[:, 1:])
+            counts.append(sums[:, 1:] - sums[:, starts])
+        return counts[0], counts[1]
+
+    def pair_counts(self):
+        """Day counts for every ordered pair of habits (i, j) over the days both were tracked.
+
+        Returns (same_day, next_day), each a tuple of float (habit × habit)
+        arrays (both done, i done, j done, days); in next_day, habit j is read
+        on the day after habit i. The completion and tracked masks are stacked
+        with copies shifted by a day, so all eight counts come out of one
+        matrix product."""
+        n, days = self.values.shape
+        stacked = np.zeros((4 * n, days), dtype=np.float32)
+        stacked[:n] = self.values
+        stacked[n:2 * n] = self.tracked_mask()
+        stacked[2 * n:, :-1] = stacked[:2 * n, 1:]
+        product = (stacked @ stacked[:2 * n].T).astype(np.float64)
+
+        def blocks(counts):
+            return counts[:n, :n], counts[:n, n:], counts[n:, :n], counts[n:, n:]
+        return blocks(product[:2 * n]), blocks(product[2 * n:].T)
+
+    def aggregate(self, freq, against_target=False):
+        """Completed and tracked days per habit in each calendar period ('W' weeks from Monday, 'M' months).
+
+        Returns (period_starts, completed, tracked): a DatetimeIndex of period
+        starts and int (habit × period) arrays of completed days and of days the
+        habit was tracked (partial periods at the window edges count only the
+        days inside the window). With against_target, the sums of
+        target_progress() instead."""
+        periods = self.dates.to_period(freq)
+        codes = periods.asi8
+        bounds = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        completed, tracked = self.target_progress() if against_target else (self.values, self.tracked_mask())
+        if completed.dtype == bool:
+            completed, tracked = completed.astype(np.int32), tracked.astype(np.int32)
+        completed = np.add.reduceat(completed, bounds, axis=1)
+        tracked = np.add.reduceat(tracked, bounds, axis=1)
+        return periods[bounds].start_time, completed, tracked
+
+    def period_rates(self, freq, groups):
+        """Share of the target met per group (e.g. category) and calendar period, pooled
+        over the group's habits; NaN where none of them was tracked."""
+        starts, completed, tracked = self.aggregate(freq, against_target=True)
+        completed = pd.DataFrame(completed, index=groups, columns=starts).groupby(level=0, sort=False).sum()
+        tracked = pd.DataFrame(tracked, index=groups, columns=starts).groupby(level=0, sort=False).sum()
+        return (completed / tracked.where(tracked > 0)).clip(upper=1)
+
+    def frame(self):
+        """The matrix as a boolean DataFrame indexed by habit id, with dates as columns."""
+        return pd.DataFrame(self.values, index=self.habit_ids, columns=self.dates)
@@ -0,0 +1,229 @@
+import json
+import os
+import struct
+import zlib
+from datetime import date
+
+import numpy as np
+
+from habit_streaks import EPOCH_ORDINAL, check_schedule, schedule
+
+# Compact backup format for habit_tracker.py (.hqp "habit pack")
+#
+# A pack stores each habit's completion history as its own compressed block
+# followed by a compressed JSON index, so a pack is streamed out one habit
+# at a time without building the whole document in memory:
+#
+#   header  "HQPK" | version u16 | reserved u16
+#   blocks  one zlib block per habit (see encode_completions)
+#   index   zlib JSON {"user", "achievements", "habits": [[id, fields, offset, length], ...]}
+#   footer  index offset u64 | index length u32 | "HQPK"
+#
+# Version 0 is the JSON document the app used to save and still exports
+# ({"habits", "achievements", "user"}); read_state migrates it on load.
+PACK_MAGIC = b"HQPK"
+PACK_VERSION = 1
+HEADER = struct.Struct("<4sHH")
+FOOTER = struct.Struct("<QI4s")
+
+# Day states inside a block: no entry, completed, or explicitly not completed
+NO_ENTRY, DONE, NOT_DONE = 0, 1, 2
+
+# Block encodings: two bitmaps (done, not done), or runs of equal day states
+BITMAP, RUNS = 0, 1
+BLOCK_HEADER = struct.Struct("<iIB")
+
+# Habit counters a backup may leave out, and their defaults
+HABIT_COUNTERS = {"streak": 0, "longest_streak": 0, "xp": 0, "level": 1}
+DEFAULT_USER = {"total_xp": 0, "level": 1, "next_level_xp": 100}
+
+def encode_completions(completions):
+    """Compress a {'YYYY-MM-DD': bool} dict into a block, as bitmaps or runs,
+    whichever is smaller before compression."""
+    if not completions:
+        return zlib.compress(BLOCK_HEADER.pack(0, 0, BITMAP))
+
+    days = np.array(list(completions), dtype="datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+    done = np.fromiter(completions.values(), dtype=bool, count=len(completions))
+    first = int(days.min())
+    states = np.zeros(int(days.max()) - first + 1, dtype=np.uint8)
+    states[days - first] = np.where(done, DONE, NOT_DONE)
+    return _encode_states(first, states)
+
+def encode_days(days):
+    """Compress a sorted array of completed day ordinals into a block."""
+    if not len(days):
+        return zlib.compress(BLOCK_HEADER.pack(0, 0, BITMAP))
+    first = int(days[0])
+    states = np.zeros(int(days[-1]) - first + 1, dtype=np.uint8)
+    states[np.asarray(days) - first] = DONE
+    return _encode_states(first, states)
+
+def _encode_states(first, states):
+    # Bitmaps or runs, whichever is smaller before compression
+    bitmaps = np.packbits(states == DONE, bitorder='little').tobytes() + np.packbits(states == NOT_DONE, bitorder='little').tobytes()
+    starts = np.flatnonzero(np.r_[True, states[1:] != states[:-1]])
+    lengths = np.diff(np.r_[starts, len(states)]).astype("<u4")
+    if len(starts) * 5 < len(bitmaps):
+        body = BLOCK_HEADER.pack(first, len(states), RUNS) + states[starts].tobytes() + lengths.tobytes()
+    else:
+        body = BLOCK_HEADER.pack(first, len(states), BITMAP) + bitmaps
+    return zlib.compress(body)
+
+def decode_completions(block):
+    """The {'YYYY-MM-DD': bool} dict stored in a block."""
+    first, states = _decode_states(block)
+    recorded = np.flatnonzero(states)
+    names = np.datetime_as_string((recorded + first - EPOCH_ORDINAL).astype("datetime64[D]"), unit="D")
+    return dict(zip(names.tolist(), (states[recorded] == DONE).tolist()))
+
+def decode_days(block):
+    """Sorted ordinals of the completed days stored in a block."""
+    first, states = _decode_states(block)
+    return np.flatnonzero(states == DONE) + first
+
+def _decode_states(block):
+    # (first day ordinal, day states from it)
+    body = zlib.decompress(block)
+    first, n_days, encoding = BLOCK_HEADER.unpack_from(body)
+    data = np.frombuffer(body, dtype=np.uint8, offset=BLOCK_HEADER.size)
+    if encoding == BITMAP:
+        size = (n_days + 7) // 8
+        done = np.unpackbits(data[:size], count=n_days, bitorder='little')
+        not_done = np.unpackbits(data[size:2 * size], count=n_days, bitorder='little')
+        states = done * DONE + not_done * NOT_DONE
+    elif encoding == RUNS:
+        runs = len(data) // 5
+        states = np.repeat(data[:runs], data[runs:].view("<u4"))
+    else:
+        raise ValueError(f"Unknown block encoding {encoding}")
+    return first, states
+
+def write_pack(file, habits, achievements, user):
+    """Stream habits, achievements and XP to a binary file object as a pack,
+    one habit block at a time."""
+    file.write(HEADER.pack(PACK_MAGIC, PACK_VERSION, 0))
+    offset = HEADER.size
+    index = []
+    for habit_id, habit in habits.items():
+        block = encode_completions(habit["completions"])
+        file.write(block)
+        fields = {key: value for key, value in habit.items() if key != "completions"}
+        index.append([habit_id, fields, offset, len(block)])
+        offset += len(block)
+
+    meta = zlib.compress(json.dumps({"user": user, "achievements": achievements, "habits": index}, default=str).encode())
+    file.write(meta)
+    file.write(FOOTER.pack(offset, len(meta), PACK_MAGIC))
+
+class PackReader:
+    """Reads a pack's header and index; load_state then decodes every habit's block."""
+
+    def __init__(self, file):
+        self.file = file
+        magic, self.version, _ = HEADER.unpack(file.read(HEADER.size))
+        if magic != PACK_MAGIC:
+            raise ValueError("Not a habit pack")
+        if self.version > PACK_VERSION:
+            raise ValueError(f"Pack version {self.version} is newer than this app supports ({PACK_VERSION})")
+
+        file.seek(-FOOTER.size, os.SEEK_END)
+        index_offset, index_length, magic = FOOTER.unpack(file.read(FOOTER.size))
+        if magic != PACK_MAGIC:
+            raise ValueError("Habit pack is truncated")
+        file.seek(index_offset)
+        index = json.loads(zlib.decompress(file.read(index_length)))
+        self.user = index["user"]
+        self.achievements = index["achievements"]
+        self._habits = {habit_id: (fields, offset, length) for habit_id, fields, offset, length in index["habits"]}
+
+    def load_state(self):
+        """(habits, achievements, user) with every habit decoded."""
+        habits = {}
+        for habit_id, (fields, offset, length) in self._habits.items():
+            self.file.seek(offset)
+            habits[habit_id] = {**fields, "completions": decode_completions(self.file.read(length))}
+        return habits, self.achievements, self.user
+
+def read_state(file):
+    """(habits, achievements, user) from a pack or a version 0 JSON document,
+    given a seekable binary file object. Raises ValueError if it is neither."""
+    magic = file.read(len(PACK_MAGIC))
+    file.seek(0)
+    try:
+        if magic == PACK_MAGIC:
+            return _check_state(*PackReader(file).load_state())
+        return _check_state(*_migrate_json(json.load(file)))
+    except (zlib.error, struct.error, KeyError, TypeError) as e:
+        raise ValueError(f"Damaged habit data: {e}") from e
+
+def _migrate_json(data):
+    # Version 0: the saved/exported JSON document, habits carrying their completions inline
+    if not isinstance(data, dict) or not isinstance(data.get("habits"), dict):
+        raise ValueError("Not a habit tracker export")
+    return data["habits"], data.get("achievements", {}), data.get("user", DEFAULT_USER)
+
+def _check_state(habits, achievements, user):
+    """Validate a state read from a backup and fill in the fields it may leave
+    out, so it saves as a whole; raises ValueError naming what is wrong."""
+    if not isinstance(achievements, dict) or not all(
+        isinstance(group, dict) and all(isinstance(achievement, dict) and "earned" in achievement for achievement in group.values())
+        for group in achievements.values()
+    ):
+        raise ValueError("The backup's achievements are damaged")
+    if any(not isinstance(achievement["earned"], dict) for achievement in achievements.get("streaks", {}).values()):
+        raise ValueError("The backup's streak achievements are damaged")
+    if not isinstance(user, dict):
+        raise ValueError("The backup's user record is damaged")
+    try:
+        user = {field: int(user.get(field, default)) for field, default in DEFAULT_USER.items()}
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"The backup's user record is damaged: {e}") from e
+    return {habit_id: _check_habit(habit_id, habit) for habit_id, habit in habits.items()}, achievements, user
+
+def _check_habit(habit_id, habit):
+    """One backed-up habit, validated and with its missing counters and
+    creation date filled in."""
+    if not isinstance(habit, dict):
+        raise ValueError(f"Habit {habit_id!r} is not a habit record")
+    for field in ("name", "category"):
+        if not isinstance(habit.get(field), str) or not habit[field].strip():
+            raise ValueError(f"Habit {habit_id!r} has no {field}")
+    completions = habit.get("completions", {})
+    if not isinstance(completions, dict):
+        raise ValueError(f"Habit {habit_id!r} has damaged completions")
+
+    # Dates must be 'YYYY-MM-DD'; numpy parses them all at once and
+    # round-tripping them rejects partial dates it would otherwise accept
+    days = list(completions)
+    try:
+        parsed = np.datetime_as_string(np.array(days, dtype="datetime64[D]"), unit="D")
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Habit {habit_id!r} has a damaged completion date: {e}") from e
+    if days and (parsed != np.array(days, dtype=object)).any():
+        raise ValueError(f"Habit {habit_id!r} has a completion date not in YYYY-MM-DD form")
+
+    try:
+        counters = {field: int(habit.get(field, default)) for field, default in HABIT_COUNTERS.items()}
+        target, period = schedule(habit)
+        check_schedule(target, period)
+    except TypeError as e:
+        raise ValueError(f"Habit {habit_id!r} has a damaged field: {e}") from e
+    except ValueError as e:
+        raise ValueError(f"Habit {habit_id!r}: {e}") from e
+
+    created = habit.get("created_date")
+    if created is None:
+        created = min(days) if days else date.today().isoformat()
+    try:
+        date.fromisoformat(str(created)[:10])
+    except ValueError as e:
+        raise ValueError(f"Habit {habit_id!r} has a damaged creation date") from e
+    return {
+        **habit,
+        **counters,
+        "completions": {day: bool(done) for day, done in completions.items()},
+        "target": target,
+        "period": period,
+        "created_date": str(created)
+    }
@@ -0,0 +1,122 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import habit_archive
+import habit_matrix
+import habit_rules
+import habit_store
+import habit_streaks
+
+# Per-user profiles for habit_tracker.py
+#
+# Each profile has its own SQLite database, so users on a shared instance
+# never write to each other's data. Loaded profiles are kept in a
+# process-wide LRU cache and shared by every session (browser tab) of the
+# same user; mutations take the profile's lock, so changes made from two
+# tabs are applied to one in-memory state and merge instead of clobbering.
+PROFILES_DIR = "profiles"
+DEFAULT_PROFILE = "default"
+MAX_CACHED_PROFILES = 64
+
+def profile_slug(name):
+    """Normalise a profile name to a safe file name ('' if nothing usable is left)."""
+    return re.sub(r"[^a-z0-9_-]+", "_", name.strip().lower()).strip("_")[:64]
+
+def profile_path(name):
+    """Database file for a profile; the default profile keeps the original habit_data.db."""
+    slug = profile_slug(name)
+    if not slug or slug == DEFAULT_PROFILE:
+        return habit_store.DB_FILE
+    return os.path.join(PROFILES_DIR, f"{slug}.db")
+
+class Profile:
+    """One user's habits, achievements and XP plus the derived indexes built from them."""
+
+    def __init__(self, name):
+        self.name = profile_slug(name) or DEFAULT_PROFILE
+        self.path = profile_path(self.name)
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.habits = {}
+        self.achievements = {}
+        self.user = {}
+        self.completion_bits = {}
+        self.streak_index = None
+        self.rules = None
+        self.xp_ledger = None
+        # Completed days before archive_before (a day ordinal) live in the
+        # archive tier and are decoded on demand (see habit_archive)
+        self.archive_before = None
+        self.archived_counts = {}
+        self.archived_days = {}
+        self.archive_loaded = False
+        # Bumped on every change to habits or completions; analytics results are
+        # cached per version in an LRU (see habit_analytics.cached_view)
+        self.data_version = 0
+        self.analytics_cache = OrderedDict()
+
+def build_indexes(profile):
+    """Build a freshly loaded profile's completion bitmaps, streak index and
+    achievement counters, and refresh streaks that lapsed since the last visit."""
+    profile.completion_bits = habit_matrix.build_bitmaps(profile.habits)
+    profile.streak_index = habit_streaks.StreakIndex.from_habits(profile.habits)
+
+    # A streak running back to the archive cutoff continues in the archived days
+    streaks = current_streaks(profile)
+    if habit_archive.reaches_archive(profile, streaks):
+        habit_archive.ensure(profile)
+        streaks = current_streaks(profile)
+    for habit_id, streak in streaks.items():
+        profile.habits[habit_id]["streak"] = streak
+    profile.rules = habit_rules.AchievementEngine.from_habits(profile.habits, completed_days=habit_archive.completed_days(profile))
+
+def current_streaks(profile, habit_ids=None):
+    """{habit_id: current streak} for the given habits (all if None) as of today.
+
+    Daily habits read the incremental streak index; weekly and monthly ones
+    are bucketed into their periods together in one completion matrix."""
+    habit_ids = profile.habits if habit_ids is None else habit_ids
+    streaks = {}
+    scheduled = {}
+    for habit_id in habit_ids:
+        habit = profile.habits[habit_id]
+        if habit_streaks.schedule(habit)[1] == "day":
+            streaks[habit_id] = profile.streak_index.current_streak(habit_id)
+        else:
+            scheduled[habit_id] = habit
+    if scheduled:
+        matrix = habit_matrix.CompletionMatrix(scheduled, profile.completion_bits)
+        streaks.update(zip(matrix.habit_ids, matrix.current_streaks().tolist()))
+    return streaks
+
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+
+def get_profile(name, loader):
+    """Return the cached profile for `name`, loading it with `loader(profile)` on a miss.
+
+    Loading happens under the profile's own lock, so other profiles stay
+    available while one is read from disk and concurrent sessions of the same
+    user wait for a single load."""
+    slug = profile_slug(name) or DEFAULT_PROFILE
+    with _profiles_lock:
+        profile = _profiles.get(slug)
+        if profile is None:
+            profile = _profiles[slug] = Profile(slug)
+        _profiles.move_to_end(slug)
+        evicted = []
+        while len(_profiles) > MAX_CACHED_PROFILES:
+            evicted.append(_profiles.popitem(last=False)[1])
+
+    for old in evicted:
+        habit_store.release(old.path)
+
+    with profile.lock:
+        if not profile.loaded:
+            if os.path.dirname(profile.path):
+                os.makedirs(os.path.dirname(profile.path), exist_ok=True)
+            loader(profile)
+            profile.loaded = True
+    return profile
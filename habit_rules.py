@@ -0,0 +1,219 @@
+from datetime import datetime
+
+import numpy as np
+
+# Event-driven achievement rules for habit_tracker.py
+#
+# Achievements are declared as data: each one names the counter it watches
+# and the value (a number or another counter) that counter has to reach.
+# Completion events update a few per-habit, per-category and profile-wide
+# counters and report which counters changed; only achievements subscribed
+# to those counters are evaluated, so a toggle costs the same however many
+# habits and days of history a profile has.
+#
+# Per-habit achievements watch the habit's own counters:
+#   streak          current streak of the habit, in its own periods (days,
+#                   or weeks/months that met a weekly or monthly target)
+#   completed_days  days the habit was completed
+# Profile achievements watch the profile-wide counters:
+#   habits_completed      habits completed at least once
+#   categories            categories that have habits
+#   categories_completed  categories with at least one completed habit
+
+ACHIEVEMENTS = {
+    "streaks": {
+        "3_day_streak": {"name": "3-Day Warrior", "description": "Complete a habit for 3 days (or target weeks or months) in a row", "xp": 30,
+                         "per_habit": True, "when": ("streak", 3)},
+        "7_day_streak": {"name": "Week Champion", "description": "Complete a habit for 7 days (or target weeks or months) in a row", "xp": 70,
+                         "per_habit": True, "when": ("streak", 7)},
+        "30_day_streak": {"name": "Monthly Master", "description": "Complete a habit for 30 days (or target weeks or months) in a row", "xp": 300,
+                          "per_habit": True, "when": ("streak", 30)},
+        "100_day_streak": {"name": "Centurion", "description": "Complete a habit for 100 days (or target weeks or months) in a row", "xp": 1000,
+                           "per_habit": True, "when": ("streak", 100)}
+    },
+    "milestones": {
+        "first_habit": {"name": "First Steps", "description": "Complete any habit for the first time", "xp": 10,
+                        "when": ("habits_completed", 1)},
+        "five_habits": {"name": "Variety Pack", "description": "Complete 5 different habits", "xp": 50,
+                        "when": ("habits_completed", 5)},
+        "all_categories": {"name": "Well-Rounded", "description": "Complete at least one habit from each category", "xp": 100,
+                           "when": ("categories_completed", "categories")}
+    }
+}
+
+# XP for checking off a habit: 5 plus 2 per day of the streak it extends, capped at 20
+def completion_xp(streak):
+    return np.minimum(20, 5 + 2 * np.asarray(streak))
+
+def xp_level(xp):
+    """Level for an XP total, 1 + sqrt(xp / 100) rounded down (numbers or arrays)."""
+    return np.maximum(1, np.floor(1 + np.sqrt(np.maximum(np.asarray(xp), 0) / 100))).astype(np.int64)
+
+def new_achievements(definitions=ACHIEVEMENTS):
+    """The achievements dict habit_tracker keeps per profile, with nothing earned yet."""
+    return {
+        kind: {
+            achievement_id: {
+                "name": definition["name"],
+                "description": definition["description"],
+                "xp": definition["xp"],
+                "earned": {} if definition.get("per_habit") else False
+            }
+            for achievement_id, definition in achievements.items()
+        }
+        for kind, achievements in definitions.items()
+    }
+
+def backfill_habit_achievements(achievements, habit_ids, dates, history, definitions=ACHIEVEMENTS):
+    """Mark the per-habit achievements reached anywhere in the habits' history.
+
+    `history` maps a counter name to a (habit × day) array of its value on each
+    of `dates`; an achievement's earned date is the first day its condition
+    held. Already earned achievements keep their original date. Returns the
+    newly unlocked (kind, achievement_id, habit_id)."""
+    unlocked = []
+    for kind, items in definitions.items():
+        for achievement_id, definition in items.items():
+            counter, target = definition["when"]
+            if not definition.get("per_habit") or counter not in history or isinstance(target, str):
+                continue
+            reached = history[counter] >= target
+            first_day = reached.argmax(axis=1)
+            earned = achievements[kind][achievement_id]["earned"]
+            for row in np.flatnonzero(reached.any(axis=1)):
+                habit_id = habit_ids[row]
+                if habit_id not in earned:
+                    earned[habit_id] = dates[first_day[row]].strftime("%Y-%m-%d")
+                    unlocked.append((kind, achievement_id, habit_id))
+    return unlocked
+
+class AchievementEngine:
+    def __init__(self, definitions=ACHIEVEMENTS):
+        self.definitions = definitions
+        self.habit_counters = {}
+        self.category_counters = {}
+        self.counters = {"habits_completed": 0, "categories": 0, "categories_completed": 0}
+        self._categories = {}
+
+        # Counter name -> achievements that need re-checking when it changes, with
+        # each achievement's position so unlocks are reported in declaration order
+        self._subscribers = {}
+        self._order = {}
+        for kind, achievements in definitions.items():
+            for achievement_id, definition in achievements.items():
+                self._order[(kind, achievement_id)] = len(self._order)
+                for name in definition["when"]:
+                    if isinstance(name, str):
+                        self._subscribers.setdefault(name, []).append((kind, achievement_id))
+
+    @classmethod
+    def from_habits(cls, habits, definitions=ACHIEVEMENTS, completed_days=None):
+        """Build the counters for a {habit_id: habit} dict (one pass at load time);
+        completed_days ({habit_id: count}) overrides counting each habit's completions."""
+        engine = cls(definitions)
+        for habit_id, habit in habits.items():
+            if completed_days is None:
+                completed = sum(habit["completions"].values())
+            else:
+                completed = completed_days.get(habit_id, 0)
+            engine.add_habit(habit_id, habit["category"], completed, habit["streak"])
+        return engine
+
+    def add_habit(self, habit_id, category, completed_days=0, streak=0):
+        """Start tracking a habit; returns the names of the counters that changed."""
+        self._categories[habit_id] = category
+        self.habit_counters[habit_id] = {"streak": streak, "completed_days": completed_days}
+        changed = {"streak", "completed_days"}
+
+        counters = self.category_counters.setdefault(category, {"habits": 0, "completed_habits": 0})
+        counters["habits"] += 1
+        if counters["habits"] == 1:
+            self.counters["categories"] += 1
+            changed.add("categories")
+        if completed_days:
+            changed |= self._habit_completed(category, 1)
+        return changed
+
+    def remove_habit(self, habit_id):
+        """Stop tracking a habit; returns the names of the counters that changed."""
+        category = self._categories.pop(habit_id, None)
+        habit = self.habit_counters.pop(habit_id, None)
+        if category is None:
+            return set()
+
+        changed = set()
+        if habit["completed_days"]:
+            changed |= self._habit_completed(category, -1)
+        counters = self.category_counters[category]
+        counters["habits"] -= 1
+        if not counters["habits"]:
+            del self.category_counters[category]
+            self.counters["categories"] -= 1
+            changed.add("categories")
+        return changed
+
+    def record(self, habit_id, done, streak):
+        """Apply a completion (done=True) or un-completion event with the habit's new
+        current streak; returns the names of the counters that changed."""
+        habit = self.habit_counters[habit_id]
+        changed = {"completed_days"}
+        before = habit["completed_days"]
+        habit["completed_days"] = max(0, before + (1 if done else -1))
+        if bool(before) != bool(habit["completed_days"]):
+            changed |= self._habit_completed(self._categories[habit_id], 1 if done else -1)
+        if streak != habit["streak"]:
+            habit["streak"] = streak
+            changed.add("streak")
+        return changed
+
+    def set_streak(self, habit_id, streak):
+        """Apply a habit's recomputed current streak (e.g. after its target changed);
+        returns the names of the counters that changed."""
+        habit = self.habit_counters[habit_id]
+        if streak == habit["streak"]:
+            return set()
+        habit["streak"] = streak
+        return {"streak"}
+
+    def _habit_completed(self, category, delta):
+        # A habit gained (delta=1) or lost (delta=-1) its first completion
+        changed = {"habits_completed"}
+        self.counters["habits_completed"] += delta
+        counters = self.category_counters[category]
+        counters["completed_habits"] += delta
+        if counters["completed_habits"] == (1 if delta > 0 else 0):
+            self.counters["categories_completed"] += delta
+            changed.add("categories_completed")
+        return changed
+
+    def _value(self, operand, habit_id):
+        if not isinstance(operand, str):
+            return operand
+        if habit_id is not None:
+            return self.habit_counters[habit_id][operand]
+        return self.counters[operand]
+
+    def evaluate(self, achievements, changed, habit_id=None):
+        """Check the achievements subscribed to the `changed` counters and mark the
+        newly earned ones in `achievements`.
+
+        Returns a list of (kind, achievement_id, habit_id) for each unlock, with
+        habit_id None for profile-wide achievements."""
+        unlocked = []
+        candidates = {key for name in changed for key in self._subscribers.get(name, ())}
+        for kind, achievement_id in sorted(candidates, key=self._order.get):
+            definition = self.definitions[kind][achievement_id]
+            achievement = achievements[kind][achievement_id]
+            counter, target = definition["when"]
+
+            if definition.get("per_habit"):
+                if habit_id is None or habit_id not in self.habit_counters or habit_id in achievement["earned"]:
+                    continue
+                if self._value(counter, habit_id) >= self._value(target, habit_id):
+                    achievement["earned"][habit_id] = datetime.now().strftime("%Y-%m-%d")
+                    unlocked.append((kind, achievement_id, habit_id))
+            elif not achievement["earned"]:
+                if self._value(counter, None) >= self._value(target, None):
+                    achievement["earned"] = True
+                    unlocked.append((kind, achievement_id, None))
+        return unlocked
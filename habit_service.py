@@ -0,0 +1,424 @@
+import argparse
+import json
+import os
+from datetime import datetime
+
+import app_startup
+import habit_archive
+import habit_ledger
+import habit_matrix
+import habit_pack
+import habit_profiles
+import habit_rules
+import habit_store
+import habit_streaks
+
+# Habit logic for habit_tracker.py and any other client
+#
+# Loading profiles, completing and unticking habits (with the streak, XP and
+# achievement updates that follow), adding and deleting habits, importing,
+# restoring and resetting a profile's data, and the analytics views live
+# here with no Streamlit dependency, so a script, a cron job or a load test
+# records completions exactly as the app does:
+#
+#   profile = habit_service.open_profile("alice")
+#   habit_service.complete(profile, "exercise_walking_pad")
+#   habit_service.streaks(profile)
+#
+#   python habit_service.py alice complete exercise_walking_pad
+#   python habit_service.py alice schedule exercise_gym/training --target 3 --period week
+#   python habit_service.py alice compact --horizon 180
+#   python habit_service.py alice import --file history.csv
+#
+# Changes run under the profile's lock and reach the database through its
+# write-behind queue, so any number of threads share one batched commit per
+# AUTOSAVE_DELAY. Processes sharing a database queue on SQLite's write lock,
+# and each reloads its copy of a profile (see refresh) before changing it
+# once another has written; two processes changing the same habit within one
+# autosave window both apply their change.
+
+# Analytics and the CSV importer pull in pandas and plotly, so they load on first use
+habit_analytics = app_startup.lazy_import("habit_analytics")
+habit_import = app_startup.lazy_import("habit_import")
+
+# Habits a new profile starts with
+DEFAULT_CATEGORIES = {
+    "Exercise": ["Walking Pad", "Gym/Training", "Pilates/Yoga"],
+    "Reading": ["Fantasy", "Textbooks", "DK Books"],
+    "Entertainment": ["Gaming", "Movies/TV", "Sport"],
+    "Self Improvement": ["YouTube Learning", "Coding Projects", "Piano"]
+}
+
+# Analytics views by name; analytics(profile, view, *params) builds one with
+# habit_analytics.<function>(profile, *params)
+ANALYTICS_VIEWS = {
+    "heatmap": "heatmap_figure",
+    "streaks": "streak_table",
+    "rates": "completion_rates",
+    "category_rates": "category_rates",
+    "rate_series": "rate_series",
+    "rolling": "rolling_rates",
+    "habit_pairs": "habit_pairs",
+    "correlation": "correlation_figure",
+    "top_pairs": "top_pairs",
+    "xp": "xp_breakdown"
+}
+
+def habit_id_for(category, name):
+    """The id the Add Habit form gives a habit (works on strings and string Series)."""
+    key = category + "_" + name
+    if isinstance(key, str):
+        return key.replace(" ", "_").lower()
+    return key.str.replace(" ", "_").str.lower()
+
+def new_habit(name, category, target=1, period="day"):
+    return {
+        "name": name,
+        "category": category,
+        "streak": 0,
+        "longest_streak": 0,
+        "completions": {},
+        "xp": 0,
+        "level": 1,
+        "target": target,
+        "period": period,
+        "created_date": datetime.now().strftime("%Y-%m-%d")
+    }
+
+def default_habits():
+    return {
+        habit_id_for(category, name): new_habit(name, category)
+        for category, names in DEFAULT_CATEGORIES.items()
+        for name in names
+    }
+
+def default_user():
+    return {"total_xp": 0, "level": 1, "next_level_xp": 100}
+
+def load_profile(profile):
+    """Fill a newly cached profile from its database (or with the defaults)."""
+    profile.habits = default_habits()
+    profile.achievements = habit_rules.new_achievements()
+    profile.user = default_user()
+
+    # Bring over an old habit_data.json the first time the default database is used
+    if profile.path == habit_store.DB_FILE:
+        habit_store.import_legacy_json()
+
+    # Move history past the horizon into the archive once enough has built up
+    habit_archive.compact_if_due(profile.path)
+
+    # Taken before reading, so a write that lands mid-load shows up as a change
+    habit_store.sync_revision(profile.path)
+    if not habit_store.has_data(profile.path):
+        # Fresh database: store the default habits so completions have a habit row
+        habit_store.save_state(profile.habits, profile.achievements, profile.user, path=profile.path)
+    else:
+        habits, earned, user = habit_store.load_state(profile.path)
+        profile.habits = habits
+        for (kind, achievement_id), holders in earned.items():
+            achievement = profile.achievements.get(kind, {}).get(achievement_id)
+            if achievement is not None:
+                achievement["earned"] = dict(holders) if kind == "streaks" else True
+        if user is not None:
+            profile.user = user
+
+    habit_archive.load_summary(profile)
+    habit_profiles.build_indexes(profile)
+    habit_ledger.load(profile)
+
+def open_profile(name=habit_profiles.DEFAULT_PROFILE):
+    """The process-wide profile for `name`, loaded on first use and refreshed
+    if another process has written to its database since."""
+    profile = habit_profiles.get_profile(name, load_profile)
+    refresh(profile)
+    return profile
+
+def refresh(profile):
+    """Reload a profile in place if another process has written to its
+    database since this one read it; returns whether it did."""
+    with profile.lock:
+        if not habit_store.changed_elsewhere(profile.path):
+            return False
+        habit_store.flush_pending(profile.path)
+        load_profile(profile)
+        profile.data_version += 1
+        return True
+
+def save_progress(profile, habit_ids=None, unlocked=None):
+    """Queue the counters of the given habits (all habits if None), the user's XP
+    and the rows of the given (kind, achievement_id, habit_id) unlocked
+    achievements (every earned one if None) for the background writer."""
+    if habit_ids is None:
+        habits = profile.habits
+    else:
+        habits = {habit_id: profile.habits[habit_id] for habit_id in habit_ids if habit_id in profile.habits}
+    if unlocked is None:
+        earned = habit_store.iter_earned_rows(profile.achievements)
+    else:
+        earned = [
+            (kind, achievement_id, habit_id, str(profile.achievements[kind][achievement_id]["earned"][habit_id]))
+            if habit_id else (kind, achievement_id, "", None)
+            for kind, achievement_id, habit_id in unlocked
+        ]
+    habit_store.get_writer(profile.path).save_progress(habits, profile.user, earned)
+
+def flush(profile):
+    """Write the profile's queued changes to its database now."""
+    habit_store.get_writer(profile.path).flush()
+
+def award_xp(profile, habit_id, xp_amount, source):
+    """Record an XP event for a habit (None for profile-wide XP) in the ledger
+    and update the habit's and the user's XP and level from its totals."""
+    event = profile.xp_ledger.record(habit_id, source, xp_amount)
+    habit_store.get_writer(profile.path).append_xp([event])
+    habit_ledger.apply(profile, [habit_id] if habit_id else [])
+
+def award_achievements(profile, unlocked):
+    """Award the XP of newly unlocked (kind, achievement_id, habit_id) achievements
+    and return them."""
+    for kind, achievement_id, habit_id in unlocked:
+        achievement = profile.achievements[kind][achievement_id]
+        award_xp(profile, habit_id, achievement["xp"], habit_ledger.achievement_source(kind, achievement_id))
+    return unlocked
+
+def _update_streak(profile, habit_id, done):
+    # Refresh one habit's streak after a completion event and award the
+    # achievements that depend on what changed
+    habit = profile.habits[habit_id]
+    current_streak = habit_profiles.current_streaks(profile, [habit_id])[habit_id]
+    habit["streak"] = current_streak
+    if current_streak > habit["longest_streak"]:
+        habit["longest_streak"] = current_streak
+    changed = profile.rules.record(habit_id, done, current_streak)
+    return award_achievements(profile, profile.rules.evaluate(profile.achievements, changed, habit_id))
+
+def set_completion(profile, habit_id, done):
+    """Tick (done=True) or untick a habit for today.
+
+    Returns {"changed", "xp", "streak", "unlocked", "level_up"}: whether the
+    box changed (another client may have got there first), the completion XP
+    earned or taken back, the habit's streak, the (kind, achievement_id,
+    habit_id) achievements it unlocked and the user's new level if it rose.
+    Raises ValueError for an unknown habit."""
+    today = datetime.now().strftime("%Y-%m-%d")
+    with profile.lock:
+        refresh(profile)
+        habit = profile.habits.get(habit_id)
+        if habit is None:
+            raise ValueError(f"Unknown habit {habit_id!r}")
+        outcome = {"changed": False, "xp": 0, "streak": habit["streak"], "unlocked": [], "level_up": None}
+        if bool(habit["completions"].get(today, False)) == done:
+            return outcome
+
+        previous_level = profile.user["level"]
+        habit["completions"][today] = done
+        habit_store.get_writer(profile.path).set_completion(habit_id, today, done)
+
+        # Completing earns XP by the streak it extends; unticking takes back what today earned
+        if done:
+            outcome["xp"] = int(habit_rules.completion_xp(habit["streak"]))
+        else:
+            outcome["xp"] = -profile.xp_ledger.completion_xp_today(habit_id)
+        if outcome["xp"]:
+            award_xp(profile, habit_id, outcome["xp"], habit_store.XP_COMPLETION)
+
+        profile.completion_bits[habit_id].set(today, done)
+        profile.data_version += 1
+        if done:
+            profile.streak_index.mark(habit_id, today)
+        else:
+            profile.streak_index.unmark(habit_id, today)
+        outcome["unlocked"] = _update_streak(profile, habit_id, done)
+        save_progress(profile, [habit_id], outcome["unlocked"])
+
+        outcome.update(changed=True, streak=habit["streak"])
+        if profile.user["level"] > previous_level:
+            outcome["level_up"] = profile.user["level"]
+        return outcome
+
+def complete(profile, habit_id):
+    """Mark a habit done for today; see set_completion."""
+    return set_completion(profile, habit_id, True)
+
+def uncomplete(profile, habit_id):
+    """Untick a habit for today, taking back the XP it earned; see set_completion."""
+    return set_completion(profile, habit_id, False)
+
+def add_habit(profile, name, category, target=1, period="day"):
+    """Add a habit due `target` times per day, week or month and return
+    (habit_id, unlocked achievements). Raises ValueError if the profile
+    already has it or the schedule is invalid."""
+    habit_id = habit_id_for(category, name)
+    habit_streaks.check_schedule(target, period)
+    with profile.lock:
+        if habit_id in profile.habits:
+            raise ValueError(f"Habit {habit_id!r} already exists")
+        profile.habits[habit_id] = new_habit(name, category, target, period)
+        profile.completion_bits[habit_id] = habit_matrix.HabitBitmap(datetime.now().date().toordinal())
+        profile.data_version += 1
+        changed = profile.rules.add_habit(habit_id, category)
+        unlocked = award_achievements(profile, profile.rules.evaluate(profile.achievements, changed, habit_id))
+        save_progress(profile, [habit_id], unlocked)
+        return habit_id, unlocked
+
+def set_schedule(profile, habit_id, target, period):
+    """Make a habit due `target` times per day, week or month and return the
+    achievements its recomputed streak unlocked. Its current and longest
+    streaks are recounted in the new periods; XP already earned is kept.
+    Raises ValueError for an unknown habit or an invalid schedule."""
+    habit_streaks.check_schedule(target, period)
+    with profile.lock:
+        refresh(profile)
+        habit = profile.habits.get(habit_id)
+        if habit is None:
+            raise ValueError(f"Unknown habit {habit_id!r}")
+        habit_archive.ensure(profile)
+        habit.update(target=target, period=period)
+        matrix = habit_matrix.CompletionMatrix({habit_id: habit}, profile.completion_bits)
+        habit["streak"] = int(matrix.current_streaks()[0])
+        habit["longest_streak"] = max(habit["streak"], int(matrix.longest_streaks()[0]))
+        profile.data_version += 1
+        changed = profile.rules.set_streak(habit_id, habit["streak"])
+        unlocked = award_achievements(profile, profile.rules.evaluate(profile.achievements, changed, habit_id))
+        save_progress(profile, [habit_id], unlocked)
+        return unlocked
+
+def delete_habit(profile, habit_id):
+    """Delete a habit with its history and return (the removed habit or None,
+    unlocked achievements); removing a habit can complete a set of categories."""
+    with profile.lock:
+        habit = profile.habits.pop(habit_id, None)
+        if habit is None:
+            return None, []
+        habit_store.delete_habit(habit_id, path=profile.path)
+        profile.streak_index.drop(habit_id)
+        profile.completion_bits.pop(habit_id, None)
+        profile.data_version += 1
+        unlocked = award_achievements(profile, profile.rules.evaluate(profile.achievements, profile.rules.remove_habit(habit_id)))
+        if unlocked:
+            save_progress(profile, [], unlocked)
+        return habit, unlocked
+
+def streaks(profile):
+    """{habit_id: {"name", "category", "target", "period", "streak", "longest_streak"}}
+    as of today, streaks counted in each habit's period."""
+    with profile.lock:
+        current = habit_profiles.current_streaks(profile)
+        result = {}
+        for habit_id, habit in profile.habits.items():
+            target, period = habit_streaks.schedule(habit)
+            result[habit_id] = {
+                "name": habit["name"],
+                "category": habit["category"],
+                "target": target,
+                "period": period,
+                "streak": current[habit_id],
+                "longest_streak": habit["longest_streak"]
+            }
+        return result
+
+def period_progress(profile, habit_id):
+    """(completions so far in the habit's current day, week or month, its target)."""
+    target, period = habit_streaks.schedule(profile.habits[habit_id])
+    today = datetime.now().date()
+    start = habit_streaks.period_start(today, period)
+    bitmap = profile.completion_bits.get(habit_id)
+    done = int(bitmap.unpack(start.toordinal(), today.toordinal()).sum()) if bitmap is not None else 0
+    return done, target
+
+def compact(profile, horizon_days=habit_archive.ARCHIVE_AFTER_DAYS):
+    """Archive the profile's completions older than `horizon_days`, drop its
+    unticked ones and reload it; returns (rows dropped, rows archived)."""
+    with profile.lock:
+        refresh(profile)
+        result = habit_archive.compact(profile.path, horizon_days)
+        load_profile(profile)
+        profile.data_version += 1
+        return result
+
+def import_csv(profile, file):
+    """Backfill history from a CSV of habit, category, date and done columns,
+    creating missing habits and recomputing streaks, XP and achievements.
+
+    Returns {"rows", "dropped", "created", "unlocked"}: the rows imported, the
+    rows skipped as invalid or repeated, the habit_ids created and the (kind,
+    achievement_id, habit_id) achievements unlocked. Raises ValueError for a
+    file that isn't such a CSV."""
+    rows, dropped = habit_import.read_completions_csv(file)
+    with profile.lock:
+        refresh(profile)
+        created, unlocked = habit_import.import_completions(profile, rows)
+    return {"rows": len(rows), "dropped": dropped, "created": created, "unlocked": unlocked}
+
+def restore(profile, file):
+    """Replace the profile's data with a .hqp backup or JSON export and reload
+    it; returns the number of habits restored. Raises ValueError for a damaged
+    or foreign file, leaving the data as it was."""
+    habits, achievements, user = habit_pack.read_state(file)
+    with profile.lock:
+        habit_store.replace_state(habits, achievements, user, path=profile.path)
+        load_profile(profile)
+        profile.data_version += 1
+    return len(habits)
+
+def reset(profile):
+    """Delete all of the profile's habits, achievements and XP (and the default
+    profile's old save file) and reload it with the default habits."""
+    with profile.lock:
+        habit_store.clear_all(profile.path)
+        if profile.path == habit_store.DB_FILE and os.path.exists(habit_store.LEGACY_JSON_FILE):
+            os.remove(habit_store.LEGACY_JSON_FILE)
+        load_profile(profile)
+        profile.data_version += 1
+
+def analytics(profile, view, *params):
+    """The named analytics view (see ANALYTICS_VIEWS), reused until the data changes."""
+    if view not in ANALYTICS_VIEWS:
+        raise ValueError(f"Unknown analytics view {view!r}; choose from {', '.join(ANALYTICS_VIEWS)}")
+    return habit_analytics.cached_view(profile, view, params, getattr(habit_analytics, ANALYTICS_VIEWS[view]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Record habit completions and read streaks without the app.")
+    parser.add_argument("profile", help="profile name")
+    parser.add_argument("action", choices=["complete", "uncomplete", "schedule", "streaks", "compact", "import", "restore"])
+    parser.add_argument("habit_ids", nargs="*", help="habits to complete, untick or schedule")
+    parser.add_argument("--target", type=int, default=1, help="with schedule: times the habit is due per period (default 1)")
+    parser.add_argument("--period", choices=habit_streaks.PERIODS, default="day", help="with schedule: day, week or month (default day)")
+    parser.add_argument("--horizon", type=int, default=habit_archive.ARCHIVE_AFTER_DAYS,
+                        help=f"with compact: days of history kept out of the archive (default {habit_archive.ARCHIVE_AFTER_DAYS})")
+    parser.add_argument("--file", help="with import: the CSV to import; with restore: the .hqp backup or JSON export")
+    args = parser.parse_args()
+
+    profile = open_profile(args.profile)
+    if args.action == "streaks":
+        result = streaks(profile)
+    elif args.action == "compact":
+        if args.horizon < 1:
+            parser.error("--horizon must be at least 1 day")
+        dropped, archived = compact(profile, args.horizon)
+        result = {"dropped": dropped, "archived": archived}
+    elif args.action in ("import", "restore"):
+        if not args.file:
+            parser.error(f"{args.action} needs --file")
+        try:
+            with open(args.file, "rb") as file:
+                if args.action == "import":
+                    result = import_csv(profile, file)
+                else:
+                    result = {"restored": restore(profile, file)}
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    else:
+        try:
+            if args.action == "schedule":
+                result = {habit_id: set_schedule(profile, habit_id, args.target, args.period) for habit_id in args.habit_ids}
+            else:
+                result = {habit_id: set_completion(profile, habit_id, args.action == "complete") for habit_id in args.habit_ids}
+        except ValueError as e:
+            parser.error(str(e))
+        flush(profile)
+    print(json.dumps(result, indent=4))
+
+if __name__ == "__main__":
+    main()
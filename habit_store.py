@@ -0,0 +1,656 @@
+import sqlite3
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+import habit_pack
+import habit_streaks
+
+# SQLite storage backend for habit_tracker.py
+DB_FILE = "habit_data.db"
+LEGACY_JSON_FILE = "habit_data.json"
+
+# Seconds of changes coalesced into one background write
+AUTOSAVE_DELAY = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS habits (
+    habit_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    streak INTEGER NOT NULL DEFAULT 0,
+    longest_streak INTEGER NOT NULL DEFAULT 0,
+    xp INTEGER NOT NULL DEFAULT 0,
+    level INTEGER NOT NULL DEFAULT 1,
+    created_date TEXT NOT NULL,
+    target INTEGER NOT NULL DEFAULT 1,
+    period TEXT NOT NULL DEFAULT 'day'
+);
+CREATE TABLE IF NOT EXISTS completions (
+    habit_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    done INTEGER NOT NULL,
+    PRIMARY KEY (habit_id, date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS completions_by_date ON completions (date);
+CREATE TABLE IF NOT EXISTS achievements (
+    kind TEXT NOT NULL,
+    achievement_id TEXT NOT NULL,
+    habit_id TEXT NOT NULL DEFAULT '',
+    earned_date TEXT,
+    PRIMARY KEY (kind, achievement_id, habit_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS user_xp (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total_xp INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    next_level_xp INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS xp_ledger (
+    event_id INTEGER PRIMARY KEY,
+    habit_id TEXT,
+    source TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS xp_ledger_by_date ON xp_ledger (date, habit_id, amount);
+CREATE TABLE IF NOT EXISTS xp_snapshots (
+    event_id INTEGER PRIMARY KEY,
+    totals TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS completion_archive (
+    habit_id TEXT PRIMARY KEY,
+    completed_days INTEGER NOT NULL,
+    block BLOB NOT NULL
+);
+"""
+
+# Columns added to tables after their first release, added to older databases when opened
+ADDED_COLUMNS = [
+    ("habits", "target", "INTEGER NOT NULL DEFAULT 1"),
+    ("habits", "period", "TEXT NOT NULL DEFAULT 'day'")
+]
+
+# XP ledger: events are (habit_id, source, amount, date) with habit_id None for
+# profile-wide XP, and the per-habit totals ('' for profile-wide) are
+# snapshotted every XP_SNAPSHOT_EVERY events
+XP_COMPLETION = "completion"
+XP_OPENING_BALANCE = "opening_balance"
+XP_ACHIEVEMENT_PREFIX = "achievement:"
+XP_SNAPSHOT_EVERY = 500
+
+# Grouping keys for xp_totals
+XP_GROUPS = {
+    "habit": "COALESCE(l.habit_id, '')",
+    "category": "CASE WHEN l.habit_id IS NULL THEN 'Milestones' ELSE COALESCE(h.category, 'Deleted habits') END",
+    "day": "l.date",
+    "week": "date(l.date, '-6 days', 'weekday 1')",
+    "month": "substr(l.date, 1, 7) || '-01'"
+}
+
+# One connection per (thread, database); Streamlit may rerun a session on a different thread.
+# Each thread keeps only its most recently used connections open, since a
+# process serving many profiles touches many database files
+_local = threading.local()
+MAX_CONNECTIONS_PER_THREAD = 16
+
+def get_connection(path=DB_FILE):
+    """Return this thread's connection to `path`, creating the schema on first use."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = OrderedDict()
+    conn = connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(SCHEMA)
+        _add_columns(conn)
+        connections[path] = conn
+        while len(connections) > MAX_CONNECTIONS_PER_THREAD:
+            connections.popitem(last=False)[1].close()
+    connections.move_to_end(path)
+    return conn
+
+def _add_columns(conn):
+    # Bring a database created by an older version up to SCHEMA; another
+    # process may be adding the same column at once
+    for table, column, definition in ADDED_COLUMNS:
+        if column in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+            continue
+        try:
+            with conn:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        except sqlite3.OperationalError as e:
+            if "duplicate column" not in str(e):
+                raise
+
+# Every write transaction bumps a revision counter in the meta table. Each
+# process remembers the revision its own writes left behind, so finding any
+# other value means a different process (a script, another server) wrote to
+# the database since this one last loaded or wrote it
+_revisions = {}
+_revisions_lock = threading.Lock()
+
+@contextmanager
+def write_transaction(path=DB_FILE):
+    """A write transaction on this thread's connection to `path`, yielding the connection.
+
+    Bumping the revision is its first statement, so it takes SQLite's write
+    lock immediately: concurrent writers in any process queue behind it on the
+    busy timeout instead of failing to upgrade a read. Commits on exit, rolls
+    back on an exception."""
+    conn = get_connection(path)
+    with conn:
+        revision = int(conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('revision', 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1 RETURNING value"
+        ).fetchone()[0])
+        yield conn
+    with _revisions_lock:
+        if _revisions.get(path) == revision - 1:
+            _revisions[path] = revision
+
+def current_revision(path=DB_FILE):
+    row = get_connection(path).execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+    return int(row[0]) if row else 0
+
+def sync_revision(path=DB_FILE):
+    """Take the database's current revision as this process's view of it; call before loading."""
+    revision = current_revision(path)
+    with _revisions_lock:
+        _revisions[path] = revision
+
+def changed_elsewhere(path=DB_FILE):
+    """Whether another process has written to `path` since this process synced or wrote it.
+
+    A write of this process that is committing at that moment can also read
+    as a change, so callers may reload once too often but never miss one."""
+    with _revisions_lock:
+        known = _revisions.get(path)
+    return known is not None and current_revision(path) != known
+
+def close_connection(path=DB_FILE):
+    """Close this thread's connection to `path`, if it has one open."""
+    connections = getattr(_local, "connections", None)
+    conn = connections.pop(path, None) if connections else None
+    if conn is not None:
+        conn.close()
+
+def has_data(path=DB_FILE):
+    """Whether the database holds any saved state yet."""
+    conn = get_connection(path)
+    return conn.execute("SELECT EXISTS (SELECT 1 FROM habits) OR EXISTS (SELECT 1 FROM user_xp)").fetchone()[0] == 1
+
+def load_state(path=DB_FILE):
+    """Load all saved state in the shape habit_tracker keeps in session state.
+
+    Returns (habits, earned, user): habits maps habit_id to the habit dict
+    (with a `completions` {date: bool} dict), earned maps (kind, achievement_id)
+    to {habit_id: earned_date} ('' as habit_id for milestones), and user is the
+    XP/level dict or None if nothing was saved."""
+    flush_pending(path)
+    conn = get_connection(path)
+    habits = {}
+    for habit_id, name, category, streak, longest, xp, level, target, period, created in conn.execute(
+        "SELECT habit_id, name, category, streak, longest_streak, xp, level, target, period, created_date FROM habits"
+    ):
+        habits[habit_id] = {
+            "name": name,
+            "category": category,
+            "streak": streak,
+            "longest_streak": longest,
+            "completions": {},
+            "xp": xp,
+            "level": level,
+            "target": target,
+            "period": period,
+            "created_date": created
+        }
+
+    # Walks the primary key index, so rows arrive grouped by habit and in date order
+    for habit_id, date, done in conn.execute("SELECT habit_id, date, done FROM completions ORDER BY habit_id, date"):
+        if habit_id in habits:
+            habits[habit_id]["completions"][date] = bool(done)
+
+    earned = {}
+    for kind, achievement_id, habit_id, earned_date in conn.execute(
+        "SELECT kind, achievement_id, habit_id, earned_date FROM achievements"
+    ):
+        earned.setdefault((kind, achievement_id), {})[habit_id] = earned_date
+
+    row = conn.execute("SELECT total_xp, level, next_level_xp FROM user_xp WHERE id = 1").fetchone()
+    user = {"total_xp": row[0], "level": row[1], "next_level_xp": row[2]} if row else None
+    return habits, earned, user
+
+def _upsert_habit(conn, habit_id, habit):
+    target, period = habit_streaks.schedule(habit)
+    conn.execute(
+        "INSERT INTO habits (habit_id, name, category, streak, longest_streak, xp, level, target, period, created_date) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (habit_id) DO UPDATE SET name = excluded.name, category = excluded.category, "
+        "streak = excluded.streak, longest_streak = excluded.longest_streak, xp = excluded.xp, "
+        "level = excluded.level, target = excluded.target, period = excluded.period, created_date = excluded.created_date",
+        (habit_id, habit["name"], habit["category"], int(habit["streak"]), int(habit["longest_streak"]),
+         int(habit["xp"]), int(habit["level"]), target, period, str(habit["created_date"]))
+    )
+
+def _upsert_user(conn, user):
+    conn.execute(
+        "INSERT INTO user_xp (id, total_xp, level, next_level_xp) VALUES (1, ?, ?, ?) "
+        "ON CONFLICT (id) DO UPDATE SET total_xp = excluded.total_xp, level = excluded.level, "
+        "next_level_xp = excluded.next_level_xp",
+        (int(user["total_xp"]), int(user["level"]), int(user["next_level_xp"]))
+    )
+
+def delete_habit(habit_id, path=DB_FILE):
+    """Remove a habit together with its completions and earned achievements."""
+    flush_pending(path)
+    with write_transaction(path) as conn:
+        conn.execute("DELETE FROM completions WHERE habit_id = ?", (habit_id,))
+        conn.execute("DELETE FROM completion_archive WHERE habit_id = ?", (habit_id,))
+        conn.execute("DELETE FROM achievements WHERE habit_id = ?", (habit_id,))
+        conn.execute("DELETE FROM habits WHERE habit_id = ?", (habit_id,))
+
+class WriteBehind:
+    """Coalesces completion and progress writes and flushes them from a background thread.
+
+    Mutations only update the pending sets and wake the flusher, which waits
+    AUTOSAVE_DELAY seconds so every change made in that window goes to the
+    database in a single transaction, however many clicks produced it."""
+
+    def __init__(self, path=DB_FILE, delay=AUTOSAVE_DELAY):
+        self.path = path
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._completions = {}
+        self._habits = {}
+        self._user = None
+        self._earned = set()
+        self._xp = []
+        self._thread = None
+
+    def set_completion(self, habit_id, date, done):
+        with self._lock:
+            self._completions[(habit_id, date)] = bool(done)
+        self._mark_dirty()
+
+    def save_progress(self, habits, user, earned=()):
+        """Queue the counters of the given habits, the user's XP and earned achievement rows."""
+        with self._lock:
+            for habit_id, habit in habits.items():
+                self._habits[habit_id] = {key: value for key, value in habit.items() if key != "completions"}
+            if user is not None:
+                self._user = dict(user)
+            self._earned.update(earned)
+        self._mark_dirty()
+
+    def append_xp(self, events):
+        """Queue (habit_id, source, amount, date) XP events for the ledger."""
+        with self._lock:
+            self._xp.extend(events)
+        self._mark_dirty()
+
+    def _mark_dirty(self):
+        with self._lock:
+            self._dirty.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="habit-autosave", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._dirty.wait()
+            time.sleep(self.delay)
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Pending changes were put back; try again after the next delay
+                self._dirty.set()
+            # Let the thread end once idle, so idle profiles hold no threads
+            with self._lock:
+                if not self._dirty.is_set():
+                    self._thread = None
+                    return
+
+    def flush(self):
+        """Write everything pending now, in one transaction."""
+        # Flushes are serialised so an older batch can never land after a newer one
+        with self._flush_lock:
+            with self._lock:
+                self._dirty.clear()
+                completions, self._completions = self._completions, {}
+                habits, self._habits = self._habits, {}
+                user, self._user = self._user, None
+                earned, self._earned = self._earned, set()
+                xp, self._xp = self._xp, []
+            if not (completions or habits or user or earned or xp):
+                return
+            try:
+                with write_transaction(self.path) as conn:
+                    # Before this batch's achievement rows land: anything already stored
+                    # was earned (and its XP awarded) by another process first
+                    unclaimed_xp = _drop_claimed_achievement_xp(conn, xp)
+                    conn.executemany(
+                        "INSERT INTO completions (habit_id, date, done) VALUES (?, ?, ?) "
+                        "ON CONFLICT (habit_id, date) DO UPDATE SET done = excluded.done",
+                        [(habit_id, date, int(done)) for (habit_id, date), done in completions.items()]
+                    )
+                    for habit_id, habit in habits.items():
+                        _upsert_habit(conn, habit_id, habit)
+                    if user is not None:
+                        _upsert_user(conn, user)
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO achievements (kind, achievement_id, habit_id, earned_date) VALUES (?, ?, ?, ?)",
+                        list(earned)
+                    )
+                    if unclaimed_xp:
+                        _append_xp(conn, unclaimed_xp)
+                        _snapshot_xp(conn)
+            except sqlite3.Error:
+                # Keep anything queued since the swap, it is newer than what failed
+                with self._lock:
+                    self._completions = {**completions, **self._completions}
+                    self._habits = {**habits, **self._habits}
+                    self._user = self._user or user
+                    self._earned |= earned
+                    self._xp = xp + self._xp
+                raise
+
+# One write-behind queue per database file, shared by every session in the process
+_writers = {}
+_writers_lock = threading.Lock()
+
+def get_writer(path=DB_FILE):
+    """Return the process-wide WriteBehind for `path`."""
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = WriteBehind(path)
+        return writer
+
+def release(path=DB_FILE):
+    """Flush and forget the write-behind queue for `path` (when a profile leaves memory)."""
+    with _writers_lock:
+        writer = _writers.pop(path, None)
+    if writer is not None:
+        writer.flush()
+
+def flush_pending(path=DB_FILE):
+    """Write out any queued changes for `path` before reading or bulk-writing it."""
+    writer = _writers.get(path)
+    if writer is not None:
+        writer.flush()
+
+@atexit.register
+def _flush_all():
+    for writer in list(_writers.values()):
+        try:
+            writer.flush()
+        except sqlite3.Error:
+            pass
+
+def iter_earned_rows(achievements):
+    """Flatten habit_tracker's achievements dict into (kind, achievement_id, habit_id, date) rows."""
+    for achievement_id, achievement in achievements.get("streaks", {}).items():
+        for habit_id, earned_date in achievement["earned"].items():
+            yield ("streaks", achievement_id, habit_id, str(earned_date))
+    for achievement_id, achievement in achievements.get("milestones", {}).items():
+        if achievement["earned"]:
+            yield ("milestones", achievement_id, "", None)
+
+def save_state(habits, achievements, user, path=DB_FILE, xp_events=None):
+    """Write the complete state in one transaction (bulk path, used by the importer)."""
+    completions = ((habit_id, date, done)
+                   for habit_id, habit in habits.items()
+                   for date, done in habit["completions"].items())
+    save_bulk(habits, completions, achievements, user, path, xp_events=xp_events)
+
+def save_bulk(habits, completions, achievements, user, path=DB_FILE, rebuild_index=False, xp_events=None):
+    """Upsert the given habits, (habit_id, date, done) completion rows, earned
+    achievements and XP in one transaction.
+
+    With rebuild_index the by-date index is dropped during the upsert and built
+    again afterwards, which is much faster for large imports. xp_events, if
+    given, replace the whole XP ledger (after a full recompute)."""
+    flush_pending(path)
+    with write_transaction(path) as conn:
+        _save_bulk(conn, habits, completions, achievements, user, rebuild_index, xp_events)
+
+def _save_bulk(conn, habits, completions, achievements, user, rebuild_index=False, xp_events=None):
+    for habit_id, habit in habits.items():
+        _upsert_habit(conn, habit_id, habit)
+    if rebuild_index:
+        conn.execute("DROP INDEX IF EXISTS completions_by_date")
+    conn.executemany(
+        "INSERT INTO completions (habit_id, date, done) VALUES (?, ?, ?) "
+        "ON CONFLICT (habit_id, date) DO UPDATE SET done = excluded.done",
+        ((habit_id, date, int(bool(done))) for habit_id, date, done in completions)
+    )
+    if rebuild_index:
+        conn.execute("CREATE INDEX completions_by_date ON completions (date)")
+    conn.executemany(
+        "INSERT OR REPLACE INTO achievements (kind, achievement_id, habit_id, earned_date) VALUES (?, ?, ?, ?)",
+        list(iter_earned_rows(achievements))
+    )
+    _upsert_user(conn, user)
+    if xp_events is not None:
+        conn.execute("DELETE FROM xp_ledger")
+        conn.execute("DELETE FROM xp_snapshots")
+        _append_xp(conn, xp_events)
+        _snapshot_xp(conn, force=True)
+
+def _append_xp(conn, events):
+    conn.executemany(
+        "INSERT INTO xp_ledger (habit_id, source, amount, date) VALUES (?, ?, ?, ?)",
+        ((habit_id or None, source, int(amount), str(day)) for habit_id, source, amount, day in events)
+    )
+
+def _drop_claimed_achievement_xp(conn, events):
+    # Achievement XP events, (habit_id, "achievement:<kind>/<id>", amount, date),
+    # whose achievement is already stored are left out
+    if not any(source.startswith(XP_ACHIEVEMENT_PREFIX) for _, source, _, _ in events):
+        return events
+    claimed = set(conn.execute(
+        "SELECT ? || kind || '/' || achievement_id, habit_id FROM achievements", (XP_ACHIEVEMENT_PREFIX,)
+    ))
+    return [event for event in events if (event[1], event[0] or "") not in claimed]
+
+def _latest_xp_snapshot(conn):
+    row = conn.execute("SELECT event_id, totals FROM xp_snapshots ORDER BY event_id DESC LIMIT 1").fetchone()
+    return (row[0], json.loads(row[1])) if row else (0, {})
+
+def _xp_since(conn, event_id, totals):
+    # Add the events after `event_id` to a copy of the snapshot totals
+    totals = dict(totals)
+    for key, amount in conn.execute(
+        "SELECT COALESCE(habit_id, ''), SUM(amount) FROM xp_ledger WHERE event_id > ? GROUP BY 1", (event_id,)
+    ):
+        totals[key] = totals.get(key, 0) + amount
+    return totals
+
+def _snapshot_xp(conn, force=False):
+    """Snapshot the XP totals once XP_SNAPSHOT_EVERY events have accumulated
+    since the last snapshot (or whenever there are new events, with force)."""
+    event_id, totals = _latest_xp_snapshot(conn)
+    last = conn.execute("SELECT COALESCE(MAX(event_id), 0) FROM xp_ledger").fetchone()[0]
+    if last - event_id < (1 if force else XP_SNAPSHOT_EVERY):
+        return
+    conn.execute("INSERT INTO xp_snapshots (event_id, totals) VALUES (?, ?)", (last, json.dumps(_xp_since(conn, event_id, totals))))
+    conn.execute("DELETE FROM xp_snapshots WHERE event_id < ?", (last,))
+
+def _open_xp_ledger(conn):
+    # A database saved without ledger events (before the ledger existed, or a
+    # restored backup) starts it with each habit's stored XP as an opening
+    # balance dated from its creation, and the rest of the user's XP as profile-wide
+    events = [(habit_id, XP_OPENING_BALANCE, xp, created[:10])
+              for habit_id, xp, created in conn.execute("SELECT habit_id, xp, created_date FROM habits WHERE xp != 0")]
+    row = conn.execute("SELECT total_xp FROM user_xp WHERE id = 1").fetchone()
+    rest = (row[0] if row else 0) - sum(event[2] for event in events)
+    if rest:
+        events.append((None, XP_OPENING_BALANCE, rest, datetime.now().strftime("%Y-%m-%d")))
+    _append_xp(conn, events)
+
+def load_xp(path=DB_FILE, today=None):
+    """XP totals from the latest ledger snapshot plus the events after it.
+
+    Returns (totals, completed_today): totals maps habit_id ('' for profile-wide
+    XP) to its XP, and completed_today maps habit_id to the net completion XP
+    recorded on `today` (so unticking today's box can revoke it)."""
+    flush_pending(path)
+    conn = get_connection(path)
+    if not conn.execute("SELECT EXISTS (SELECT 1 FROM xp_ledger)").fetchone()[0]:
+        with write_transaction(path):
+            # Checked again under the write lock, another process may have opened it meanwhile
+            if not conn.execute("SELECT EXISTS (SELECT 1 FROM xp_ledger)").fetchone()[0]:
+                _open_xp_ledger(conn)
+    totals = _xp_since(conn, *_latest_xp_snapshot(conn))
+    completed_today = dict(conn.execute(
+        "SELECT habit_id, SUM(amount) FROM xp_ledger WHERE date = ? AND source = ? AND habit_id IS NOT NULL GROUP BY habit_id",
+        (today or datetime.now().strftime("%Y-%m-%d"), XP_COMPLETION)
+    ))
+    return totals, completed_today
+
+def xp_totals(by, start=None, end=None, path=DB_FILE):
+    """XP earned per habit, category, day, week or month (`by`, see XP_GROUPS)
+    between the dates `start` and `end` inclusive, as [(key, xp)] in key order.
+
+    Weeks and months are keyed by their first day; habit keys are habit ids
+    ('' for profile-wide XP)."""
+    flush_pending(path)
+    conn = get_connection(path)
+    join = " LEFT JOIN habits h ON h.habit_id = l.habit_id" if by == "category" else ""
+    return conn.execute(
+        f"SELECT {XP_GROUPS[by]} AS key, SUM(l.amount) FROM xp_ledger l{join} "
+        "WHERE l.date >= ? AND l.date <= ? GROUP BY key ORDER BY key",
+        (start or "0000-00-00", end or "9999-99-99")
+    ).fetchall()
+
+def archive_summary(path=DB_FILE):
+    """(archive_before, {habit_id: archived completed days}): the 'YYYY-MM-DD' day
+    before which completions live in the archive (None if nothing was archived
+    yet) and each archived habit's count, without decoding any blocks."""
+    conn = get_connection(path)
+    row = conn.execute("SELECT value FROM meta WHERE key = 'archive_before'").fetchone()
+    counts = dict(conn.execute("SELECT habit_id, completed_days FROM completion_archive"))
+    return (row[0] if row else None), counts
+
+def oldest_completion(path=DB_FILE):
+    """The earliest 'YYYY-MM-DD' in the completions table (None if it is empty)."""
+    return get_connection(path).execute("SELECT MIN(date) FROM completions").fetchone()[0]
+
+def load_archive(path=DB_FILE):
+    """{habit_id: sorted completed day ordinals} decoded from the archive."""
+    conn = get_connection(path)
+    return {habit_id: habit_pack.decode_days(block) for habit_id, block in conn.execute("SELECT habit_id, block FROM completion_archive")}
+
+def compact_history(before, path=DB_FILE):
+    """Drop unticked completions and move the completed days before `before`
+    ('YYYY-MM-DD') into the archive, one compressed block per habit.
+
+    Only the habits with rows to move have their block decoded and written
+    again, and an unticked row for an already archived day takes that day out
+    of the archive. Returns (rows dropped, rows archived)."""
+    flush_pending(path)
+    with write_transaction(path) as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'archive_before'").fetchone()
+        before = max(before, row[0]) if row else before
+
+        # Completed rows to archive and unticked rows for archived days, grouped by habit
+        moved = {}
+        for habit_id, date, done in conn.execute(
+            "SELECT habit_id, date, done FROM completions WHERE date < ? ORDER BY habit_id, date", (before,)
+        ):
+            moved.setdefault(habit_id, ([], []))[0 if done else 1].append(date)
+        for habit_id, (done_dates, unticked_dates) in moved.items():
+            existing = conn.execute("SELECT block FROM completion_archive WHERE habit_id = ?", (habit_id,)).fetchone()
+            days = habit_pack.decode_days(existing[0]) if existing else np.zeros(0, dtype=np.int64)
+            done = np.array(done_dates, dtype="datetime64[D]").astype(np.int64) + habit_streaks.EPOCH_ORDINAL
+            unticked = np.array(unticked_dates, dtype="datetime64[D]").astype(np.int64) + habit_streaks.EPOCH_ORDINAL
+            days = np.setdiff1d(np.union1d(days, done), unticked)
+            conn.execute(
+                "INSERT INTO completion_archive (habit_id, completed_days, block) VALUES (?, ?, ?) "
+                "ON CONFLICT (habit_id) DO UPDATE SET completed_days = excluded.completed_days, block = excluded.block",
+                (habit_id, len(days), habit_pack.encode_days(days))
+            )
+
+        archived = conn.execute("DELETE FROM completions WHERE date < ? AND done = 1", (before,)).rowcount
+        dropped = conn.execute("DELETE FROM completions WHERE done = 0").rowcount
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('archive_before', ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (before,)
+        )
+    return dropped, archived
+
+def export_json(file, habits, achievements, user):
+    """Write the full state as an indented JSON document to a binary file object
+    (the Export Data download), one habit at a time rather than as one string."""
+    def indented(value, depth):
+        return json.dumps(value, indent=4, default=str).replace("\n", "\n" + "    " * depth)
+
+    file.write(b'{\n    "habits": {')
+    for i, (habit_id, habit) in enumerate(habits.items()):
+        file.write(f'{"," if i else ""}\n        {json.dumps(habit_id)}: {indented(habit, 2)}'.encode())
+    file.write(b'\n    },' if habits else b'},')
+    file.write(f'\n    "achievements": {indented(achievements, 1)},\n    "user": {indented(user, 1)}\n}}'.encode())
+
+def clear_all(path=DB_FILE):
+    """Delete all habits, completions, achievements and XP (the import marker is kept)."""
+    flush_pending(path)
+    with write_transaction(path) as conn:
+        _clear_all(conn)
+
+def _clear_all(conn):
+    for table in ("completions", "completion_archive", "achievements", "habits", "user_xp", "xp_ledger", "xp_snapshots"):
+        conn.execute(f"DELETE FROM {table}")
+    conn.execute("DELETE FROM meta WHERE key = 'archive_before'")
+
+def replace_state(habits, achievements, user, path=DB_FILE):
+    """Replace all data with the given state in one transaction (restoring a
+    backup), so a state that fails to save leaves the old data in place."""
+    completions = ((habit_id, date, done)
+                   for habit_id, habit in habits.items()
+                   for date, done in habit["completions"].items())
+    flush_pending(path)
+    with write_transaction(path) as conn:
+        _clear_all(conn)
+        _save_bulk(conn, habits, completions, achievements, user)
+
+def import_legacy_json(json_path=LEGACY_JSON_FILE, path=DB_FILE):
+    """One-time import of the old habit_data.json format into the database.
+
+    Runs only if the JSON file exists, the database is empty and no previous
+    import was recorded. Returns True if data was imported."""
+    conn = get_connection(path)
+    if not os.path.exists(json_path):
+        return False
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_json_imported'").fetchone() or has_data(path):
+        return False
+
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+
+    habits = data.get("habits", {})
+    achievements = data.get("achievements", {})
+    user = data.get("user", {"total_xp": 0, "level": 1, "next_level_xp": 100})
+    save_state(habits, achievements, user, path)
+    with write_transaction(path) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_json_imported', ?)",
+            (datetime.now().isoformat(timespec="seconds"),)
+        )
+    return True
@@ -0,0 +1,154 @@
+from bisect import bisect_right
+from datetime import date, timedelta
+
+import numpy as np
+
+# Incremental streak tracking for habit_tracker.py
+#
+# Each habit's completed days are kept as day ordinals grouped into runs of
+# consecutive days (parallel sorted `starts`/`ends` lists). Marking or
+# unmarking a day only touches the run(s) next to it, found by bisection, so
+# the current streak is always the length of the last run and never needs a
+# re-sort of the completion history.
+
+def day_ordinal(day):
+    """Convert a 'YYYY-MM-DD' string or date to a day ordinal."""
+    if isinstance(day, str):
+        return date.fromisoformat(day).toordinal()
+    return day.toordinal()
+
+# Day ordinal of 1970-01-01, to convert numpy datetime64[D] values to ordinals
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# How often a habit is due: `target` completions per day, week (from Monday) or
+# calendar month. Daily habits keep their streaks in this module's StreakIndex;
+# weekly and monthly ones count consecutive periods that met their target (see
+# CompletionMatrix.schedule_streaks)
+PERIODS = ("day", "week", "month")
+MAX_TARGET = {"day": 1, "week": 7, "month": 28}
+PERIOD_NAMES = {"day": "daily", "week": "weekly", "month": "monthly"}
+
+def schedule(habit):
+    """A habit's (target, period); habits saved before targets existed are daily."""
+    return int(habit.get("target", 1)), habit.get("period", "day")
+
+def describe_schedule(target, period):
+    """'Daily', '3× per week', 'Once a month' and so on."""
+    if period == "day":
+        return "Daily"
+    return f"Once a {period}" if target == 1 else f"{target}× per {period}"
+
+def period_start(day, period):
+    """First day of the day, week (Monday) or calendar month containing `day` (a date)."""
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+def check_schedule(target, period):
+    """Raise ValueError unless `target` completions per `period` is a schedule a habit can have."""
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period {period!r}; choose from {', '.join(PERIODS)}")
+    if not 1 <= target <= MAX_TARGET[period]:
+        raise ValueError(f"A {PERIOD_NAMES[period]} target must be between 1 and {MAX_TARGET[period]}")
+
+def completed_ordinals(completions):
+    """Sorted day ordinals of the completed days in a {'YYYY-MM-DD': bool} dict
+    (dates are parsed by numpy in one call rather than one at a time)."""
+    if not completions:
+        return np.zeros(0, dtype=np.int64)
+    days = np.array(list(completions), dtype="datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+    done = np.fromiter(completions.values(), dtype=bool, count=len(completions))
+    return np.sort(days[done])
+
+class StreakIndex:
+    def __init__(self):
+        self._runs = {}
+
+    @classmethod
+    def from_habits(cls, habits):
+        """Build an index for a {habit_id: habit} dict (one sort per habit)."""
+        index = cls()
+        for habit_id, habit in habits.items():
+            index.load(habit_id, habit["completions"])
+        return index
+
+    def load(self, habit_id, completions):
+        """(Re)build one habit's runs from a {date: bool} completions dict."""
+        self.load_days(habit_id, completed_ordinals(completions))
+
+    def load_days(self, habit_id, days):
+        """(Re)build one habit's runs from an array of completed day ordinals."""
+        days = np.unique(days)
+        breaks = np.flatnonzero(np.diff(days) > 1)
+        starts = np.r_[days[:1], days[breaks + 1]]
+        ends = np.r_[days[breaks], days[-1:]]
+        self._runs[habit_id] = (starts.tolist(), ends.tolist())
+
+    def drop(self, habit_id):
+        self._runs.pop(habit_id, None)
+
+    def mark(self, habit_id, day):
+        """Record a completion; returns the length of the run containing `day`."""
+        starts, ends = self._runs.setdefault(habit_id, ([], []))
+        day = day_ordinal(day)
+        i = bisect_right(starts, day) - 1
+
+        # Already inside a run
+        if i >= 0 and ends[i] >= day:
+            return ends[i] - starts[i] + 1
+
+        joins_left = i >= 0 and ends[i] == day - 1
+        joins_right = i + 1 < len(starts) and starts[i + 1] == day + 1
+        if joins_left and joins_right:
+            ends[i] = ends[i + 1]
+            del starts[i + 1], ends[i + 1]
+        elif joins_left:
+            ends[i] = day
+        elif joins_right:
+            i += 1
+            starts[i] = day
+        else:
+            i += 1
+            starts.insert(i, day)
+            ends.insert(i, day)
+        return ends[i] - starts[i] + 1
+
+    def unmark(self, habit_id, day):
+        """Remove a completion, splitting its run if needed."""
+        runs = self._runs.get(habit_id)
+        if not runs:
+            return
+        starts, ends = runs
+        day = day_ordinal(day)
+        i = bisect_right(starts, day) - 1
+        if i < 0 or ends[i] < day:
+            return
+
+        if starts[i] == ends[i]:
+            del starts[i], ends[i]
+        elif day == starts[i]:
+            starts[i] = day + 1
+        elif day == ends[i]:
+            ends[i] = day - 1
+        else:
+            starts.insert(i + 1, day + 1)
+            ends.insert(i + 1, ends[i])
+            ends[i] = day - 1
+
+    def current_streak(self, habit_id, today=None):
+        """Length of the latest run, or 0 if it ended before yesterday."""
+        runs = self._runs.get(habit_id)
+        if not runs or not runs[0]:
+            return 0
+        starts, ends = runs
+        today = day_ordinal(today or date.today())
+        if today - ends[-1] > 1:
+            return 0
+        return ends[-1] - starts[-1] + 1
+
+    def longest_streak(self, habit_id):
+        """Length of the longest run (scans the runs; used when rebuilding)."""
+        starts, ends = self._runs.get(habit_id, ([], []))
+        return max((end - start + 1 for start, end in zip(starts, ends)), default=0)
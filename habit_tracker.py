@@ -1,15 +1,20 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
+import copy
 import datetime
-import json
-import matplotlib.pyplot as plt
-import os
-from matplotlib.colors import LinearSegmentedColormap
 import random
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
+import tempfile
+from datetime import datetime
+import app_startup
+import habit_archive
+import habit_store
+import habit_streaks
+import habit_profiles
+import habit_service
+import habit_pack
+
+# Charting (and the pandas it needs) loads when first used
+px = app_startup.lazy_import("plotly.express")
+go = app_startup.lazy_import("plotly.graph_objects")
 
 # Set page configuration
 st.set_page_config(
@@ -64,55 +69,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state variables if they don't exist
-if 'habits' not in st.session_state:
-    # Default habit categories and examples
-    default_categories = {
-        "Exercise": ["Walking Pad", "Gym/Training", "Pilates/Yoga"],
-        "Reading": ["Fantasy", "Textbooks", "DK Books"],
-        "Entertainment": ["Gaming", "Movies/TV", "Sport"],
-        "Self Improvement": ["YouTube Learning", "Coding Projects", "Piano"]
-    }
-    
-    st.session_state.habits = {}
-    
-    # Create default habits with empty completion data
-    for category, habits in default_categories.items():
-        for habit in habits:
-            habit_id = f"{category}_{habit}".replace(" ", "_").lower()
-            st.session_state.habits[habit_id] = {
-                "name": habit,
-                "category": category,
-                "streak": 0,
-                "longest_streak": 0,
-                "completions": {},
-                "xp": 0,
-                "level": 1,
-                "created_date": datetime.now().strftime("%Y-%m-%d")
-            }
-
-if 'achievements' not in st.session_state:
-    st.session_state.achievements = {
-        "streaks": {
-            "3_day_streak": {"name": "3-Day Warrior", "description": "Complete a habit for 3 days in a row", "xp": 30, "earned": {}},
-            "7_day_streak": {"name": "Week Champion", "description": "Complete a habit for 7 days in a row", "xp": 70, "earned": {}},
-            "30_day_streak": {"name": "Monthly Master", "description": "Complete a habit for 30 days in a row", "xp": 300, "earned": {}},
-            "100_day_streak": {"name": "Centurion", "description": "Complete a habit for 100 days in a row", "xp": 1000, "earned": {}}
-        },
-        "milestones": {
-            "first_habit": {"name": "First Steps", "description": "Complete any habit for the first time", "xp": 10, "earned": False},
-            "five_habits": {"name": "Variety Pack", "description": "Complete 5 different habits", "xp": 50, "earned": False},
-            "all_categories": {"name": "Well-Rounded", "description": "Complete at least one habit from each category", "xp": 100, "earned": False}
-        }
-    }
-
-if 'user' not in st.session_state:
-    st.session_state.user = {
-        "total_xp": 0,
-        "level": 1,
-        "next_level_xp": 100
-    }
-
 if 'daily_theme' not in st.session_state:
     # Different motivational themes for each day
     themes = [
@@ -126,169 +82,105 @@ if 'daily_theme' not in st.session_state:
     ]
     st.session_state.daily_theme = random.choice(themes)
 
-# Functions for saving and loading data
-def save_data():
-    data = {
-        "habits": st.session_state.habits,
-        "achievements": st.session_state.achievements,
-        "user": st.session_state.user
-    }
-    
-    with open('habit_data.json', 'w') as f:
-        # Convert datetime objects to strings before saving
-        json.dump(data, f, default=str)
+# Profile: from the ?profile= link if given, otherwise chosen in the sidebar
+if 'profile_name' not in st.session_state:
+    st.session_state.profile_name = st.query_params.get("profile", habit_profiles.DEFAULT_PROFILE)
 
-def load_data():
-    if os.path.exists('habit_data.json'):
-        with open('habit_data.json', 'r') as f:
-            data = json.load(f)
-            
-            # Update session state
-            st.session_state.habits = data.get("habits", st.session_state.habits)
-            st.session_state.achievements = data.get("achievements", st.session_state.achievements)
-            st.session_state.user = data.get("user", st.session_state.user)
+with st.sidebar:
+    st.markdown("### 👤 Profile")
+    profile_name = st.text_input("Profile name", key="profile_name", help="Each profile keeps its own habits and progress.")
+    profile_name = habit_profiles.profile_slug(profile_name) or habit_profiles.DEFAULT_PROFILE
+    st.query_params["profile"] = profile_name
 
-# Try to load saved data
+# Load the profile once per process; every session of the same profile shares it
 try:
-    load_data()
+    profile = habit_service.open_profile(profile_name)
 except Exception as e:
     st.error(f"Error loading saved data: {e}")
+    st.stop()
 
-# Function to calculate streak for a habit
-def calculate_streak(completions):
-    if not completions:
-        return 0
-        
-    dates = sorted([datetime.strptime(date, "%Y-%m-%d") for date in completions.keys() 
-                   if completions[date]])
-    
-    if not dates:
-        return 0
-    
-    # Check if completed today
-    today = datetime.now().date()
-    latest_date = dates[-1].date()
-    
-    # If the latest completion is not today or yesterday, streak is broken
-    if (today - latest_date).days > 1:
-        return 0
-    
-    # Calculate continuous streak
-    streak = 1
-    for i in range(len(dates) - 1, 0, -1):
-        if (dates[i].date() - dates[i-1].date()).days == 1:
-            streak += 1
-        else:
-            break
-            
-    return streak
+# Analytics time windows (days, None for all history) and aggregation levels
+ANALYTICS_WINDOWS = {"Last 30 days": 30, "Last 90 days": 90, "Last 365 days": 365, "All time": None}
+HEATMAP_LEVELS = {"Day": "D", "Week": "W", "Month": "M"}
+TREND_LEVELS = {"Week": "W", "Month": "M"}
+ROLLING_WINDOWS = {"7 days": 7, "30 days": 30, "90 days": 90}
+XP_LEVELS = {"Day": "day", "Week": "week", "Month": "month"}
+PAIR_MEASURES = {"Same day": "correlation", "Next day": "next_day", "Co-occurrence": "co_occurrence"}
+PAIR_CAPTIONS = {
+    "correlation": "Correlation runs from -1 (never done on the same day) through 0 (unrelated) to 1 (always done together).",
+    "next_day": "How a habit on the row goes with the habit in the column the next day, from -1 through 0 (unrelated) to 1.",
+    "co_occurrence": "Share of the days the habit on the row was done that the habit in the column was done too."
+}
 
-# Function to update streaks for all habits
-def update_streaks():
-    for habit_id, habit in st.session_state.habits.items():
-        current_streak = calculate_streak(habit["completions"])
-        
-        # Update streak and longest streak
-        st.session_state.habits[habit_id]["streak"] = current_streak
-        if current_streak > habit["longest_streak"]:
-            st.session_state.habits[habit_id]["longest_streak"] = current_streak
-        
-        # Check for streak achievements
-        check_streak_achievements(habit_id, current_streak)
-
-# Function to check and award streak achievements
-def check_streak_achievements(habit_id, streak):
-    streak_milestones = [3, 7, 30, 100]
-    for milestone in streak_milestones:
-        achievement_id = f"{milestone}_day_streak"
-        if streak >= milestone and habit_id not in st.session_state.achievements["streaks"][achievement_id]["earned"]:
-            # Award the achievement and XP
-            st.session_state.achievements["streaks"][achievement_id]["earned"][habit_id] = datetime.now().strftime("%Y-%m-%d")
-            xp_reward = st.session_state.achievements["streaks"][achievement_id]["xp"]
-            award_xp(habit_id, xp_reward)
-            
-            # Show achievement notification
-            achievement_name = st.session_state.achievements["streaks"][achievement_id]["name"]
-            habit_name = st.session_state.habits[habit_id]["name"]
-            st.success(f"🏆 Achievement Unlocked: {achievement_name} for {habit_name}! +{xp_reward} XP")
-
-# Function to check milestone achievements
-def check_milestone_achievements():
-    # Check for first habit completion
-    completed_habits = []
-    completed_categories = set()
-    
-    for habit_id, habit in st.session_state.habits.items():
-        if habit["completions"] and any(habit["completions"].values()):
-            completed_habits.append(habit_id)
-            completed_categories.add(habit["category"])
-    
-    # First habit achievement
-    if completed_habits and not st.session_state.achievements["milestones"]["first_habit"]["earned"]:
-        st.session_state.achievements["milestones"]["first_habit"]["earned"] = True
-        xp_reward = st.session_state.achievements["milestones"]["first_habit"]["xp"]
-        st.session_state.user["total_xp"] += xp_reward
-        st.success(f"🏆 Achievement Unlocked: First Steps! +{xp_reward} XP")
-    
-    # Five habits achievement
-    if len(completed_habits) >= 5 and not st.session_state.achievements["milestones"]["five_habits"]["earned"]:
-        st.session_state.achievements["milestones"]["five_habits"]["earned"] = True
-        xp_reward = st.session_state.achievements["milestones"]["five_habits"]["xp"]
-        st.session_state.user["total_xp"] += xp_reward
-        st.success(f"🏆 Achievement Unlocked: Variety Pack! +{xp_reward} XP")
-    
-    # All categories achievement
-    categories = set(habit["category"] for habit in st.session_state.habits.values())
-    if completed_categories == categories and not st.session_state.achievements["milestones"]["all_categories"]["earned"]:
-        st.session_state.achievements["milestones"]["all_categories"]["earned"] = True
-        xp_reward = st.session_state.achievements["milestones"]["all_categories"]["xp"]
-        st.session_state.user["total_xp"] += xp_reward
-        st.success(f"🏆 Achievement Unlocked: Well-Rounded! +{xp_reward} XP")
+# Function to build a download on click: the profile is copied under its lock,
+# then `write(file, habits, achievements, user)` streams the copy to a temp file
+# so checkbox clicks aren't held up while it encodes
+def export_download(write):
+    def build():
+        with profile.lock:
+            habits = {
+                habit_id: {**habit, "completions": dict(habit["completions"])}
+                for habit_id, habit in habit_archive.export_habits(profile).items()
+            }
+            achievements = copy.deepcopy(profile.achievements)
+            user = dict(profile.user)
+        with tempfile.TemporaryFile() as file:
+            write(file, habits, achievements, user)
+            file.seek(0)
+            return file.read()
+    return build
 
-# Function to award XP for a habit and update level
-def award_xp(habit_id, xp_amount):
-    # Award XP to the specific habit
-    st.session_state.habits[habit_id]["xp"] += xp_amount
-    
-    # Calculate level for the habit
-    habit_xp = st.session_state.habits[habit_id]["xp"]
-    st.session_state.habits[habit_id]["level"] = max(1, int(1 + (habit_xp / 100) ** 0.5))
-    
-    # Award XP to the user
-    st.session_state.user["total_xp"] += xp_amount
-    
-    # Update user level
-    total_xp = st.session_state.user["total_xp"]
-    new_level = max(1, int(1 + (total_xp / 100) ** 0.5))
+# Function to show what a habit change unlocked: achievements and a level-up
+def announce(unlocked, level_up=None):
+    for kind, achievement_id, habit_id in unlocked:
+        achievement = profile.achievements[kind][achievement_id]
+        if habit_id is None:
+            st.success(f"🏆 Achievement Unlocked: {achievement['name']}! +{achievement['xp']} XP")
+        else:
+            habit_name = profile.habits[habit_id]["name"]
+            st.success(f"🏆 Achievement Unlocked: {achievement['name']} for {habit_name}! +{achievement['xp']} XP")
     
     # Level up notification
-    if new_level > st.session_state.user["level"]:
+    if level_up:
         st.balloons()
-        st.success(f"🎉 Level Up! You've reached level {new_level}!")
-    
-    st.session_state.user["level"] = new_level
-    st.session_state.user["next_level_xp"] = 100 * (new_level + 1) ** 2
+        st.success(f"🎉 Level Up! You've reached level {level_up}!")
 
-# App Header
-st.title("🏆 My Habit Quest: Track & Level Up")
-st.markdown(f"### *{st.session_state.daily_theme}*")
+# Function to choose how often a habit is due; returns (target, period)
+def schedule_inputs(key):
+    col1, col2 = st.columns(2)
+    with col1:
+        period = st.selectbox(
+            "How often",
+            habit_streaks.PERIODS,
+            format_func=lambda period: habit_streaks.PERIOD_NAMES[period].capitalize(),
+            key=f"{key}_period"
+        )
+    target = 1
+    with col2:
+        if period != "day":
+            target = st.number_input(f"Times per {period}", min_value=1, max_value=habit_streaks.MAX_TARGET[period], value=1, key=f"{key}_target")
+    return int(target), period
 
-# Create tabs for different sections of the app
-tabs = st.tabs(["📋 Track Habits", "📊 Analytics", "🏆 Achievements", "⚙️ Settings"])
+# Habit grid layout: cards per row, and cards per page within a category
+GRID_COLUMNS = 3
+HABITS_PER_PAGE = 12
 
-# Tab 1: Track Habits
-with tabs[0]:
-    # User profile card
+# Header with the user's level and today's progress, in its own fragment; a
+# habit card's toggle reruns it together with that card (see toggle_habit)
+HEADER_FRAGMENT = "progress_header"
+
+@st.fragment(key=HEADER_FRAGMENT)
+def progress_header():
     user_col1, user_col2 = st.columns([1, 2])
     
     with user_col1:
         st.markdown("### Your Quest Progress")
-        st.markdown(f"**Level {st.session_state.user['level']}**")
+        st.markdown(f"**Level {profile.user['level']}**")
         
         # Calculate XP progress to next level
-        current_xp = st.session_state.user["total_xp"]
-        next_level_xp = st.session_state.user["next_level_xp"]
-        previous_level_xp = 100 * (st.session_state.user["level"]) ** 2
+        current_xp = profile.user["total_xp"]
+        next_level_xp = profile.user["next_level_xp"]
+        previous_level_xp = 100 * (profile.user["level"]) ** 2
         level_progress = 0 if next_level_xp == previous_level_xp else (current_xp - previous_level_xp) / (next_level_xp - previous_level_xp) * 100
         
         st.markdown(f"XP: {current_xp} / {next_level_xp}")
@@ -310,8 +202,8 @@ with tabs[0]:
         today = datetime.now().strftime("%Y-%m-%d")
         
         # Calculate completion rate for today
-        total_habits = len(st.session_state.habits)
-        completed_today = sum(1 for habit in st.session_state.habits.values() 
+        total_habits = len(profile.habits)
+        completed_today = sum(1 for habit in profile.habits.values() 
                              if today in habit["completions"] and habit["completions"][today])
         
         if total_habits > 0:
@@ -322,484 +214,645 @@ with tabs[0]:
         st.markdown("### Today's Progress")
         st.progress(completion_rate / 100)
         st.markdown(f"{completed_today} out of {total_habits} habits completed ({int(completion_rate)}%)")
-    
-    st.markdown("---")
-    
-    # Group habits by category
-    habits_by_category = {}
-    for habit_id, habit in st.session_state.habits.items():
-        category = habit["category"]
-        if category not in habits_by_category:
-            habits_by_category[category] = []
-        habits_by_category[category].append((habit_id, habit))
-    
-    # Current date for tracking
-    today = datetime.now().strftime("%Y-%m-%d")
-    
-    # Display habits by category with completion checkboxes
-    for category, habits in habits_by_category.items():
-        st.markdown(f"### {category}")
+
+# One category of the habit grid, collapsible and paginated; a collapsed
+# category renders no cards, and paging or collapsing reruns only this section
+@st.fragment
+def category_section(category, habit_ids):
+    section = st.expander(f"{category} ({len(habit_ids)})", expanded=True, key=f"expand_{profile.name}_{category}", on_change="rerun")
+    with section:
+        if not section.open:
+            return
+        
+        # Page selector, only when the category has more habits than fit on a page
+        pages = -(-len(habit_ids) // HABITS_PER_PAGE)
+        page = 1
+        if pages > 1:
+            page = st.selectbox(
+                "Page",
+                range(1, pages + 1),
+                format_func=lambda number: f"Page {number} of {pages}",
+                key=f"page_{profile.name}_{category}",
+                label_visibility="collapsed"
+            )
         
         # Use columns to display habits in a grid
-        cols = st.columns(3)
+        cols = st.columns(GRID_COLUMNS)
+        for i, habit_id in enumerate(habit_ids[(page - 1) * HABITS_PER_PAGE:page * HABITS_PER_PAGE]):
+            with cols[i % GRID_COLUMNS]:
+                st.fragment(habit_card, key=card_fragment(habit_id))(habit_id)
+
+# Fragment key of a habit's card; each card is its own keyed fragment, so a
+# toggle can rerun exactly that card and the header
+def card_fragment(habit_id):
+    return f"card_{profile.name}_{habit_id}"
+
+# Checkbox callback: record the change, keep its outcome for the card to show,
+# and rerun only that card and the header instead of the whole app
+def toggle_habit(habit_id, check_key):
+    done = st.session_state[check_key]
+    # Another tab may have just made the same change, then nothing happens
+    st.session_state[f"outcome_{check_key}"] = habit_service.set_completion(profile, habit_id, done)
+    st.rerun([card_fragment(habit_id), HEADER_FRAGMENT])
+
+# One habit card, rendered as its own fragment by category_section
+def habit_card(habit_id):
+    habit = profile.habits.get(habit_id)
+    if habit is None:
+        # Deleted in another tab since the grid was drawn
+        return
+    
+    # Check if habit has been completed today
+    today = datetime.now().strftime("%Y-%m-%d")
+    completed_today = today in habit["completions"] and habit["completions"][today]
+    
+    # Create a container for each habit
+    with st.container():
+        st.markdown(f"""
+        <div class="streak-card">
+            <div class="category-header">{habit["name"]}</div>
+        """, unsafe_allow_html=True)
+        
+        # Display streak and level information, streaks counted in the habit's own periods
+        target, period = habit_streaks.schedule(habit)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown(f"**Current streak:** {habit['streak']} {period}s")
+            st.markdown(f"**Longest streak:** {habit['longest_streak']} {period}s")
         
-        for i, (habit_id, habit) in enumerate(habits):
-            with cols[i % 3]:
-                # Check if habit has been completed today
-                completed_today = today in habit["completions"] and habit["completions"][today]
-                
-                # Create a container for each habit
-                with st.container():
-                    st.markdown(f"""
-                    <div class="streak-card">
-                        <div class="category-header">{habit["name"]}</div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Display streak and level information
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.markdown(f"**Current streak:** {habit['streak']} days")
-                        st.markdown(f"**Longest streak:** {habit['longest_streak']} days")
-                    
-                    with col2:
-                        st.markdown(f"**Level:** {habit['level']}")
-                        st.markdown(f"**XP:** {habit['xp']}")
-                    
-                    # Checkbox for completing the habit today
-                    if st.checkbox("Complete for today", value=completed_today, key=f"check_{habit_id}"):
-                        if not completed_today:
-                            # Mark habit as completed for today
-                            if habit["completions"].get(today, False) != True:
-                                st.session_state.habits[habit_id]["completions"][today] = True
-                                
-                                # Award XP based on streak
-                                streak_xp = min(20, 5 + (habit["streak"] * 2))
-                                award_xp(habit_id, streak_xp)
-                                
-                                # Show notification
-                                st.success(f"🎯 {habit['name']} completed for today! +{streak_xp} XP")
-                                
-                                # Update streaks
-                                update_streaks()
-                                
-                                # Check for achievements
-                                check_milestone_achievements()
-                    else:
-                        if completed_today:
-                            # Unmark habit as completed
-                            st.session_state.habits[habit_id]["completions"][today] = False
-                            update_streaks()  # Recalculate streaks
-                    
-                    st.markdown("</div>", unsafe_allow_html=True)
-    
-    # Button to save progress
-    if st.button("💾 Save Progress"):
-        save_data()
-        st.success("Progress saved successfully!")
+        with col2:
+            st.markdown(f"**Level:** {habit['level']}")
+            st.markdown(f"**XP:** {habit['xp']}")
+        
+        # Checkbox for completing the habit today, resynced if another tab of this
+        # profile changed it since this session last rendered it, or if its state
+        # was dropped while the card was on another page or collapsed
+        check_key = f"check_{profile.name}_{habit_id}"
+        if check_key not in st.session_state or st.session_state.get(f"seen_{check_key}") != completed_today:
+            st.session_state[check_key] = completed_today
+        done = st.checkbox("Complete for today", key=check_key, on_change=toggle_habit, args=(habit_id, check_key))
+        outcome = st.session_state.pop(f"outcome_{check_key}", None)
+        if outcome is not None:
+            if outcome["changed"] and done:
+                st.success(f"🎯 {habit['name']} completed for today! +{outcome['xp']} XP")
+            elif outcome["xp"]:
+                st.info(f"↩️ {habit['name']} unchecked. {outcome['xp']} XP")
+            announce(outcome["unlocked"], outcome["level_up"])
+        st.session_state[f"seen_{check_key}"] = habit["completions"].get(today, False)
+        
+        # Progress towards a weekly or monthly target
+        if period != "day":
+            done_this_period, target = habit_service.period_progress(profile, habit_id)
+            st.caption(f"{habit_streaks.describe_schedule(target, period)}: {done_this_period}/{target} this {period}")
+        
+        st.markdown("</div>", unsafe_allow_html=True)
+
+# App Header
+st.title("🏆 My Habit Quest: Track & Level Up")
+st.markdown(f"### *{st.session_state.daily_theme}*")
+
+# Create tabs for different sections of the app; only the open tab's content runs
+tabs = st.tabs(["📋 Track Habits", "📊 Analytics", "🏆 Achievements", "⚙️ Settings"], key="main_tab", on_change="rerun")
+
+# Tab 1: Track Habits
+with tabs[0]:
+    if tabs[0].open:
+        # User profile card and today's progress
+        progress_header()
+        
+        st.markdown("---")
+        
+        # Group habits by category
+        habits_by_category = {}
+        for habit_id, habit in profile.habits.items():
+            category = habit["category"]
+            if category not in habits_by_category:
+                habits_by_category[category] = []
+            habits_by_category[category].append(habit_id)
+        
+        # Display habits by category with completion checkboxes
+        for category, habit_ids in habits_by_category.items():
+            category_section(category, habit_ids)
+        
+        # Changes are saved in the background; the button writes them out immediately
+        if st.button("💾 Save Progress"):
+            habit_service.flush(profile)
+            st.success("Progress saved successfully!")
 
 # Tab 2: Analytics
 with tabs[1]:
-    st.markdown("## Habit Analytics")
-    
-    # Sidebar for selecting analytics options
-    analytics_type = st.selectbox(
-        "Choose Analytics View:",
-        ["Habit Heatmap", "Streak Progress", "Category Performance", "Habit Completion Rates"]
-    )
-    
-    if analytics_type == "Habit Heatmap":
-        st.markdown("### Habit Completion Heatmap")
-        st.markdown("This heatmap shows your habit completion patterns over time.")
-        
-        # Get all unique dates from all habits
-        all_dates = set()
-        for habit in st.session_state.habits.values():
-            all_dates.update(habit["completions"].keys())
+    if tabs[1].open:
+        st.markdown("## Habit Analytics")
         
-        # Sort dates
-        date_list = sorted(list(all_dates))
+        # Sidebar for selecting analytics options
+        analytics_type = st.selectbox(
+            "Choose Analytics View:",
+            ["Habit Heatmap", "Streak Progress", "Consistency Trend", "Category Performance", "Habit Completion Rates", "Habit Pairs", "XP Earned"]
+        )
         
-        # If there's no data yet, show a message
-        if not date_list:
-            st.info("Complete some habits to see your heatmap!")
-        else:
-            # Create a dataframe for the heatmap
-            habits_list = list(st.session_state.habits.keys())
-            habit_names = [st.session_state.habits[h]["name"] for h in habits_list]
+        if analytics_type == "Habit Heatmap":
+            st.markdown("### Habit Completion Heatmap")
+            st.markdown("This heatmap shows your habit completion patterns over time.")
             
-            # Create empty dataframe
-            heatmap_data = []
+            # Time window and aggregation level
+            col1, col2 = st.columns(2)
+            with col1:
+                heatmap_window = st.selectbox("Time window", list(ANALYTICS_WINDOWS), index=1, key="heatmap_window")
+            with col2:
+                heatmap_level = st.radio("Show by", list(HEATMAP_LEVELS), horizontal=True, key="heatmap_level")
             
-            for date in date_list:
-                row = {'Date': date}
-                for habit_id in habits_list:
-                    habit_name = st.session_state.habits[habit_id]["name"]
-                    completed = st.session_state.habits[habit_id]["completions"].get(date, False)
-                    row[habit_name] = 1 if completed else 0
-                heatmap_data.append(row)
+            fig = habit_service.analytics(profile, "heatmap", ANALYTICS_WINDOWS[heatmap_window], HEATMAP_LEVELS[heatmap_level])
             
-            heatmap_df = pd.DataFrame(heatmap_data)
+            # If there's no data in the window yet, show a message
+            if fig is None:
+                st.info("Complete some habits to see your heatmap!")
+            else:
+                st.plotly_chart(fig, width="stretch")
+        
+        elif analytics_type == "Streak Progress":
+            st.markdown("### Streak Progress")
+            st.markdown("Track how your habit streaks have grown over time.")
             
-            # Set Date as index
-            heatmap_df.set_index('Date', inplace=True)
+            # Current and longest streaks, sorted by longest streak
+            streak_df = habit_service.analytics(profile, "streaks")
+            habit_names = list(streak_df['Habit'])
             
-            # Plot the heatmap
-            fig, ax = plt.subplots(figsize=(12, len(habit_names) * 0.4 + 2))
+            # Plot with Plotly for interactivity
+            fig = go.Figure()
             
-            # Custom colormap (white to blue)
-            cmap = LinearSegmentedColormap.from_list('custom_cmap', ['#f5f5f5', '#1E88E5'])
+            fig.add_trace(go.Bar(
+                y=streak_df['Habit'],
+                x=streak_df['Current Streak'],
+                name='Current Streak',
+                orientation='h',
+                customdata=streak_df['Unit'],
+                hovertemplate='%{y}: %{x} %{customdata}<extra>Current Streak</extra>',
+                marker=dict(color='rgba(30, 136, 229, 0.8)')
+            ))
             
-            ax = plt.pcolormesh(heatmap_df.T, cmap=cmap, edgecolors='w', linewidth=0.5)
-            plt.yticks(np.arange(0.5, len(habit_names)), habit_names)
-            plt.xticks(np.arange(0.5, len(date_list)), date_list, rotation=90)
+            fig.add_trace(go.Bar(
+                y=streak_df['Habit'],
+                x=streak_df['Longest Streak'],
+                name='Longest Streak',
+                orientation='h',
+                customdata=streak_df['Unit'],
+                hovertemplate='%{y}: %{x} %{customdata}<extra>Longest Streak</extra>',
+                marker=dict(color='rgba(255, 193, 7, 0.8)')
+            ))
             
-            plt.colorbar(ax, label='Completed')
-            plt.tight_layout()
+            fig.update_layout(
+                title='Current vs. Longest Streaks',
+                barmode='group',
+                height=max(400, len(habit_names) * 40),
+                margin=dict(l=20, r=20, t=40, b=20),
+                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                xaxis_title='Days, or weeks/months for weekly and monthly targets',
+                hovermode='closest'
+            )
             
-            st.pyplot(fig)
-    
-    elif analytics_type == "Streak Progress":
-        st.markdown("### Streak Progress")
-        st.markdown("Track how your habit streaks have grown over time.")
-        
-        # Create a bar chart of current streaks
-        habit_names = [habit["name"] for habit in st.session_state.habits.values()]
-        current_streaks = [habit["streak"] for habit in st.session_state.habits.values()]
-        longest_streaks = [habit["longest_streak"] for habit in st.session_state.habits.values()]
-        
-        # Create a DataFrame for the chart
-        streak_df = pd.DataFrame({
-            'Habit': habit_names,
-            'Current Streak': current_streaks,
-            'Longest Streak': longest_streaks
-        })
-        
-        # Sort by longest streak
-        streak_df = streak_df.sort_values('Longest Streak', ascending=False)
-        
-        # Plot with Plotly for interactivity
-        fig = go.Figure()
-        
-        fig.add_trace(go.Bar(
-            y=streak_df['Habit'],
-            x=streak_df['Current Streak'],
-            name='Current Streak',
-            orientation='h',
-            marker=dict(color='rgba(30, 136, 229, 0.8)')
-        ))
-        
-        fig.add_trace(go.Bar(
-            y=streak_df['Habit'],
-            x=streak_df['Longest Streak'],
-            name='Longest Streak',
-            orientation='h',
-            marker=dict(color='rgba(255, 193, 7, 0.8)')
-        ))
-        
-        fig.update_layout(
-            title='Current vs. Longest Streaks',
-            barmode='group',
-            height=max(400, len(habit_names) * 40),
-            margin=dict(l=20, r=20, t=40, b=20),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            xaxis_title='Days',
-            hovermode='closest'
-        )
+            st.plotly_chart(fig, width="stretch")
         
-        st.plotly_chart(fig, use_container_width=True)
-    
-    elif analytics_type == "Category Performance":
-        st.markdown("### Category Performance")
-        st.markdown("See how you're doing across different habit categories.")
+        elif analytics_type == "Consistency Trend":
+            st.markdown("### Consistency Trend")
+            st.markdown("Your completion rate over a rolling window, day by day.")
+            
+            # Time window, rolling window length and grouping
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                trend_window = st.selectbox("Time window", list(ANALYTICS_WINDOWS), index=2, key="trend_window")
+            with col2:
+                rolling_window = st.radio("Rolling window", list(ROLLING_WINDOWS), index=1, horizontal=True, key="rolling_window")
+            with col3:
+                trend_by = st.radio("Show by", ["Category", "Habit"], horizontal=True, key="trend_by")
+            
+            # Habits to compare, by id so renamed or same-named habits stay distinct
+            habit_ids = ()
+            if trend_by == "Habit":
+                habit_ids = tuple(st.multiselect(
+                    "Habits",
+                    list(profile.habits),
+                    default=list(profile.habits)[:3],
+                    format_func=lambda habit_id: profile.habits[habit_id]["name"],
+                    key="trend_habits"
+                ))
+            
+            rolling_df = habit_service.analytics(
+                profile, "rolling", ANALYTICS_WINDOWS[trend_window], ROLLING_WINDOWS[rolling_window], trend_by.lower(), habit_ids
+            )
+            
+            if rolling_df.notna().any().any():
+                fig = px.line(
+                    rolling_df,
+                    labels={"index": "Date", "value": "Completion Rate (%)", "variable": trend_by},
+                    color_discrete_sequence=px.colors.qualitative.Set3,
+                    # Years of daily points for many lines draw much faster with WebGL
+                    render_mode="webgl" if rolling_df.size > 5000 else "auto"
+                )
+                fig.update_layout(
+                    yaxis_range=[0, 100],
+                    hovermode="x unified",
+                    margin=dict(l=20, r=20, t=20, b=20),
+                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+                )
+                st.plotly_chart(fig, width="stretch")
+            elif trend_by == "Habit" and not habit_ids:
+                st.info("Pick some habits to compare.")
+            else:
+                st.info("Complete some habits to see your consistency trend!")
         
-        # Create a pie chart of completion rates by category
-        categories = {}
-        for habit in st.session_state.habits.values():
-            category = habit["category"]
-            if category not in categories:
-                categories[category] = {"completed": 0, "total": 0}
-            
-            for completed in habit["completions"].values():
-                categories[category]["total"] += 1
-                if completed:
-                    categories[category]["completed"] += 1
-        
-        # Calculate completion percentages
-        category_names = []
-        completion_rates = []
-        
-        for category, data in categories.items():
-            category_names.append(category)
-            if data["total"] > 0:
-                completion_rates.append((data["completed"] / data["total"]) * 100)
+        elif analytics_type == "Category Performance":
+            st.markdown("### Category Performance")
+            st.markdown("See how you're doing across different habit categories.")
+            
+            category_window = st.selectbox("Time window", list(ANALYTICS_WINDOWS), index=3, key="category_window")
+            window_days = ANALYTICS_WINDOWS[category_window]
+            
+            # Completion percentages per category, pooled over its habits' tracked days
+            category_df = habit_service.analytics(profile, "category_rates", window_days)
+            category_names = list(category_df.index)
+            completion_rates = list(category_df["Completion Rate"])
+            
+            # Create the pie chart
+            if completion_rates:
+                fig = px.pie(
+                    names=category_names,
+                    values=completion_rates,
+                    title="Habit Completion Rates by Category",
+                    color_discrete_sequence=px.colors.qualitative.Set3
+                )
+                
+                fig.update_traces(textposition='inside', textinfo='percent+label')
+                fig.update_layout(
+                    uniformtext_minsize=12,
+                    uniformtext_mode='hide',
+                    margin=dict(l=20, r=20, t=40, b=20)
+                )
+                
+                st.plotly_chart(fig, width="stretch")
             else:
-                completion_rates.append(0)
-        
-        # Create the pie chart
-        if completion_rates:
-            fig = px.pie(
-                names=category_names,
-                values=completion_rates,
-                title="Habit Completion Rates by Category",
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
+                st.info("Complete some habits to see category performance!")
             
-            fig.update_traces(textposition='inside', textinfo='percent+label')
-            fig.update_layout(
-                uniformtext_minsize=12,
-                uniformtext_mode='hide',
-                margin=dict(l=20, r=20, t=40, b=20)
-            )
+            # Completion rate over time per category
+            st.markdown("#### Completion Rate Over Time")
+            trend_level = st.radio("Show by", list(TREND_LEVELS), horizontal=True, key="category_trend_level")
+            rate_series = habit_service.analytics(profile, "rate_series", window_days, TREND_LEVELS[trend_level])
             
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("Complete some habits to see category performance!")
-    
-    elif analytics_type == "Habit Completion Rates":
-        st.markdown("### Habit Completion Rates")
-        st.markdown("See your most and least completed habits.")
-        
-        # Calculate completion rates for each habit
-        completion_data = []
-        
-        for habit_id, habit in st.session_state.habits.items():
-            total_days = len(habit["completions"])
-            if total_days > 0:
-                completed_days = sum(1 for completed in habit["completions"].values() if completed)
-                completion_rate = (completed_days / total_days) * 100
+            if rate_series.notna().any().any():
+                fig = px.line(
+                    rate_series,
+                    markers=True,
+                    labels={"index": trend_level, "value": "Completion Rate (%)", "variable": "Category"},
+                    color_discrete_sequence=px.colors.qualitative.Set3
+                )
+                fig.update_layout(
+                    yaxis_range=[0, 100],
+                    margin=dict(l=20, r=20, t=20, b=20),
+                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+                )
+                st.plotly_chart(fig, width="stretch")
+        
+        elif analytics_type == "Habit Completion Rates":
+            st.markdown("### Habit Completion Rates")
+            st.markdown("See your most and least completed habits.")
+            
+            rates_window = st.selectbox("Time window", list(ANALYTICS_WINDOWS), index=3, key="rates_window")
+            
+            # Completion rates for every habit at once, against each habit's target over the days it was tracked
+            completion_df = habit_service.analytics(profile, "rates", ANALYTICS_WINDOWS[rates_window])
+            
+            # Sort by completion rate
+            completion_df = completion_df.sort_values("Completion Rate", ascending=False)
+            
+            # Create the bar chart
+            if not completion_df.empty and completion_df["Total Days"].sum() > 0:
+                fig = px.bar(
+                    completion_df,
+                    x="Habit",
+                    y="Completion Rate",
+                    color="Category",
+                    text="Completion Rate",
+                    hover_data=["Target", "Days Completed", "Total Days"],
+                    title="Habit Completion Rates",
+                    color_discrete_sequence=px.colors.qualitative.Set2
+                )
+                
+                fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+                fig.update_layout(
+                    uniformtext_minsize=8,
+                    uniformtext_mode='hide',
+                    xaxis_tickangle=-45,
+                    yaxis_title="Completion Rate (%)",
+                    margin=dict(l=20, r=20, t=40, b=60)
+                )
+                
+                st.plotly_chart(fig, width="stretch")
             else:
-                completed_days = 0
-                completion_rate = 0
-            
-            completion_data.append({
-                "Habit": habit["name"],
-                "Category": habit["category"],
-                "Completion Rate": completion_rate,
-                "Days Completed": completed_days,
-                "Total Days": total_days
-            })
-        
-        # Convert to DataFrame and sort
-        completion_df = pd.DataFrame(completion_data)
-        completion_df = completion_df.sort_values("Completion Rate", ascending=False)
-        
-        # Create the bar chart
-        if not completion_df.empty and completion_df["Total Days"].sum() > 0:
-            fig = px.bar(
-                completion_df,
-                x="Habit",
-                y="Completion Rate",
-                color="Category",
-                text="Completion Rate",
-                hover_data=["Days Completed", "Total Days"],
-                title="Habit Completion Rates",
-                color_discrete_sequence=px.colors.qualitative.Set2
-            )
+                st.info("Complete some habits to see completion rates!")
+        
+        elif analytics_type == "Habit Pairs":
+            st.markdown("### Habit Pairs")
+            st.markdown("See which habits go together, on the same day or one the day after another.")
             
-            fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-            fig.update_layout(
-                uniformtext_minsize=8,
-                uniformtext_mode='hide',
-                xaxis_tickangle=-45,
-                yaxis_title="Completion Rate (%)",
-                margin=dict(l=20, r=20, t=40, b=60)
-            )
+            # Time window and how to compare habits
+            col1, col2 = st.columns(2)
+            with col1:
+                pairs_window = st.selectbox("Time window", list(ANALYTICS_WINDOWS), index=2, key="pairs_window")
+            with col2:
+                pairs_measure = st.radio("Compare by", list(PAIR_MEASURES), horizontal=True, key="pairs_measure")
+            window_days = ANALYTICS_WINDOWS[pairs_window]
+            measure = PAIR_MEASURES[pairs_measure]
             
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("Complete some habits to see completion rates!")
+            # Every pair at once, ordered so habits done together sit next to each other
+            fig = habit_service.analytics(profile, "correlation", window_days, measure)
+            
+            if fig is None:
+                st.info("Track at least two habits for a couple of weeks to see how they go together!")
+            else:
+                st.plotly_chart(fig, width="stretch")
+                st.caption(PAIR_CAPTIONS[measure])
+                
+                st.markdown("#### Strongest Pairs")
+                st.dataframe(habit_service.analytics(profile, "top_pairs", window_days, measure), hide_index=True, width="stretch")
+        
+        elif analytics_type == "XP Earned":
+            st.markdown("### XP Earned")
+            st.markdown("XP from completions and achievements over time, net of any unchecked completions.")
+            
+            # Time window and period length
+            col1, col2 = st.columns(2)
+            with col1:
+                xp_window = st.selectbox("Time window", list(ANALYTICS_WINDOWS), index=1, key="xp_window")
+            with col2:
+                xp_level = st.radio("Show by", list(XP_LEVELS), horizontal=True, key="xp_level")
+            
+            # Range queries over the XP ledger
+            window_days = ANALYTICS_WINDOWS[xp_window]
+            xp_df = habit_service.analytics(profile, "xp", window_days, XP_LEVELS[xp_level])
+            category_xp_df = habit_service.analytics(profile, "xp", window_days, "category")
+            
+            if not xp_df.empty:
+                st.metric("XP earned in this window", f"{int(xp_df['XP'].sum()):,}")
+                
+                fig = px.bar(
+                    xp_df,
+                    x=xp_level,
+                    y="XP",
+                    title=f"XP per {xp_level.lower()}",
+                    color_discrete_sequence=['#1E88E5']
+                )
+                fig.update_layout(margin=dict(l=20, r=20, t=40, b=20))
+                st.plotly_chart(fig, width="stretch")
+                
+                fig = px.bar(
+                    category_xp_df,
+                    x="Category",
+                    y="XP",
+                    color="Category",
+                    title="XP by category",
+                    color_discrete_sequence=px.colors.qualitative.Set2
+                )
+                fig.update_layout(showlegend=False, margin=dict(l=20, r=20, t=40, b=20))
+                st.plotly_chart(fig, width="stretch")
+            else:
+                st.info("Complete some habits to earn XP!")
 
 # Tab 3: Achievements
 with tabs[2]:
-    st.markdown("## Achievements & Rewards")
-    
-    # Display streak achievements
-    st.markdown("### Streak Achievements")
-    
-    streak_achievements = st.session_state.achievements["streaks"]
-    
-    for achievement_id, achievement in streak_achievements.items():
-        # Check if any habits have earned this achievement
-        earned_habits = achievement["earned"]
+    if tabs[2].open:
+        st.markdown("## Achievements & Rewards")
         
-        col1, col2, col3 = st.columns([1, 3, 1])
+        # Display streak achievements
+        st.markdown("### Streak Achievements")
         
-        with col1:
-            # Show achievement icon (locked or unlocked)
-            if earned_habits:
-                st.markdown("🏆")
-            else:
-                st.markdown("🔒")
+        streak_achievements = profile.achievements["streaks"]
         
-        with col2:
-            # Show achievement details
-            st.markdown(f"**{achievement['name']}**")
-            st.markdown(f"{achievement['description']}")
-            
-            # Show which habits have earned this achievement
-            if earned_habits:
-                habit_names = []
-                for habit_id in earned_habits:
-                    if habit_id in st.session_state.habits:
-                        habit_names.append(st.session_state.habits[habit_id]["name"])
+        for achievement_id, achievement in streak_achievements.items():
+            # Check if any habits have earned this achievement
+            earned_habits = achievement["earned"]
+            
+            col1, col2, col3 = st.columns([1, 3, 1])
+            
+            with col1:
+                # Show achievement icon (locked or unlocked)
+                if earned_habits:
+                    st.markdown("🏆")
+                else:
+                    st.markdown("🔒")
+            
+            with col2:
+                # Show achievement details
+                st.markdown(f"**{achievement['name']}**")
+                st.markdown(f"{achievement['description']}")
                 
-                if habit_names:
-                    st.markdown(f"*Earned for:* {', '.join(habit_names)}")
+                # Show which habits have earned this achievement
+                if earned_habits:
+                    habit_names = []
+                    for habit_id in earned_habits:
+                        if habit_id in profile.habits:
+                            habit_names.append(profile.habits[habit_id]["name"])
+                    
+                    if habit_names:
+                        st.markdown(f"*Earned for:* {', '.join(habit_names)}")
+            
+            with col3:
+                # Show XP reward
+                st.markdown(f"+{achievement['xp']} XP")
         
-        with col3:
-            # Show XP reward
-            st.markdown(f"+{achievement['xp']} XP")
-    
-    # Display milestone achievements
-    st.markdown("### Milestone Achievements")
-    
-    milestone_achievements = st.session_state.achievements["milestones"]
-    
-    for achievement_id, achievement in milestone_achievements.items():
-        col1, col2, col3 = st.columns([1, 3, 1])
+        # Display milestone achievements
+        st.markdown("### Milestone Achievements")
         
-        with col1:
-            # Show achievement icon (locked or unlocked)
-            if achievement["earned"]:
-                st.markdown("🏆")
-            else:
-                st.markdown("🔒")
+        milestone_achievements = profile.achievements["milestones"]
         
-        with col2:
-            # Show achievement details
-            st.markdown(f"**{achievement['name']}**")
-            st.markdown(f"{achievement['description']}")
-        
-        with col3:
-            # Show XP reward
-            st.markdown(f"+{achievement['xp']} XP")
+        for achievement_id, achievement in milestone_achievements.items():
+            col1, col2, col3 = st.columns([1, 3, 1])
+            
+            with col1:
+                # Show achievement icon (locked or unlocked)
+                if achievement["earned"]:
+                    st.markdown("🏆")
+                else:
+                    st.markdown("🔒")
+            
+            with col2:
+                # Show achievement details
+                st.markdown(f"**{achievement['name']}**")
+                st.markdown(f"{achievement['description']}")
+            
+            with col3:
+                # Show XP reward
+                st.markdown(f"+{achievement['xp']} XP")
 
 # Tab 4: Settings
 with tabs[3]:
-    st.markdown("## Settings")
-    
-    # Add new habit
-    st.markdown("### Add New Habit")
-    
-    # Create columns for form layout
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        new_habit_name = st.text_input("Habit Name")
-    
-    with col2:
-        # Get unique categories from existing habits
-        existing_categories = sorted(set(habit["category"] for habit in st.session_state.habits.values()))
+    if tabs[3].open:
+        st.markdown("## Settings")
         
-        # Allow selecting existing category or creating a new one
-        category_option = st.radio("Category", ["Choose Existing", "Create New"])
+        # Add new habit
+        st.markdown("### Add New Habit")
         
-        if category_option == "Choose Existing" and existing_categories:
-            new_habit_category = st.selectbox("Select Category", existing_categories)
-        else:
-            new_habit_category = st.text_input("New Category Name")
-    
-    # Button to add the habit
-    if st.button("Add Habit"):
-        if new_habit_name and new_habit_category:
-            # Create a unique ID for the habit
-            habit_id = f"{new_habit_category}_{new_habit_name}".replace(" ", "_").lower()
-            
-            # Check if habit already exists
-            if habit_id in st.session_state.habits:
-                st.error("This habit already exists!")
+        # Create columns for form layout
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            new_habit_name = st.text_input("Habit Name")
+        
+        with col2:
+            # Get unique categories from existing habits
+            existing_categories = sorted(set(habit["category"] for habit in profile.habits.values()))
+            
+            # Allow selecting existing category or creating a new one
+            category_option = st.radio("Category", ["Choose Existing", "Create New"])
+            
+            if category_option == "Choose Existing" and existing_categories:
+                new_habit_category = st.selectbox("Select Category", existing_categories)
             else:
-                # Add the new habit
-                st.session_state.habits[habit_id] = {
-                    "name": new_habit_name,
-                    "category": new_habit_category,
-                    "streak": 0,
-                    "longest_streak": 0,
-                    "completions": {},
-                    "xp": 0,
-                    "level": 1,
-                    "created_date": datetime.now().strftime("%Y-%m-%d")
-                }
-                
-                st.success(f"Habit '{new_habit_name}' added successfully!")
-                save_data()
+                new_habit_category = st.text_input("New Category Name")
+        
+        # How often the habit is due
+        new_habit_target, new_habit_period = schedule_inputs("new_habit")
+        
+        # Button to add the habit
+        if st.button("Add Habit"):
+            if new_habit_name and new_habit_category:
+                try:
+                    habit_id, unlocked = habit_service.add_habit(profile, new_habit_name, new_habit_category, new_habit_target, new_habit_period)
+                except ValueError:
+                    st.error("This habit already exists!")
+                else:
+                    st.success(f"Habit '{new_habit_name}' added successfully!")
+                    announce(unlocked)
+            else:
+                st.warning("Please enter both a habit name and category.")
+        
+        st.markdown("---")
+        
+        # Change how often an existing habit is due
+        st.markdown("### Change Habit Target")
+        
+        if profile.habits:
+            schedule_habit_id = st.selectbox(
+                "Select Habit",
+                list(profile.habits),
+                format_func=lambda habit_id: f"{profile.habits[habit_id]['name']} ({profile.habits[habit_id]['category']})",
+                key="schedule_habit"
+            )
+            st.caption(f"Currently: {habit_streaks.describe_schedule(*habit_streaks.schedule(profile.habits[schedule_habit_id]))}")
+            schedule_target, schedule_period = schedule_inputs("schedule")
+            
+            if st.button("Update Target"):
+                unlocked = habit_service.set_schedule(profile, schedule_habit_id, schedule_target, schedule_period)
+                st.success(f"{profile.habits[schedule_habit_id]['name']} is now {habit_streaks.describe_schedule(schedule_target, schedule_period).lower()}. Its streaks were recounted.")
+                announce(unlocked)
         else:
-            st.warning("Please enter both a habit name and category.")
-    
-    st.markdown("---")
-    
-    # Delete habit
-    st.markdown("### Delete Habit")
-    
-    # Create a selectbox with all habits
-    habit_options = [(habit_id, f"{habit['name']} ({habit['category']})") 
-                     for habit_id, habit in st.session_state.habits.items()]
-    habit_display = [option[1] for option in habit_options]
-    
-    if habit_options:
-        selected_index = st.selectbox("Select Habit to Delete", range(len(habit_options)), format_func=lambda x: habit_display[x])
-        selected_habit_id = habit_options[selected_index][0]
-        
-        # Button to delete the habit
-        if st.button("Delete Habit"):
-            habit_name = st.session_state.habits[selected_habit_id]["name"]
-            if st.session_state.habits.pop(selected_habit_id, None):
-                st.success(f"Habit '{habit_name}' deleted successfully!")
-                save_data()
-    else:
-        st.info("No habits to delete.")
-    
-    st.markdown("---")
-    
-    # Reset all data
-    st.markdown("### Reset Data")
-    st.warning("This will delete all habits, achievements, and progress. This cannot be undone.")
-    
-    # Two-step confirmation to prevent accidental reset
-    if st.button("Reset All Data"):
-        st.session_state.confirm_reset = True
-    
-    if st.session_state.get("confirm_reset", False):
-        if st.button("Yes, I'm sure. Reset everything"):
-            # Reset all session state data
-            if 'habits' in st.session_state:
-                del st.session_state.habits
-            if 'achievements' in st.session_state:
-                del st.session_state.achievements
-            if 'user' in st.session_state:
-                del st.session_state.user
-            if 'confirm_reset' in st.session_state:
-                del st.session_state.confirm_reset
-            
-            # Delete save file if it exists
-            if os.path.exists('habit_data.json'):
-                os.remove('habit_data.json')
-            
-            st.success("All data has been reset. Refresh the page to start fresh.")
-    
-    st.markdown("---")
-    
-    # Export data
-    st.markdown("### Export Data")
-    
-    if st.button("Export Data (JSON)"):
-        # Create JSON data
-        data = {
-            "habits": st.session_state.habits,
-            "achievements": st.session_state.achievements,
-            "user": st.session_state.user
-        }
-        
-        # Convert to JSON string
-        json_data = json.dumps(data, indent=4, default=str)
-        
-        # Create download link
-        st.download_button(
-            label="Download JSON",
-            data=json_data,
-            file_name="habit_tracker_data.json",
-            mime="application/json"
-        )
+            st.info("No habits yet.")
+        
+        st.markdown("---")
+        
+        # Delete habit
+        st.markdown("### Delete Habit")
+        
+        # Create a selectbox with all habits
+        habit_options = [(habit_id, f"{habit['name']} ({habit['category']})") 
+                         for habit_id, habit in profile.habits.items()]
+        habit_display = [option[1] for option in habit_options]
+        
+        if habit_options:
+            selected_index = st.selectbox("Select Habit to Delete", range(len(habit_options)), format_func=lambda x: habit_display[x])
+            selected_habit_id = habit_options[selected_index][0]
+            
+            # Button to delete the habit
+            if st.button("Delete Habit"):
+                habit, unlocked = habit_service.delete_habit(profile, selected_habit_id)
+                if habit:
+                    st.success(f"Habit '{habit['name']}' deleted successfully!")
+                    announce(unlocked)
+        else:
+            st.info("No habits to delete.")
+        
+        st.markdown("---")
+        
+        # Reset all data
+        st.markdown("### Reset Data")
+        st.warning("This will delete all habits, achievements, and progress. This cannot be undone.")
+        
+        # Two-step confirmation to prevent accidental reset
+        if st.button("Reset All Data"):
+            st.session_state.confirm_reset = True
+        
+        if st.session_state.get("confirm_reset", False):
+            if st.button("Yes, I'm sure. Reset everything"):
+                if 'confirm_reset' in st.session_state:
+                    del st.session_state.confirm_reset
+                
+                # Clear this profile's database (and any old save file) and reload its defaults
+                habit_service.reset(profile)
+                
+                st.success("All data has been reset. Refresh the page to start fresh.")
+        
+        st.markdown("---")
+        
+        # Import data
+        st.markdown("### Import Data")
+        st.markdown("Backfill history from a CSV with `habit`, `category`, `date` (YYYY-MM-DD) and `done` columns. Missing habits are created.")
+        
+        import_file = st.file_uploader("Import CSV", type="csv", key="import_file")
+        if import_file is not None and st.button("Import Completions"):
+            try:
+                with st.spinner("Importing..."):
+                    result = habit_service.import_csv(profile, import_file)
+            except ValueError as e:
+                st.error(f"Could not read the CSV: {e}")
+            else:
+                st.success(f"Imported {result['rows']:,} rows and created {len(result['created'])} new habit(s). Streaks, XP and achievements were recalculated.")
+                if result["dropped"]:
+                    st.warning(f"Skipped {result['dropped']:,} row(s) with a missing habit or category, an invalid or future date, or a repeated habit and date.")
+                for kind, achievement_id, habit_id in result["unlocked"]:
+                    achievement = profile.achievements[kind][achievement_id]
+                    earned_for = f" for {profile.habits[habit_id]['name']}" if habit_id else ""
+                    st.success(f"🏆 Achievement Unlocked: {achievement['name']}{earned_for}!")
+        
+        st.markdown("---")
+        
+        # Export data, generated only when a button is clicked
+        st.markdown("### Export Data")
+        st.markdown("The compact backup holds the same data as the JSON export in a fraction of the size, and either can be restored below.")
+        
+        export_col1, export_col2 = st.columns(2)
+        with export_col1:
+            st.download_button(
+                label="Export Data (JSON)",
+                data=export_download(habit_store.export_json),
+                file_name="habit_tracker_data.json",
+                mime="application/json"
+            )
+        with export_col2:
+            st.download_button(
+                label="Download Backup (.hqp)",
+                data=export_download(habit_pack.write_pack),
+                file_name="habit_tracker_backup.hqp",
+                mime="application/octet-stream"
+            )
+        
+        st.markdown("---")
+        
+        # Restore a backup or JSON export, replacing this profile's data
+        st.markdown("### Restore Backup")
+        st.warning("Restoring replaces all habits, achievements, and progress in this profile.")
+        
+        restore_file = st.file_uploader("Backup file", type=["hqp", "json"], key="restore_file")
+        if restore_file is not None and st.button("Restore Backup"):
+            try:
+                restored = habit_service.restore(profile, restore_file)
+            except ValueError as e:
+                st.error(f"Could not read the backup: {e}")
+            else:
+                st.success(f"Restored {restored} habit(s). Refresh the page to see them.")
+
+# Startup timing for this process; ?startup_report in the URL shows it
+app_startup.mark_first_render("habit_tracker")
+if "startup_report" in st.query_params:
+    with st.sidebar.expander("⏱️ Startup report", expanded=True):
+        st.json(app_startup.startup_report())
 
 # Main app loop
 if __name__ == "__main__":
@@ -0,0 +1,37 @@
+import os
+import sys
+from collections import OrderedDict
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import habit_profiles
+import habit_service
+import habit_store
+
+@pytest.fixture
+def open_profile(tmp_path, monkeypatch):
+    """habit_service.open_profile with profile databases under a temporary
+    directory and a profile cache of the test's own."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(habit_profiles, "_profiles", OrderedDict())
+    opened = []
+
+    def open_profile(name):
+        profile = habit_service.open_profile(name)
+        opened.append(profile)
+        return profile
+
+    yield open_profile
+    for profile in opened:
+        habit_store.release(profile.path)
+        habit_store.close_connection(profile.path)
+
+def save_profile(name, habits, achievements, user, xp_events=None):
+    """Write a state to the database `name` would open from (relative to the cwd)."""
+    path = habit_profiles.profile_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    habit_store.save_state(habits, achievements, user, path=path, xp_events=xp_events)
+    habit_store.close_connection(path)
+    return path
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+import habit_analytics
+import habit_archive
+import habit_benchmarks
+import habit_matrix
+import habit_service
+from conftest import save_profile
+
+@pytest.fixture
+def generated():
+    # Three years of history, so loading the profile compacts it
+    return habit_benchmarks.generate_profile(8, 3, 0.6, seed=2)
+
+def open_compacted(open_profile, generated):
+    save_profile("archive", generated.habits, generated.achievements, generated.user, generated.xp_events)
+    profile = open_profile("archive")
+    assert profile.archive_before is not None
+    return profile
+
+def test_compaction_on_load_moves_old_history(open_profile, generated):
+    profile = open_compacted(open_profile, generated)
+    archived = sum(profile.archived_counts.values())
+    recent = sum(sum(habit["completions"].values()) for habit in profile.habits.values())
+    completed = sum(sum(habit["completions"].values()) for habit in generated.habits.values())
+    assert archived and archived + recent == completed
+    # Unticked days are dropped rather than archived
+    assert all(all(habit["completions"].values()) for habit in profile.habits.values())
+
+def test_compaction_keeps_streaks(open_profile, generated):
+    profile = open_compacted(open_profile, generated)
+    streaks = habit_service.streaks(profile)
+    for habit_id, habit in generated.habits.items():
+        assert (streaks[habit_id]["streak"], streaks[habit_id]["longest_streak"]) == (habit["streak"], habit["longest_streak"])
+
+@pytest.mark.parametrize("window_days", [None, 2 * 365, 90])
+def test_compaction_keeps_rates(open_profile, generated, window_days):
+    expected = habit_analytics.completion_rates(generated, window_days)
+    profile = open_compacted(open_profile, generated)
+    rates = habit_service.analytics(profile, "rates", window_days)
+    assert rates["Days Completed"].tolist() == expected["Days Completed"].tolist()
+    assert rates["Total Days"].tolist() == expected["Total Days"].tolist()
+    assert np.allclose(rates["Completion Rate"], expected["Completion Rate"])
+
+def test_set_schedule_counts_archived_days(open_profile, generated):
+    profile = open_compacted(open_profile, generated)
+    habit_id = next(habit_id for habit_id, habit in generated.habits.items() if habit["period"] == "day")
+    habit_service.set_schedule(profile, habit_id, 1, "week")
+    weekly = {habit_id: {**generated.habits[habit_id], "period": "week"}}
+    matrix = habit_matrix.CompletionMatrix(weekly, habit_matrix.build_bitmaps(weekly))
+    assert profile.habits[habit_id]["longest_streak"] == matrix.longest_streaks()[0]
+    assert profile.habits[habit_id]["streak"] == matrix.current_streaks()[0]
+
+def test_export_merges_archive_back(open_profile, generated):
+    profile = open_compacted(open_profile, generated)
+    exported = habit_archive.export_habits(profile)
+    for habit_id, habit in generated.habits.items():
+        done = {day for day, completed in habit["completions"].items() if completed}
+        assert {day for day, completed in exported[habit_id]["completions"].items() if completed} == done
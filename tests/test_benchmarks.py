@@ -0,0 +1,43 @@
+import json
+import os
+
+import habit_benchmarks
+import habit_store
+
+def test_generate_profile_is_deterministic():
+    first = habit_benchmarks.generate_profile(6, 1, 0.5, seed=3)
+    second = habit_benchmarks.generate_profile(6, 1, 0.5, seed=3)
+    assert first.habits == second.habits
+    assert first.user == second.user
+    assert first.xp_events == second.xp_events
+    assert first.habits != habit_benchmarks.generate_profile(6, 1, 0.5, seed=4).habits
+
+def test_generated_xp_matches_events():
+    profile = habit_benchmarks.generate_profile(6, 1, 0.5, seed=3)
+    assert profile.user["total_xp"] == sum(amount for _, _, amount, _ in profile.xp_events)
+    for habit_id, habit in profile.habits.items():
+        assert habit["xp"] == sum(amount for event_habit, _, amount, _ in profile.xp_events if event_habit == habit_id)
+
+def test_measure_reports_times_and_memory():
+    result = habit_benchmarks.measure(lambda: [0] * 100_000, 3)
+    assert result["repeats"] == 3
+    assert 0 < result["wall_min_s"] <= result["wall_median_s"]
+    assert result["peak_mib"] > 0
+
+def test_run_writes_one_line_per_benchmark(tmp_path):
+    output = tmp_path / "results.jsonl"
+    habit_benchmarks.run([(4, 0.5, 0.5)], 1, str(output))
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    profile = habit_benchmarks.generate_profile(4, 0.5, 0.5)
+    workdir = tmp_path / "case"
+    workdir.mkdir()
+    names = [name for name, _, _ in habit_benchmarks.case_benchmarks(profile, str(workdir))]
+    for name in os.listdir(workdir):
+        habit_store.close_connection(str(workdir / name))
+    assert [line["benchmark"] for line in lines] == names
+    assert all(line["habits"] == 4 and line["wall_per_op_s"] > 0 for line in lines)
+
+def test_run_only_selected_benchmarks(tmp_path):
+    output = tmp_path / "results.jsonl"
+    habit_benchmarks.run([(4, 0.5, 0.5)], 1, str(output), only=["load_state", "toggle"])
+    assert [json.loads(line)["benchmark"] for line in output.read_text().splitlines()] == ["load_state", "toggle"]
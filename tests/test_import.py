@@ -0,0 +1,90 @@
+import io
+from datetime import date, timedelta
+
+import pytest
+
+import habit_import
+import habit_rules
+import habit_service
+import habit_store
+
+def day(offset):
+    return (date.today() - timedelta(days=offset)).isoformat()
+
+def csv_file(rows):
+    return io.BytesIO(("habit,category,date,done\n" + "".join(f"{row}\n" for row in rows)).encode())
+
+def ledger_total(profile):
+    habit_service.flush(profile)
+    return habit_store.get_connection(profile.path).execute("SELECT COALESCE(SUM(amount), 0) FROM xp_ledger").fetchone()[0]
+
+def achievement_xp(profile, habit_id):
+    return sum(achievement["xp"] for achievement in profile.achievements["streaks"].values() if habit_id in achievement["earned"])
+
+def test_read_drops_repeats_and_invalid_rows():
+    rows, dropped = habit_import.read_completions_csv(csv_file([
+        f"Chess,Games,{day(3)},1",
+        f" chess ,games,{day(3)},0",
+        f"Chess,Games,{day(2)},yes",
+        f"Chess,,{day(1)},1",
+        "Chess,Games,not a date,1",
+        f"Chess,Games,{day(-1)},1"
+    ]))
+    assert dropped == 4
+    # Repeated habit and date (ids ignore case and spaces): the last row wins
+    assert rows[["habit_id", "date", "done"]].values.tolist() == [["games_chess", day(3), False], ["games_chess", day(2), True]]
+
+def test_read_requires_columns():
+    with pytest.raises(ValueError, match="done"):
+        habit_import.read_completions_csv(io.BytesIO(b"habit,category,date\nChess,Games,2024-01-01\n"))
+
+def test_import_recomputes_streaks_and_xp(open_profile):
+    profile = open_profile("import")
+    result = habit_service.import_csv(profile, csv_file([f"Chess,Games,{day(offset)},1" for offset in range(1, 6)]))
+    assert (result["rows"], result["dropped"], result["created"]) == (5, 0, ["games_chess"])
+
+    habit = profile.habits["games_chess"]
+    assert (habit["streak"], habit["longest_streak"]) == (5, 5)
+    assert habit["created_date"] == day(5)
+    # Each day earns the XP of the streak it extended, as the checkbox would have
+    completion_xp = int(sum(habit_rules.completion_xp(range(5))))
+    assert habit["xp"] == completion_xp + achievement_xp(profile, "games_chess")
+    assert profile.user["total_xp"] == ledger_total(profile)
+
+def test_reimport_changes_nothing(open_profile):
+    profile = open_profile("import")
+    rows = [f"Chess,Games,{day(offset)},{offset % 4 != 0}" for offset in range(1, 30)]
+    habit_service.import_csv(profile, csv_file(rows))
+    completions = dict(profile.habits["games_chess"]["completions"])
+    user = dict(profile.user)
+
+    result = habit_service.import_csv(profile, csv_file(rows))
+    assert (result["created"], result["unlocked"]) == ([], [])
+    assert profile.habits["games_chess"]["completions"] == completions
+    assert profile.user == user
+    assert ledger_total(profile) == user["total_xp"]
+
+def test_import_overrides_and_extends_history(open_profile):
+    profile = open_profile("import")
+    habit_id = "exercise_walking_pad"
+    habit_service.import_csv(profile, csv_file([f"Walking Pad,Exercise,{day(offset)},1" for offset in range(1, 4)]))
+    assert profile.habits[habit_id]["streak"] == 3
+
+    # Unticking the middle day splits the streak
+    habit_service.import_csv(profile, csv_file([f"Walking Pad,Exercise,{day(2)},0"]))
+    habit = profile.habits[habit_id]
+    assert habit["completions"][day(2)] is False
+    assert (habit["streak"], habit["longest_streak"]) == (1, 1)
+    # The 3-day achievement stays earned
+    assert habit["xp"] == 2 * int(habit_rules.completion_xp(0)) + achievement_xp(profile, habit_id)
+    assert profile.user["total_xp"] == ledger_total(profile)
+
+def test_import_survives_reload(open_profile):
+    profile = open_profile("import")
+    habit_service.import_csv(profile, csv_file([f"Chess,Games,{day(offset)},1" for offset in range(1, 10)]))
+    habits, user = profile.habits, dict(profile.user)
+    habit_service.flush(profile)
+
+    habit_service.load_profile(profile)
+    assert profile.user == user
+    assert profile.habits["games_chess"] == habits["games_chess"]
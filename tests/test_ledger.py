@@ -0,0 +1,103 @@
+import copy
+from datetime import date
+
+import pytest
+
+import habit_benchmarks
+import habit_ledger
+import habit_import
+import habit_profiles
+import habit_service
+import habit_store
+from conftest import save_profile
+
+def ledger_sums(path):
+    # XP totals summed from every ledger event, without the snapshot
+    conn = habit_store.get_connection(path)
+    return dict(conn.execute("SELECT COALESCE(habit_id, ''), SUM(amount) FROM xp_ledger GROUP BY 1"))
+
+def latest_snapshot(path):
+    return habit_store.get_connection(path).execute("SELECT MAX(event_id) FROM xp_snapshots").fetchone()[0]
+
+def without_zeros(totals):
+    return {key: amount for key, amount in totals.items() if amount}
+
+@pytest.fixture
+def generated():
+    return habit_benchmarks.generate_profile(8, 1, 0.6, seed=1)
+
+@pytest.fixture
+def path(tmp_path, generated):
+    path = str(tmp_path / "ledger.db")
+    habit_store.save_state(generated.habits, generated.achievements, generated.user, path=path, xp_events=generated.xp_events)
+    yield path
+    habit_store.release(path)
+    habit_store.close_connection(path)
+
+def test_loaded_totals_match_rebuild(generated, path):
+    profile = habit_profiles.Profile("ledger")
+    profile.path = path
+    profile.habits = copy.deepcopy(generated.habits)
+    habit_ledger.load(profile)
+    assert without_zeros(profile.xp_ledger.totals) == without_zeros(generated.xp_ledger.totals)
+    assert profile.user == generated.user
+    for habit_id, habit in generated.habits.items():
+        assert (profile.habits[habit_id]["xp"], profile.habits[habit_id]["level"]) == (habit["xp"], habit["level"])
+
+def test_snapshot_plus_events_match_ledger(generated, path, monkeypatch):
+    monkeypatch.setattr(habit_store, "XP_SNAPSHOT_EVERY", 3)
+    first_snapshot = latest_snapshot(path)
+    ledger = generated.xp_ledger
+
+    # Events appended after the snapshot, some of them snapshotted again
+    writer = habit_store.get_writer(path)
+    for habit_id in list(generated.habits)[:5]:
+        for amount in (7, -7, 9):
+            writer.append_xp([ledger.record(habit_id, habit_store.XP_COMPLETION, amount)])
+        writer.flush()
+    # The XP of an achievement already stored is not appended again
+    writer.append_xp([ledger.record(None, "achievement:milestones/first_habit", 10)])
+    totals, completed_today = habit_store.load_xp(path)
+    assert latest_snapshot(path) > first_snapshot
+    assert without_zeros(totals) == without_zeros(ledger_sums(path))
+    assert without_zeros(totals) == without_zeros({**ledger.totals, "": ledger.totals[""] - 10})
+    assert completed_today == ledger.completed_today
+
+def test_rebuild_after_toggles_matches_ledger(open_profile, generated):
+    path = save_profile("ledger", generated.habits, generated.achievements, generated.user, generated.xp_events)
+    profile = open_profile("ledger")
+    for habit_id in profile.habits:
+        habit_service.complete(profile, habit_id)
+    habit_service.flush(profile)
+
+    # Regenerating the ledger from the completions gives what the checkboxes recorded
+    recorded = without_zeros(habit_store.load_xp(path)[0])
+    _, events = habit_import.recompute_progress(profile)
+    rebuilt = {}
+    for habit_id, _, amount, _ in events:
+        rebuilt[habit_id or ""] = rebuilt.get(habit_id or "", 0) + amount
+    assert without_zeros(rebuilt) == recorded
+
+def test_completion_xp_today_is_revoked(open_profile):
+    profile = open_profile("ledger")
+    habit_id = next(iter(profile.habits))
+    before = profile.user["total_xp"]
+    outcome = habit_service.complete(profile, habit_id)
+    assert profile.xp_ledger.completion_xp_today(habit_id) == outcome["xp"] > 0
+    habit_service.uncomplete(profile, habit_id)
+    assert profile.xp_ledger.completion_xp_today(habit_id) == 0
+    assert profile.habits[habit_id]["xp"] == 0
+    # Achievements stay earned, so only their XP is left
+    habit_service.flush(profile)
+    achievement_xp = habit_store.get_connection(profile.path).execute(
+        "SELECT COALESCE(SUM(amount), 0) FROM xp_ledger WHERE source LIKE ?", (habit_store.XP_ACHIEVEMENT_PREFIX + "%",)
+    ).fetchone()[0]
+    assert profile.user["total_xp"] == before + achievement_xp
+
+def test_xp_ledger_record_tracks_today():
+    ledger = habit_ledger.XpLedger({"a": 10}, today=date.today().isoformat())
+    ledger.record("a", habit_store.XP_COMPLETION, 7)
+    ledger.record(None, "achievement:milestones/first_habit", 10)
+    assert ledger.totals == {"a": 17, "": 10}
+    assert ledger.total == 27
+    assert ledger.completion_xp_today("a") == 7
@@ -0,0 +1,169 @@
+import io
+import json
+
+import pytest
+
+import habit_archive
+import habit_pack
+import habit_service
+import habit_store
+
+def sample_state():
+    habits = {
+        "exercise_walking_pad": {
+            "name": "Walking Pad",
+            "category": "Exercise",
+            "streak": 2,
+            "longest_streak": 5,
+            "completions": {"2024-01-01": True, "2024-01-02": False, "2024-01-03": True, "2024-01-04": True},
+            "xp": 40,
+            "level": 1,
+            "target": 1,
+            "period": "day",
+            "created_date": "2023-12-30"
+        },
+        "reading_fantasy": {
+            "name": "Fantasy",
+            "category": "Reading",
+            "streak": 0,
+            "longest_streak": 0,
+            "completions": {},
+            "xp": 0,
+            "level": 1,
+            "target": 3,
+            "period": "week",
+            "created_date": "2024-01-02"
+        },
+        # Long runs and gaps, so blocks come out run-length encoded
+        "work_focus": {
+            "name": "Focus",
+            "category": "Work",
+            "streak": 0,
+            "longest_streak": 300,
+            "completions": {f"2022-{month:02d}-{day:02d}": month % 3 != 0 for month in range(1, 13) for day in range(1, 29)},
+            "xp": 3000,
+            "level": 6,
+            "target": 2,
+            "period": "month",
+            "created_date": "2022-01-01"
+        }
+    }
+    achievements = {
+        "streaks": {"3_day_streak": {"name": "3-Day Warrior", "xp": 30, "earned": {"exercise_walking_pad": "2024-01-04"}}},
+        "milestones": {"first_habit": {"name": "First Steps", "xp": 10, "earned": True}}
+    }
+    user = {"total_xp": 3080, "level": 6, "next_level_xp": 4900}
+    return habits, achievements, user
+
+def read(data):
+    return habit_pack.read_state(io.BytesIO(data))
+
+def packed(habits, achievements, user):
+    file = io.BytesIO()
+    habit_pack.write_pack(file, habits, achievements, user)
+    return file.getvalue()
+
+def exported(habits, achievements, user):
+    file = io.BytesIO()
+    habit_store.export_json(file, habits, achievements, user)
+    return file.getvalue()
+
+@pytest.mark.parametrize("write", [packed, exported])
+def test_round_trip(write):
+    state = sample_state()
+    assert read(write(*state)) == state
+
+def test_blocks_round_trip_both_encodings():
+    sparse = {"2024-01-01": True, "2024-03-01": False, "2024-12-31": True}
+    dense = {f"2024-01-{day:02d}": day % 2 == 0 for day in range(1, 32)}
+    for completions in (sparse, dense, {}):
+        assert habit_pack.decode_completions(habit_pack.encode_completions(completions)) == completions
+
+def test_missing_fields_get_defaults():
+    data = {"habits": {"h1": {"name": "Walk", "category": "Exercise", "completions": {"2024-01-05": 1, "2024-01-04": 0}}}}
+    habits, achievements, user = read(json.dumps(data).encode())
+    habit = habits["h1"]
+    assert habit["completions"] == {"2024-01-05": True, "2024-01-04": False}
+    assert (habit["streak"], habit["longest_streak"], habit["xp"], habit["level"]) == (0, 0, 0, 1)
+    assert (habit["target"], habit["period"]) == (1, "day")
+    assert habit["created_date"] == "2024-01-04"
+    assert achievements == {}
+    assert user == {"total_xp": 0, "level": 1, "next_level_xp": 100}
+
+def habit(**fields):
+    return {"name": "Walk", "category": "Exercise", "completions": {}, **fields}
+
+@pytest.mark.parametrize("data", [
+    json.dumps({"habits": {"h1": {"name": "x"}}}).encode(),
+    json.dumps({"habits": {"h1": habit(name=" ")}}).encode(),
+    json.dumps({"habits": {"h1": "Walk"}}).encode(),
+    json.dumps({"habits": {"h1": habit(completions=["2024-01-01"])}}).encode(),
+    json.dumps({"habits": {"h1": habit(completions={"2024-1-5": True})}}).encode(),
+    json.dumps({"habits": {"h1": habit(completions={"yesterday": True})}}).encode(),
+    json.dumps({"habits": {"h1": habit(streak="three")}}).encode(),
+    json.dumps({"habits": {"h1": habit(target=3, period="day")}}).encode(),
+    json.dumps({"habits": {"h1": habit(period="fortnight")}}).encode(),
+    json.dumps({"habits": {"h1": habit(created_date="soon")}}).encode(),
+    json.dumps({"habits": {}, "achievements": {"streaks": {"3_day_streak": {"earned": True}}}}).encode(),
+    json.dumps({"habits": {}, "achievements": []}).encode(),
+    json.dumps({"habits": {}, "user": {"total_xp": "lots"}}).encode()
+])
+def test_damaged_habits_are_rejected(data):
+    with pytest.raises(ValueError):
+        read(data)
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"not json",
+    b"[]",
+    b'{"habits": []}'
+])
+def test_foreign_files_are_rejected(data):
+    with pytest.raises(ValueError):
+        read(data)
+
+def test_damaged_pack_is_rejected():
+    data = packed(*sample_state())
+    for damaged in (
+        data[:len(data) // 2],
+        data[:-1],
+        data[:habit_pack.HEADER.size],
+        data[:20] + bytes(len(data) - 20),
+        habit_pack.HEADER.pack(habit_pack.PACK_MAGIC, habit_pack.PACK_VERSION + 1, 0) + data[habit_pack.HEADER.size:]
+    ):
+        with pytest.raises(ValueError):
+            read(damaged)
+
+def test_pack_with_invalid_habit_is_rejected():
+    habits, achievements, user = sample_state()
+    del habits["reading_fantasy"]["category"]
+    with pytest.raises(ValueError, match="reading_fantasy"):
+        read(packed(habits, achievements, user))
+
+def test_failed_replace_rolls_back(tmp_path):
+    path = str(tmp_path / "restore.db")
+    habits, achievements, user = sample_state()
+    habit_store.save_state(habits, achievements, user, path=path)
+    before = habit_store.load_state(path)
+    with pytest.raises(KeyError):
+        habit_store.replace_state({"h1": {"name": "x", "completions": {}}}, {}, user, path=path)
+    assert habit_store.load_state(path) == before
+    habit_store.close_connection(path)
+
+def completed_days(habits):
+    return {habit_id: {day for day, done in habit["completions"].items() if done} for habit_id, habit in habits.items()}
+
+def test_restore_replaces_profile(open_profile):
+    profile = open_profile("restore")
+    habits, achievements, user = sample_state()
+    assert habit_service.restore(profile, io.BytesIO(packed(habits, achievements, user))) == len(habits)
+    # Old history is archived on reload and unticked days dropped
+    assert completed_days(habit_archive.export_habits(profile)) == completed_days(habits)
+    assert profile.achievements["milestones"]["first_habit"]["earned"] is True
+
+def test_failed_restore_keeps_profile(open_profile):
+    profile = open_profile("restore")
+    before = habit_store.load_state(profile.path)
+    with pytest.raises(ValueError):
+        habit_service.restore(profile, io.BytesIO(json.dumps({"habits": {"h1": {"name": "x"}}}).encode()))
+    assert habit_store.load_state(profile.path) == before
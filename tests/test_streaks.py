@@ -0,0 +1,210 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import habit_matrix
+import habit_streaks
+
+FIRST_DAY = date(2023, 10, 2)
+LAST_DAY = date(2024, 3, 31)
+
+SCHEDULES = [(1, "day"), (3, "week"), (1, "week"), (7, "week"), (2, "month"), (12, "month")]
+
+def period_key(day, period):
+    # The calendar period a date falls in, worked out without the ordinal arithmetic habit_matrix uses
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return (day.year, day.month)
+    return day
+
+def period_days(day, period):
+    if period == "week":
+        return 7
+    if period == "month":
+        next_month = date(day.year + day.month // 12, day.month % 12 + 1, 1)
+        return (next_month - date(day.year, day.month, 1)).days
+    return 1
+
+def naive_streaks(done, target, period, today):
+    """(history, before, current) for one habit's {date: bool} over the window,
+    walking the days one at a time."""
+    days = [FIRST_DAY + timedelta(days=offset) for offset in range((LAST_DAY - FIRST_DAY).days + 1)]
+    keys = [period_key(day, period) for day in days]
+    counts = {}
+    for day, key in zip(days, keys):
+        counts[key] = counts.get(key, 0) + done[day]
+    runs, run = {}, 0
+    for key in dict.fromkeys(keys):
+        run = run + 1 if counts[key] >= target else 0
+        runs[key] = run
+    order = list(runs)
+
+    history, before, so_far = [], [], {}
+    for day, key in zip(days, keys):
+        previous = runs[order[order.index(key) - 1]] if order.index(key) else 0
+        so_far[key] = so_far.get(key, 0) + done[day]
+        history.append(runs[key] if so_far[key] >= target else 0)
+        before.append(0 if not done[day] else runs[key] if so_far[key] - 1 >= target else previous)
+
+    today_key = period_key(today, period)
+    reached = sum(done[day] for day, key in zip(days, keys) if key == today_key and day <= today)
+    index = order.index(today_key)
+    current = runs[today_key] if reached >= target else (runs[order[index - 1]] if index else 0)
+    return history, before, current
+
+def naive_progress(done, target, period, tracked_from):
+    """(met, expected) summed over the window: completions up to each period's
+    target, and the target spread evenly over the tracked days of each period."""
+    counts = {}
+    for day, completed in done.items():
+        counts[period_key(day, period)] = counts.get(period_key(day, period), 0) + completed
+    met = sum(min(1, target / counts[period_key(day, period)]) for day, completed in done.items() if completed)
+    expected = sum(target / period_days(day, period) for day in done if day >= tracked_from)
+    return met, expected
+
+def naive_runs(done, today):
+    """(run ending on each day of the window, current streak) for one habit's
+    {date: bool}, walking the days one at a time."""
+    days = [FIRST_DAY + timedelta(days=offset) for offset in range((LAST_DAY - FIRST_DAY).days + 1)]
+    runs, run = [], 0
+    for day in days:
+        run = run + 1 if done[day] else 0
+        runs.append(run)
+    # The run ending today, or yesterday if today isn't done yet
+    ending = dict(zip(days, runs))
+    current = ending.get(today) or ending.get(today - timedelta(days=1), 0)
+    return runs, current
+
+@pytest.fixture
+def habits():
+    rng = np.random.default_rng(7)
+    days = [FIRST_DAY + timedelta(days=offset) for offset in range((LAST_DAY - FIRST_DAY).days + 1)]
+    return {
+        f"habit_{row}": {
+            "name": f"Habit {row}",
+            "category": "Test",
+            "completions": {day.isoformat(): bool(rng.random() < density) for day in days},
+            "created_date": FIRST_DAY.isoformat()
+        }
+        for row, density in enumerate([0.2, 0.5, 0.8, 0.95])
+    }
+
+def done_by_day(habit):
+    return {date.fromisoformat(day): done for day, done in habit["completions"].items()}
+
+# The index answers for today, with no completions after it
+@pytest.mark.parametrize("today", [LAST_DAY, LAST_DAY + timedelta(days=1), LAST_DAY + timedelta(days=2)])
+def test_streak_index_matches_naive(habits, today):
+    index = habit_streaks.StreakIndex.from_habits(habits)
+    for habit_id, habit in habits.items():
+        runs, current = naive_runs(done_by_day(habit), today)
+        assert index.longest_streak(habit_id) == max(runs)
+        assert index.current_streak(habit_id, today) == current
+
+def test_streak_index_mark_and_unmark(habits):
+    index = habit_streaks.StreakIndex.from_habits(habits)
+    habit_id, habit = next(iter(habits.items()))
+    rng = np.random.default_rng(3)
+    for offset in rng.integers(0, (LAST_DAY - FIRST_DAY).days + 1, 200):
+        day = FIRST_DAY + timedelta(days=int(offset))
+        done = not habit["completions"][day.isoformat()]
+        habit["completions"][day.isoformat()] = done
+        if done:
+            index.mark(habit_id, day.isoformat())
+        else:
+            index.unmark(habit_id, day.isoformat())
+        runs, current = naive_runs(done_by_day(habit), LAST_DAY)
+        assert index.longest_streak(habit_id) == max(runs)
+        assert index.current_streak(habit_id, LAST_DAY) == current
+
+def window_matrix(habits):
+    return habit_matrix.CompletionMatrix(
+        habits, habit_matrix.build_bitmaps(habits), first_day=FIRST_DAY.toordinal(), last_day=LAST_DAY.toordinal()
+    )
+
+@pytest.mark.parametrize("today", [LAST_DAY, date(2024, 2, 29), date(2024, 1, 1), FIRST_DAY])
+def test_matrix_streaks_match_naive(habits, today):
+    matrix = window_matrix(habits)
+    current = matrix.current_streaks(today)
+    for row, habit_id in enumerate(matrix.habit_ids):
+        done = done_by_day(habits[habit_id])
+        runs, _ = naive_runs(done, LAST_DAY)
+        assert matrix.longest_streaks()[row] == max(runs)
+        assert matrix.completed_days()[row] == sum(done.values())
+        # As of `today`, ignoring later days
+        assert current[row] == naive_runs({day: completed and day <= today for day, completed in done.items()}, today)[1]
+
+def test_bitmap_round_trip(habits):
+    for habit in habits.values():
+        bitmap = habit_matrix.HabitBitmap.from_completions(habit["completions"])
+        done = {day for day, completed in habit["completions"].items() if completed}
+        assert {day for day in habit["completions"] if bitmap.get(day)} == done
+        assert bitmap.count() == len(done)
+        assert habit_matrix.HabitBitmap.from_bytes(bitmap.to_bytes()).bits == bitmap.bits
+
+@pytest.fixture
+def scheduled():
+    rng = np.random.default_rng(7)
+    days = [FIRST_DAY + timedelta(days=offset) for offset in range((LAST_DAY - FIRST_DAY).days + 1)]
+    habits = {}
+    for row, (target, period) in enumerate(SCHEDULES * 3):
+        density = [0.2, 0.5, 0.9][row // len(SCHEDULES)]
+        # Some habits were created mid-window, with completions logged before that
+        created = FIRST_DAY + timedelta(days=int(rng.integers(0, 60)) if row % 2 else 0)
+        completions = {day.isoformat(): bool(rng.random() < density) for day in days}
+        habits[f"habit_{row}"] = {
+            "name": f"Habit {row}",
+            "category": "Test",
+            "streak": 0,
+            "longest_streak": 0,
+            "completions": completions,
+            "xp": 0,
+            "level": 1,
+            "target": target,
+            "period": period,
+            "created_date": created.isoformat()
+        }
+    return habits
+
+@pytest.mark.parametrize("today", [LAST_DAY, date(2024, 2, 29), date(2024, 1, 1), FIRST_DAY])
+def test_schedule_streaks_match_naive(scheduled, today):
+    matrix = window_matrix(scheduled)
+    history, before, current = matrix.schedule_streaks(today)
+    for row, habit_id in enumerate(matrix.habit_ids):
+        habit = scheduled[habit_id]
+        expected = naive_streaks(done_by_day(habit), habit["target"], habit["period"], today)
+        assert history[row].tolist() == expected[0], habit_id
+        assert before[row].tolist() == expected[1], habit_id
+        assert current[row] == expected[2], habit_id
+    assert matrix.current_streaks(today).tolist() == current.tolist()
+
+def test_longest_streaks_match_naive(scheduled):
+    matrix = window_matrix(scheduled)
+    for row, habit_id in enumerate(matrix.habit_ids):
+        habit = scheduled[habit_id]
+        history = naive_streaks(done_by_day(habit), habit["target"], habit["period"], LAST_DAY)[0]
+        assert matrix.longest_streaks()[row] == max(history), habit_id
+
+def test_target_progress_matches_naive(scheduled):
+    matrix = window_matrix(scheduled)
+    met, expected = matrix.target_progress()
+    rates = matrix.completion_rates()
+    for row, habit_id in enumerate(matrix.habit_ids):
+        habit = scheduled[habit_id]
+        # Tracked from creation, or from the first completion if that came earlier
+        done = done_by_day(habit)
+        tracked_from = min([date.fromisoformat(habit["created_date"])] + [day for day, completed in done.items() if completed])
+        naive_met, naive_expected = naive_progress(done, habit["target"], habit["period"], tracked_from)
+        assert met[row].sum() == pytest.approx(naive_met), habit_id
+        assert expected[row].sum() == pytest.approx(naive_expected), habit_id
+        assert rates[row] == pytest.approx(min(1, naive_met / naive_expected)), habit_id
+
+def test_daily_habits_progress_is_completed_over_tracked_days(scheduled):
+    daily = {habit_id: habit for habit_id, habit in scheduled.items() if habit["period"] == "day"}
+    matrix = window_matrix(daily)
+    met, expected = matrix.target_progress()
+    assert met.dtype == bool and expected.dtype == bool
+    assert (met.sum(axis=1) == matrix.completed_days()).all()
+    assert (expected.sum(axis=1) == matrix.tracked_days()).all()